@@ -0,0 +1,236 @@
+"""自适应随机选题与洗牌顺序
+
+AdaptiveSampler 给每道题一个权重：答错次数越多、难度系数越低、连续答对
+越少、离上次作答越久，权重越大；刚抽到过的题在接下来若干次抽取里权重
+大幅降低，避免连续重复。权重取整后存放在树状数组（Fenwick 树）里，更新
+一道题和按权重抽一道题都是 O(log n)。错题历史直接取自复习计划
+（review_scheduler），不另外保存。
+
+ShuffleDeck 是 [0, n) 上的伪随机排列：用 4 轮 Feistel 网络在不小于 n 的
+4 的幂上置换，超出范围的值继续置换（cycle walking），只保存几个密钥，
+按下标即可算出第 i 张牌，不复制题库也不生成整张排列。
+"""
+
+import random
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import accumulate
+
+from review_scheduler import DAY, DEFAULT_EASE, RELEARN_SECONDS
+
+# 权重以 1/WEIGHT_SCALE 为单位取整存入树状数组
+WEIGHT_SCALE = 1024
+
+NEW_WEIGHT = 1.0            # 从未作答的题
+LAPSE_WEIGHT = 1.0          # 每次遗忘（答错）增加的倍数
+STALE_HOURS = 24.0          # 每隔多久（小时）权重增加一倍基数
+MAX_STALENESS = 4.0
+
+# 抽到后 COOLDOWN_DRAWS 次抽取内权重乘以 COOLDOWN_FACTOR
+COOLDOWN_DRAWS = 20
+COOLDOWN_FACTOR = 1 / 32
+
+# 带筛选条件抽样时先在全题库上拒绝采样，失败这么多次后改为对筛选结果单独建树
+REJECTION_TRIES = 24
+
+
+def question_weight(scheduler, row, now):
+    """一道题的基础权重（不含冷却）"""
+    state = scheduler.state(row)
+    if state is None:
+        return NEW_WEIGHT
+    due, interval, ease, reps, lapses = state
+    seen = due - (interval * DAY if interval else RELEARN_SECONDS)
+    hours = max(0, now - seen) / 3600
+    error = (1 + LAPSE_WEIGHT * lapses) * DEFAULT_EASE / ease / (1 + reps)
+    return error * min(1 + hours / STALE_HOURS, MAX_STALENESS)
+
+
+class FenwickTree:
+    """非负整数权重的树状数组：单点更新、前缀和、按累计权重定位"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        # tree[i] = weights[i - lowbit(i) : i] 之和 = 前缀和之差，O(n) 建树
+        sums = list(accumulate(weights, initial=0))
+        tree = array('q', [0])
+        tree.extend([sums[i] - sums[i & (i - 1)] for i in range(1, n + 1)])
+        self.size = n
+        self.weights = array('q', weights)
+        self._tree = tree
+        self._top = 1 << (n.bit_length() - 1) if n else 0
+
+    def total(self):
+        return self.prefix(self.size)
+
+    def prefix(self, count):
+        """前 count 个权重之和"""
+        tree = self._tree
+        total = 0
+        while count > 0:
+            total += tree[count]
+            count &= count - 1
+        return total
+
+    def set(self, i, weight):
+        delta = weight - self.weights[i]
+        if not delta:
+            return
+        self.weights[i] = weight
+        tree = self._tree
+        i += 1
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def find(self, target):
+        """累计权重首次超过 target 的下标（0 <= target < total）"""
+        tree = self._tree
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and tree[nxt] <= target:
+                pos = nxt
+                target -= tree[nxt]
+            step >>= 1
+        return pos
+
+    def sample(self, rng):
+        """按权重抽一个下标，总权重为 0 时返回 None"""
+        total = self.total()
+        if total <= 0:
+            return None
+        return self.find(rng.randrange(total))
+
+
+class AdaptiveSampler:
+    """按错题历史加权的随机选题，权重随提交增量更新"""
+
+    def __init__(self, scheduler, clock):
+        self.scheduler = scheduler
+        self.clock = clock
+        now = clock()
+        # 未作答的题权重相同，只为排过期的题逐个计算
+        weights = array('q', [self._scaled(NEW_WEIGHT)]) * scheduler.size
+        for row, _ in scheduler.scheduled_items():
+            weights[row] = self._scaled(question_weight(scheduler, row, now))
+        self.tree = FenwickTree(weights)
+        self._cooling = deque()
+        self._draws = 0
+        self._sub_key = None
+        self._sub_tree = None
+
+    @staticmethod
+    def _scaled(weight):
+        return max(1, round(weight * WEIGHT_SCALE))
+
+    def _weight(self, row, now):
+        weight = self._scaled(question_weight(self.scheduler, row, now))
+        if self._cooling and row in self._cooling_rows():
+            weight = max(1, round(weight * COOLDOWN_FACTOR))
+        return weight
+
+    def _cooling_rows(self):
+        return {row for _, row in self._cooling}
+
+    def _set(self, row, weight):
+        """更新一道题的权重，筛选结果的子树（若包含该题）同步更新"""
+        self.tree.set(row, weight)
+        positions = self._sub_key
+        if positions is not None:
+            i = index_of(positions, row)
+            if i is not None:
+                self._sub_tree.set(i, weight)
+
+    def update(self, row):
+        """某题的作答记录变化后重新计算权重"""
+        self._set(row, self._weight(row, self.clock()))
+
+    def sample(self, rng, positions=None):
+        """抽一道题的行号；positions 为当前筛选结果（升序下标序列），None 表示全题库"""
+        if positions is not None and len(positions) == 0:
+            return None
+        if positions is None or len(positions) == self.tree.size:
+            row = self.tree.sample(rng)
+        else:
+            row = self._sample_within(rng, positions)
+        if row is not None:
+            self._mark_drawn(row)
+        return row
+
+    def _sample_within(self, rng, positions):
+        for _ in range(REJECTION_TRIES):
+            row = self.tree.sample(rng)
+            if row is not None and index_of(positions, row) is not None:
+                return row
+
+        # 筛选结果只占总权重的一小部分：对筛选结果单独建树，条件不变时复用
+        if self._sub_key is not positions:
+            weights = self.tree.weights
+            self._sub_tree = FenwickTree([weights[row] for row in positions])
+            self._sub_key = positions
+        i = self._sub_tree.sample(rng)
+        return None if i is None else positions[i]
+
+    def _mark_drawn(self, row):
+        """抽到的题进入冷却，到期的冷却题恢复权重"""
+        self._draws += 1
+        now = self.clock()
+        cooling = self._cooling
+        while cooling and cooling[0][0] <= self._draws:
+            _, expired = cooling.popleft()
+            self._set(expired, self._weight(expired, now))
+        cooling.append((self._draws + COOLDOWN_DRAWS, row))
+        self._set(row, self._weight(row, now))
+
+
+def index_of(positions, row):
+    """row 在升序下标序列中的位置，不在其中时为 None"""
+    if isinstance(positions, range):
+        return positions.index(row) if row in positions else None
+    if hasattr(positions, 'index_of'):   # question_index.BitPositions
+        return positions.index_of(row)
+    i = bisect_left(positions, row)
+    if i < len(positions) and positions[i] == row:
+        return i
+    return None
+
+
+class ShuffleDeck:
+    """[0, size) 上不重复的伪随机顺序，O(1) 内存"""
+
+    ROUNDS = 4
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        bits += bits & 1
+        self._half = bits // 2
+        self._mask = (1 << self._half) - 1
+        rng = random.Random(seed)
+        self._keys = [rng.getrandbits(32) for _ in range(self.ROUNDS)]
+
+    def _permute(self, x):
+        half, mask = self._half, self._mask
+        left, right = x >> half, x & mask
+        for key in self._keys:
+            mixed = ((right ^ key) * 0x9E3779B1) & 0xFFFFFFFF
+            left, right = right, left ^ ((mixed >> 11 ^ mixed) & mask)
+        return left << half | right
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        x = self._permute(i)
+        while x >= self.size:
+            x = self._permute(x)
+        return x
+
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
@@ -0,0 +1,357 @@
+"""题库近似去重（MinHash + LSH）
+
+合并来的题库里同一道题常以略有不同的措辞、不同的选项顺序出现多次。
+本工具：
+
+1. 规范化：题干、选项做 NFKC、转小写、去掉空白和标点，选项按文本排序，
+   因此只是选项顺序不同的两道题规范化后完全相同；
+2. MinHash：规范化文本取字符 3-gram，用 numpy 对整块题目一次算出
+   num_perm 个“乘法移位”哈希的最小值作为签名；
+3. LSH：签名分成 bands 段，每段相同的题落进同一个桶，只比较同桶的题，
+   按签名估计的 Jaccard 相似度不低于阈值才认定为重复，连通分量即为
+   一组近似重复题，整体是近线性的；
+4. 组内按正确选项的文本再分组：答案不一致的题（常见于“正确的是 / 错误
+   的是”只差一字）不合并，列入报告供人工核对；
+5. 每组保留一道（优先有解析的，其次最先出现的），其余题的标签并入保留
+   的题，写出去重后的题库和合并报告（JSON）。
+
+用法::
+
+    python bank_dedup.py                                  # 桌面上的 combined_question_bank.qbk
+    python bank_dedup.py bank.qbk -o bank_dedup.qbk --report merge_report.json --threshold 0.85
+
+答题进度以题目 id 为键，被合并掉的题的进度不会迁移，报告里列出了
+被合并题 id 到保留题 id 的对应关系。
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+
+from question_bank_file import BANK_SUFFIX, BankWriter
+from question_index import question_tags
+from question_store import LETTERS, load_store
+from search_index import normalize
+
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_NUM_PERM = 64
+DEFAULT_BANDS = 16
+DEFAULT_CHUNK_SIZE = 4096
+
+# 哈希矩阵按这么多个排列一组计算，限制临时数组的大小
+PERM_BATCH = 16
+# 同一个桶里依次换“组长”比较的最多轮数
+MAX_LEADER_ROUNDS = 8
+
+_STRIP_RE = re.compile(r'[\W_]+')
+_GRAM_MULTIPLIERS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+_MIX = np.uint64(0xFF51AFD7ED558CCD)
+
+
+def canonical(text):
+    """NFKC + 小写 + 去掉空白和标点"""
+    return _STRIP_RE.sub('', normalize(text or ''))
+
+
+def canonical_text(store, row):
+    """一道题参与相似度比较的文本：题干和排序后的选项（题型另行比较）
+
+    判断题的选项几乎总是“正确 / 错误”，不带信息，只会抬高短题干之间的
+    相似度，因此只比较题干。
+    """
+    stem = canonical(store.text(row, 'stem'))
+    if store.type_name(row) == 'judge':
+        return stem
+    options = sorted(canonical(option) for option in store.text(row, 'options'))
+    return '|'.join([stem] + options)
+
+
+def answer_key(store, row):
+    """正确选项的规范化文本集合，与选项顺序无关"""
+    options = store.text(row, 'options')
+    answer = store.answer_text(row)
+    return frozenset(canonical(options[i]) for i, letter in enumerate(LETTERS[:len(options)])
+                     if letter in answer)
+
+
+class MinHasher:
+    """字符 3-gram 上的 MinHash：h_k(x) = (a_k * x + b_k) mod 2^64 的高 32 位"""
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 1 << 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+
+    def signatures(self, texts):
+        """一批文本 -> (len(texts), num_perm) 的 uint32 签名矩阵"""
+        # 拼成一个以 \0 分隔的长串，整体取 3-gram，再丢掉跨越分隔符的
+        texts = [text.ljust(3, '\x01') for text in texts]
+        joined = '\0'.join(texts) + '\0'
+        codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        first, second, third = codes[:-2], codes[1:-1], codes[2:]
+        valid = (first != 0) & (second != 0) & (third != 0)
+        grams = (first * _GRAM_MULTIPLIERS[0] + second * _GRAM_MULTIPLIERS[1] + third)[valid]
+        grams ^= grams >> np.uint64(29)
+        grams *= _MIX
+
+        # 每段文本的 3-gram 在 grams 中是连续的一段，长度 len(text) - 2
+        counts = np.fromiter((len(text) - 2 for text in texts), dtype=np.int64, count=len(texts))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        shift = np.uint64(32)
+        for k in range(0, self.num_perm, PERM_BATCH):
+            a = self.a[k:k + PERM_BATCH, None]
+            b = self.b[k:k + PERM_BATCH, None]
+            hashed = ((grams[None, :] * a + b) >> shift).astype(np.uint32)
+            result[:, k:k + PERM_BATCH] = np.minimum.reduceat(hashed, starts, axis=1).T
+        return result
+
+
+def compute_signatures(store, hasher, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """整个题库的签名矩阵，按块计算"""
+    n = len(store)
+    signatures = np.empty((n, hasher.num_perm), dtype=np.uint32)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        signatures[start:stop] = hasher.signatures([canonical_text(store, row)
+                                                    for row in range(start, stop)])
+        if progress is not None:
+            progress(stop, n)
+    return signatures
+
+
+def _similarity(signatures, a, b):
+    """按签名估计的 Jaccard 相似度（相同 MinHash 值的比例）"""
+    out = np.empty(len(a), dtype=np.float32)
+    step = 1 << 16
+    for i in range(0, len(a), step):
+        out[i:i + step] = (signatures[a[i:i + step]] == signatures[b[i:i + step]]).mean(axis=1)
+    return out
+
+
+def _band_keys(signatures, band, rows_per_band):
+    """某一段签名 -> 每题一个 uint64 桶键"""
+    columns = signatures[:, band * rows_per_band:(band + 1) * rows_per_band].astype(np.uint64)
+    key = np.zeros(len(signatures), dtype=np.uint64)
+    for j in range(columns.shape[1]):
+        key = key * _MIX + columns[:, j]
+    return key
+
+
+def candidate_pairs(signatures, threshold, bands=DEFAULT_BANDS, types=None):
+    """LSH 找出相似度不低于 threshold（且题型相同）的题对，返回两个行号数组
+
+    每个桶里先让所有成员与第一个成员（组长）比较，没比上的成员在下一轮
+    以其中第一个为新组长再比较，全部用向量运算完成，不枚举桶内所有题对。
+    """
+    n, num_perm = signatures.shape
+    rows_per_band = num_perm // bands
+    pair_a = []
+    pair_b = []
+    for band in range(bands):
+        keys = _band_keys(signatures, band, rows_per_band)
+        rows = np.argsort(keys, kind='stable')
+        keys = keys[rows]
+        for _ in range(MAX_LEADER_ROUNDS):
+            if len(rows) < 2:
+                break
+            run_start = np.empty(len(rows), dtype=bool)
+            run_start[0] = True
+            run_start[1:] = keys[1:] != keys[:-1]
+            # 只剩自己一个的桶不用再比
+            alone = run_start.copy()
+            alone[:-1] &= run_start[1:]
+            keep = ~alone
+            rows, keys, run_start = rows[keep], keys[keep], run_start[keep]
+            if not len(rows):
+                break
+            leaders = rows[np.maximum.accumulate(np.where(run_start, np.arange(len(rows)), 0))]
+            members = ~run_start
+            a, b = rows[members], leaders[members]
+            matched = _similarity(signatures, a, b) >= threshold
+            if types is not None:
+                matched &= types[a] == types[b]
+            pair_a.append(a[matched])
+            pair_b.append(b[matched])
+            rest = members.copy()
+            rest[members] = ~matched
+            rows, keys = rows[rest], keys[rest]
+    if not pair_a:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(pair_a), np.concatenate(pair_b)
+
+
+def connected_components(n, a, b):
+    """题对构成的图的连通分量：每题的分量标号（分量中最小的行号）"""
+    labels = np.arange(n)
+    while True:
+        low = np.minimum(labels[a], labels[b])
+        before = labels.copy()
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        # 指针跳跃，直到每个标号都指向根
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, before):
+            return labels
+
+
+def find_duplicates(store, threshold=DEFAULT_THRESHOLD, num_perm=DEFAULT_NUM_PERM,
+                    bands=DEFAULT_BANDS, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """近似重复题分组：[[行号, ...], ...]（每组至少两题，组内按行号升序）及签名矩阵"""
+    if num_perm % bands:
+        raise ValueError("num_perm 必须是 bands 的整数倍")
+    signatures = compute_signatures(store, MinHasher(num_perm), chunk_size, progress)
+    types = np.frombuffer(store.type_codes, dtype=np.int8)
+    a, b = candidate_pairs(signatures, threshold, bands, types)
+    labels = connected_components(len(store), a, b)
+    # 只看不是单独成组的题：标号不是自己，或有别的题以自己为标号
+    rows = np.arange(len(store))
+    in_group = labels != rows
+    in_group[labels[in_group]] = True
+    rows = rows[in_group]
+    rows = rows[np.argsort(labels[rows], kind='stable')]
+    boundaries = np.nonzero(np.diff(labels[rows]))[0] + 1
+    groups = [group.tolist() for group in np.split(rows, boundaries)] if len(rows) else []
+    return groups, signatures
+
+
+def plan_merges(store, groups, signatures, threshold=DEFAULT_THRESHOLD):
+    """组内按答案再分组，选出保留的题
+
+    连通分量可能经由中间的题把并不相似的两题连在一起，因此只合并与保留
+    的题本身相似度不低于阈值的题。返回 (合并列表, 冲突列表)：合并为
+    (保留行号, [被合并行号], 最低相似度)，冲突为答案不一致的整组行号。
+    """
+    # 按行号顺序一次读出组内各题的答案和有无解析，二进制题库顺序读取时块缓存命中
+    answers = {}
+    explained = set()
+    for row in sorted(row for group in groups for row in group):
+        answers[row] = answer_key(store, row)
+        if store.text(row, 'explanation'):
+            explained.add(row)
+
+    merges = []
+    conflicts = []
+    for group in groups:
+        by_answer = {}
+        for row in group:
+            by_answer.setdefault(answers[row], []).append(row)
+        if len(by_answer) > 1:
+            conflicts.append(group)
+        for rows in by_answer.values():
+            if len(rows) < 2:
+                continue
+            keep = max(rows, key=lambda row: (row in explained, -row))
+            others = np.array([row for row in rows if row != keep])
+            similarity = _similarity(signatures, others, np.full(len(others), keep))
+            close = similarity >= threshold
+            if close.any():
+                merges.append((keep, others[close].tolist(), float(similarity[close].min())))
+    return merges, conflicts
+
+
+def question_dict(store, row):
+    question = {key: store.field(row, key) for key in ('id', 'type', 'stem', 'options', 'answer')}
+    explanation = store.text(row, 'explanation')
+    if explanation:
+        question['explanation'] = explanation
+    question.update(store.meta(row))
+    return question
+
+
+def write_deduped(store, merges, output):
+    """写出去重后的题库（保持原顺序），被合并题的标签并入保留的题"""
+    removed = set()
+    extra_tags = {}
+    for keep, others, _ in merges:
+        removed.update(others)
+        tags = [tag for row in others for tag in question_tags(store.meta(row))]
+        if tags:
+            extra_tags[keep] = tags
+    writer = BankWriter(output)
+    try:
+        for row in range(len(store)):
+            if row in removed:
+                continue
+            question = question_dict(store, row)
+            if row in extra_tags:
+                tags = list(question_tags(question))
+                question['tags'] = tags + [tag for tag in dict.fromkeys(extra_tags[row])
+                                           if tag not in tags]
+            writer.add(question)
+    except BaseException:
+        writer.close()
+        raise
+    return writer.finish()
+
+
+def merge_report(store, merges, conflicts, source, threshold):
+    ids = store.ids
+    return {
+        'source': source,
+        'threshold': threshold,
+        'total': len(store),
+        'removed': sum(len(others) for _, others, _ in merges),
+        'merged_groups': [{'keep': ids[keep], 'merged': [ids[row] for row in others],
+                           'similarity': round(similarity, 3)}
+                          for keep, others, similarity in merges],
+        'answer_conflicts': [[ids[row] for row in group] for group in conflicts],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="题库近似去重（MinHash + LSH）")
+    parser.add_argument('bank', nargs='?', help="题库文件（.qbk 或 .json，默认桌面上的 combined_question_bank.qbk）")
+    parser.add_argument('-o', '--output', help="去重后的题库（默认在原文件名后加 _dedup）")
+    parser.add_argument('--report', help="合并报告 JSON（默认与输出同名 .json）")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="相似度阈值（0–1）")
+    parser.add_argument('--num-perm', type=int, default=DEFAULT_NUM_PERM)
+    parser.add_argument('--bands', type=int, default=DEFAULT_BANDS)
+    parser.add_argument('--dry-run', action='store_true', help="只写报告，不写题库")
+    args = parser.parse_args()
+
+    source = args.bank or os.path.join(os.path.expanduser("~"), "Desktop",
+                                       'combined_question_bank' + BANK_SUFFIX)
+    output = args.output or os.path.splitext(source)[0] + '_dedup' + BANK_SUFFIX
+    report_path = args.report or os.path.splitext(output)[0] + '.json'
+    try:
+        store = load_store(source)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ 打开题库失败: {e}")
+
+    started = time.perf_counter()
+
+    def progress(done, total):
+        if done == total or done % (DEFAULT_CHUNK_SIZE * 64) == 0:
+            print(f"⏳ 已计算签名 {done}/{total}")
+
+    try:
+        groups, signatures = find_duplicates(store, args.threshold, args.num_perm, args.bands,
+                                             progress=progress)
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    merges, conflicts = plan_merges(store, groups, signatures, args.threshold)
+    report = merge_report(store, merges, conflicts, source, args.threshold)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+
+    print(f"📊 {len(groups)} 组近似重复，可合并 {report['removed']} 题，"
+          f"{len(conflicts)} 组答案不一致（未合并）；报告见 {report_path}")
+    if not args.dry_run:
+        count = write_deduped(store, merges, output)
+        print(f"✅ 已写入 {output}，共{count}题")
+    print(f"⏱️ 用时 {time.perf_counter() - started:.1f} 秒")
+
+
+if __name__ == "__main__":
+    main()
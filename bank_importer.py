@@ -0,0 +1,470 @@
+"""导入 JSONL / CSV / XLSX 题库
+
+按块流式读取源文件，在进程池里逐条解析、校验（与 show_question 对题目
+的要求一致：题型有效、题干非空、判断题恰好 2 个选项、答案字母在选项
+范围内且个数与题型相符），通过校验的题目按源文件顺序交给 BankWriter
+逐块写出 .qbk 二进制题库。任何时刻内存中只有进程池里的几块原始行，
+多 GB 的源文件也不会整体读入。
+
+有问题的记录跳过并报告行号（XLSX 为表格行号），--strict 时只要有错误
+就不写出题库。
+
+JSONL 每行一个题目对象，字段同题库格式（id、type、stem、options、answer、
+explanation、chapter、tags、difficulty）。CSV / XLSX 第一行为表头，中英文
+列名均可（题号、题型、题干、选项、答案、解析、章节、标签、难度）；选项
+可以放在 A–H（或“选项A”“option_a”）各列，也可以在一列里用 | 或换行分隔。
+题型可写 single / 单选 / 单选题 等；判断题答案可写 正确 / 错误 / 对 / 错，
+缺少选项时默认为“正确 / 错误”。没有题号的题按出现顺序编号。
+
+用法::
+
+    python bank_importer.py bank.jsonl                      # 写到桌面上的 combined_question_bank.qbk
+    python bank_importer.py bank.xlsx --sheet 题库 -o bank.qbk --errors errors.tsv
+    python bank_importer.py bank.csv --encoding gbk --workers 4 --strict
+
+读取 .xlsx 需要安装 openpyxl。
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from question_bank_file import BANK_SUFFIX, BankWriter
+
+DEFAULT_CHUNK_SIZE = 2000
+MAX_PRINTED_ERRORS = 20
+PROGRESS_EVERY = 100000
+
+MAX_OPTIONS = 8
+JUDGE_OPTIONS = ["正确", "错误"]
+
+# 表头别名 -> 字段名
+COLUMN_ALIASES = {
+    'id': 'id', '题号': 'id', '编号': 'id',
+    'type': 'type', '题型': 'type',
+    'stem': 'stem', 'question': 'stem', '题干': 'stem', '题目': 'stem',
+    'options': 'options', '选项': 'options',
+    'answer': 'answer', '答案': 'answer',
+    'explanation': 'explanation', 'analysis': 'explanation', '解析': 'explanation',
+    'chapter': 'chapter', '章节': 'chapter',
+    'tags': 'tags', '标签': 'tags',
+    'difficulty': 'difficulty', '难度': 'difficulty',
+}
+_OPTION_COLUMN_RE = re.compile(r'^(?:option_?|选项)?([a-h])$')
+
+TYPE_ALIASES = {
+    'single': 'single', '单选': 'single', '单选题': 'single',
+    'multiple': 'multiple', '多选': 'multiple', '多选题': 'multiple',
+    'judge': 'judge', '判断': 'judge', '判断题': 'judge',
+}
+JUDGE_ANSWERS = {
+    '正确': 'A', '对': 'A', '√': 'A', 'true': 'A', 't': 'A', 'yes': 'A', '是': 'A',
+    '错误': 'B', '错': 'B', '×': 'B', 'false': 'B', 'f': 'B', 'no': 'B', '否': 'B',
+}
+_ANSWER_SEPARATORS = str.maketrans('', '', ' ,，、|;；')
+_OPTION_SPLIT_RE = re.compile(r'\s*(?:\||\n)\s*')
+_TAG_SPLIT_RE = re.compile(r'\s*[,，]\s*')
+
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+# 导入结果：写出的题数、错误列表 [(行号, 说明)]
+ImportResult = namedtuple('ImportResult', 'imported errors')
+
+
+class RecordError(ValueError):
+    """单条记录不符合题库格式"""
+
+
+# ---- 单条记录的解析与校验（在工作进程中运行） ----
+
+def _blank(value):
+    return value is None or (value.__class__ is str and not value.strip())
+
+
+def _to_int(value, what):
+    """整数或形如整数的字符串 / 浮点数（表格里的数字常被读成 3.0）"""
+    if isinstance(value, bool):
+        raise RecordError(f"{what}不是整数: {value!r}")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise RecordError(f"{what}不是整数: {value!r}")
+        return int(value)
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        raise RecordError(f"{what}不是整数: {value!r}") from None
+
+
+def _scalar(value):
+    """标签、难度只接受字符串和数字（布尔值不算）"""
+    return isinstance(value, (str, int, float)) and not isinstance(value, bool)
+
+
+def _text(value):
+    if value.__class__ is str:
+        return value.strip()
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _options(value):
+    if _blank(value):
+        return []
+    if isinstance(value, str):
+        options = _OPTION_SPLIT_RE.split(value.strip())
+    elif isinstance(value, (list, tuple)):
+        options = ['' if option is None else _text(option) for option in value]
+    else:
+        raise RecordError(f"选项格式无效: {value!r}")
+    # 表格里 A–H 列末尾的空列不算选项
+    while options and not options[-1]:
+        options.pop()
+    for i, option in enumerate(options):
+        if not option:
+            raise RecordError(f"选项 {chr(65 + i)} 为空")
+    return options
+
+
+def _answer(value, qtype, option_count):
+    if _blank(value):
+        raise RecordError("缺少答案")
+    answer = _text(value)
+    if qtype == 'judge' and answer.lower() in JUDGE_ANSWERS:
+        return JUDGE_ANSWERS[answer.lower()]
+    letters = answer.translate(_ANSWER_SEPARATORS).upper()
+    if not letters:
+        # 只有分隔符（如 "," "、"）等于没填
+        raise RecordError("缺少答案")
+    for letter in letters:
+        i = ord(letter) - 65
+        if not 0 <= i < option_count:
+            raise RecordError(f"答案 {answer!r} 超出选项范围（共{option_count}个选项）")
+    letters = ''.join(sorted(set(letters)))
+    if qtype != 'multiple' and len(letters) != 1:
+        raise RecordError(f"{'判断题' if qtype == 'judge' else '单选题'}答案必须恰好一个选项: {answer!r}")
+    return letters
+
+
+def normalize_question(record):
+    """校验一条原始记录并转为题库格式的题目字典（缺题号时 id 为 None）"""
+    if not isinstance(record, dict):
+        raise RecordError("记录不是对象")
+
+    qtype = TYPE_ALIASES.get(_text(record.get('type', '')).lower())
+    if qtype is None:
+        raise RecordError(f"题型无效: {record.get('type')!r}")
+
+    stem = record.get('stem')
+    if _blank(stem):
+        raise RecordError("题干为空")
+
+    options = _options(record.get('options'))
+    if qtype == 'judge':
+        if not options:
+            options = list(JUDGE_OPTIONS)
+        elif len(options) != 2:
+            raise RecordError(f"判断题必须恰好有2个选项（实际{len(options)}个）")
+    elif len(options) < 2:
+        raise RecordError(f"选择题至少需要2个选项（实际{len(options)}个）")
+    elif len(options) > MAX_OPTIONS:
+        raise RecordError(f"选项不能超过{MAX_OPTIONS}个（实际{len(options)}个）")
+
+    question = {
+        'id': None,
+        'type': qtype,
+        'stem': _text(stem),
+        'options': options,
+        'answer': _answer(record.get('answer'), qtype, len(options)),
+    }
+    if not _blank(record.get('id')):
+        qid = _to_int(record['id'], "题号")
+        if not INT64_MIN <= qid <= INT64_MAX:
+            raise RecordError(f"题号超出范围: {qid}")
+        question['id'] = qid
+
+    if not _blank(record.get('explanation')):
+        question['explanation'] = _text(record['explanation'])
+    if not _blank(record.get('chapter')):
+        question['chapter'] = _text(record['chapter'])
+    tags = record.get('tags')
+    if isinstance(tags, str):
+        tags = [tag for tag in _TAG_SPLIT_RE.split(tags.strip()) if tag]
+    elif isinstance(tags, (list, tuple)):
+        if not all(_scalar(tag) for tag in tags if tag is not None):
+            raise RecordError(f"标签格式无效: {tags!r}")
+        tags = [_text(tag) for tag in tags if not _blank(tag)]
+    elif tags is not None:
+        raise RecordError(f"标签格式无效: {tags!r}")
+    if tags:
+        question['tags'] = tags
+    difficulty = record.get('difficulty')
+    if not _blank(difficulty):
+        if not _scalar(difficulty):
+            raise RecordError(f"难度格式无效: {difficulty!r}")
+        if isinstance(difficulty, str):
+            difficulty = difficulty.strip()
+            if difficulty.lstrip('-').isdigit():
+                difficulty = int(difficulty)
+        elif isinstance(difficulty, float) and difficulty.is_integer():
+            difficulty = int(difficulty)
+        question['difficulty'] = difficulty
+    return question
+
+
+def map_columns(header):
+    """表头 -> [(列号, 字段名或选项序号)]，无法识别的列忽略"""
+    columns = []
+    for i, name in enumerate(header):
+        if _blank(name):
+            continue
+        key = _text(name).lower()
+        if key in COLUMN_ALIASES:
+            columns.append((i, COLUMN_ALIASES[key]))
+            continue
+        match = _OPTION_COLUMN_RE.match(key)
+        if match:
+            columns.append((i, ord(match.group(1)) - 97))
+    return columns
+
+
+def _row_record(columns, row):
+    record = {}
+    options = {}
+    for i, key in columns:
+        value = row[i] if i < len(row) else None
+        if isinstance(key, int):
+            options[key] = value
+        else:
+            record[key] = value
+    if options and _blank(record.get('options')):
+        record['options'] = [options.get(i) for i in range(max(options) + 1)]
+    return record
+
+
+def validate_chunk(kind, columns, items):
+    """校验一块 (行号, 原始行)，返回 ([(行号, 题目)], [(行号, 错误说明)])"""
+    questions = []
+    errors = []
+    for line, raw in items:
+        try:
+            if kind == 'jsonl':
+                try:
+                    record = json.loads(raw)
+                except ValueError as e:
+                    raise RecordError(f"JSON 格式错误: {e}") from None
+            else:
+                record = _row_record(columns, raw)
+            questions.append((line, normalize_question(record)))
+        except RecordError as e:
+            errors.append((line, str(e)))
+    return questions, errors
+
+
+# ---- 流式读取源文件（主进程） ----
+
+def _chunked(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _jsonl_lines(path, encoding):
+    with open(path, encoding=encoding) as f:
+        for line, text in enumerate(f, 1):
+            if text.strip():
+                yield line, text
+
+
+def _csv_rows(path, encoding, delimiter):
+    with open(path, encoding=encoding, newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield map_columns(header)
+        line = reader.line_num
+        for row in reader:
+            # 带引号的单元格可以跨行，报告记录开始的那一行
+            start, line = line + 1, reader.line_num
+            if any(cell.strip() for cell in row):
+                yield start, row
+
+
+def _xlsx_rows(path, sheet):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("读取 .xlsx 需要安装 openpyxl（pip install openpyxl）") from None
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = enumerate(worksheet.iter_rows(values_only=True), 1)
+        for _, header in rows:
+            if any(not _blank(cell) for cell in header):
+                yield map_columns(header)
+                break
+        for line, row in rows:
+            if any(not _blank(cell) for cell in row):
+                yield line, row
+    finally:
+        workbook.close()
+
+
+def detect_format(path):
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if suffix in ('.csv', '.tsv'):
+        return 'csv'
+    if suffix in ('.xlsx', '.xlsm'):
+        return 'xlsx'
+    raise ValueError(f"无法从扩展名识别源文件格式: {path}（可用 --format 指定）")
+
+
+def read_chunks(path, kind=None, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8-sig', sheet=None):
+    """逐块产出 validate_chunk 的参数 (格式, 列映射, [(行号, 原始行)])"""
+    kind = kind or detect_format(path)
+    if kind == 'jsonl':
+        for chunk in _chunked(_jsonl_lines(path, encoding), chunk_size):
+            yield 'jsonl', None, chunk
+        return
+    if kind == 'csv':
+        delimiter = '\t' if path.lower().endswith('.tsv') else ','
+        rows = _csv_rows(path, encoding, delimiter)
+    elif kind == 'xlsx':
+        rows = _xlsx_rows(path, sheet)
+    else:
+        raise ValueError(f"不支持的源文件格式: {kind}")
+    columns = next(rows, None)
+    if columns is None:
+        return
+    names = {key for _, key in columns}
+    missing = [name for name in ('type', 'stem', 'answer') if name not in names]
+    if missing:
+        raise ValueError(f"表头缺少必需的列: {', '.join(missing)}")
+    for chunk in _chunked(rows, chunk_size):
+        yield 'table', columns, chunk
+
+
+def _validated(chunks, workers):
+    """按源文件顺序产出各块的校验结果；进程池里同时最多 2 x workers 块"""
+    if workers <= 1:
+        for chunk in chunks:
+            yield validate_chunk(*chunk)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(validate_chunk, *chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_bank(source, output, kind=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                encoding='utf-8-sig', sheet=None, strict=False, compress=True, on_error=None):
+    """把源文件导入为 .qbk 题库，返回 ImportResult
+
+    on_error(行号, 说明) 在发现每个错误时调用；strict 为真且有错误时不写出题库。
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    errors = []
+
+    def report(line, message):
+        errors.append((line, message))
+        if on_error is not None:
+            on_error(line, message)
+
+    seen_ids = set()
+    next_id = 1
+    writer = BankWriter(output, compress)
+    try:
+        processed = 0
+        for questions, chunk_errors in _validated(read_chunks(source, kind, chunk_size, encoding, sheet),
+                                                  workers):
+            # 块内错误和题目都按行号有序，合并后按源文件顺序处理
+            chunk_errors = deque(chunk_errors)
+            for line, question in questions:
+                while chunk_errors and chunk_errors[0][0] < line:
+                    report(*chunk_errors.popleft())
+                qid = question['id']
+                if qid is None:
+                    qid = question['id'] = next_id
+                if qid in seen_ids:
+                    report(line, f"题号重复: {qid}")
+                    continue
+                seen_ids.add(qid)
+                next_id = max(next_id, qid + 1)
+                writer.add(question)
+            for error in chunk_errors:
+                report(*error)
+            before, processed = processed, processed + len(questions)
+            if processed // PROGRESS_EVERY > before // PROGRESS_EVERY:
+                print(f"⏳ 已导入 {writer.count} 题")
+    except BaseException:
+        writer.close()
+        raise
+    if strict and errors:
+        writer.close()
+        return ImportResult(0, errors)
+    return ImportResult(writer.finish(), errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导入 JSONL / CSV / XLSX 题库为二进制 .qbk 格式")
+    parser.add_argument('source', help="源文件（.jsonl / .csv / .tsv / .xlsx）")
+    parser.add_argument('-o', '--output', help="输出路径（默认桌面上的 combined_question_bank.qbk）")
+    parser.add_argument('--format', choices=('jsonl', 'csv', 'xlsx'), help="源文件格式（默认按扩展名）")
+    parser.add_argument('--sheet', help="XLSX 工作表名（默认第一个）")
+    parser.add_argument('--encoding', default='utf-8-sig', help="JSONL / CSV 文本编码")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="校验进程数")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--errors', help="把全部错误写入此文件（行号<TAB>说明）")
+    parser.add_argument('--strict', action='store_true', help="有任何错误时不写出题库")
+    parser.add_argument('--no-compress', action='store_true', help="字符串堆不压缩")
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(os.path.expanduser("~"), "Desktop",
+                                         'combined_question_bank' + BANK_SUFFIX)
+    error_file = open(args.errors, 'w', encoding='utf-8') if args.errors else None
+    printed = [0]
+
+    def on_error(line, message):
+        if printed[0] < MAX_PRINTED_ERRORS:
+            print(f"❌ 第{line}行: {message}")
+        printed[0] += 1
+        if error_file is not None:
+            error_file.write(f"{line}\t{message}\n")
+
+    try:
+        result = import_bank(args.source, output, args.format, args.workers, args.chunk_size,
+                             args.encoding, args.sheet, args.strict, not args.no_compress, on_error)
+    except (OSError, ValueError, ImportError) as e:
+        raise SystemExit(f"❌ 导入失败: {e}")
+    finally:
+        if error_file is not None:
+            error_file.close()
+
+    errors = len(result.errors)
+    if errors > MAX_PRINTED_ERRORS:
+        print(f"⚠️ 另有 {errors - MAX_PRINTED_ERRORS} 处错误未显示" +
+              (f"，全部错误见 {args.errors}" if args.errors else ""))
+    if args.strict and errors:
+        raise SystemExit(f"❌ 共 {errors} 处错误，未写出题库")
+    print(f"✅ 已写入 {output}，共{result.imported}题" + (f"，跳过 {errors} 条有问题的记录" if errors else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""后台加载题库
+
+BankLoader 在工作线程里分块加载题库、建立筛选索引、恢复答题进度，再
+打开（必要时建立）检索索引，每一步的结果都作为消息放进线程安全的
+队列，由界面线程定时取出处理（tkinter 只能在主线程里调用）：
+
+    ('progress', 已读题数, 总题数, 各题型数量)   每读完一块
+    ('first', 第一题)                           第一块读完，题目为 Question（只读第 0 行）
+    ('ready', 引擎)                             题库读完、筛选索引和答题进度就绪
+    ('search', 检索索引)                        检索索引就绪，可能为 None
+    ('error', 异常)                             加载失败
+
+第一题只读题库第 0 行，这一行写入后不再变化，界面线程读它不会与工作线程
+冲突。引擎交出之后工作线程不再碰它；检索索引建好后也只是作为消息交回，由
+界面线程调用 engine.set_search_index() 挂上。
+"""
+
+import queue
+import threading
+
+from perf_monitor import monitor
+from question_bank_file import TYPE_NAMES
+from quiz_engine import QuizEngine, load_question_bank_chunks
+from search_index import load_search_index
+
+
+class BankLoader:
+    """在后台线程中加载题库，进度和结果通过 messages 队列交给界面线程"""
+
+    def __init__(self, profile_dir=None, chunks=load_question_bank_chunks):
+        self.profile_dir = profile_dir
+        self.messages = queue.Queue()
+        self._chunks = chunks
+        # 守护线程：加载途中关闭窗口不必等待
+        self._thread = threading.Thread(target=self._run, name="bank-loader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def poll(self):
+        """取出目前已到达的全部消息（界面线程调用，不阻塞）"""
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def _run(self):
+        try:
+            self._load()
+        except Exception as e:
+            self.messages.put(('error', e))
+
+    def _load(self):
+        put = self.messages.put
+        store = None
+        counted = 0
+        type_counts = dict.fromkeys(TYPE_NAMES, 0)
+        with monitor.span('load_question_bank'):
+            for chunk_store, loaded, total in self._chunks():
+                if chunk_store is not store:
+                    # 首块，或二进制题库出错后换成了后备题库
+                    store = chunk_store
+                    counted = 0
+                    type_counts = dict.fromkeys(TYPE_NAMES, 0)
+                    if loaded:
+                        put(('first', store[0]))
+                chunk = store.type_codes[counted:loaded]
+                for code, name in enumerate(TYPE_NAMES):
+                    type_counts[name] += chunk.count(code)
+                counted = loaded
+                put(('progress', loaded, total, dict(type_counts)))
+
+        with monitor.span('build_engine'):
+            engine = QuizEngine(store)
+            if self.profile_dir is not None:
+                engine.open_journal(self.profile_dir)
+        put(('ready', engine))
+
+        # 检索索引可能需要现建，最慢，放在最后；题库本身只读，可以与界面线程并行
+        try:
+            index = load_search_index(store)
+        except (OSError, ValueError) as e:
+            print(f"❌ 建立检索索引失败: {e}")
+            index = None
+        put(('search', index))
@@ -0,0 +1,150 @@
+"""批量判分
+
+把答题卡编码成 uint8 位掩码矩阵（答题卡 x 题目），一次性与标准答案比较，
+得到每张答题卡的得分和逐题对错矩阵。判对的条件与界面上逐题提交完全
+一致：标准答案是规范写法且所选掩码与之相等（见 question_store）。
+
+多选题可选部分得分：没有选错项时按选对的比例给分，选错任何一项得 0 分。
+
+用法::
+
+    python batch_grader.py sheets.csv --bank combined_question_bank.qbk -o scores.csv
+    python batch_grader.py sheets.csv --bank bank.json --partial --matrix correct.npy
+
+答题卡 CSV 第一列为答题卡编号，表头其余各列为题目 id，单元格为所选字母。
+"""
+
+import argparse
+import csv
+from collections import namedtuple
+
+import numpy as np
+
+from question_bank_file import TYPE_CODES
+from question_store import letters_to_mask, load_store
+
+# 每张答题卡的得分、逐题对错（bool）和逐题得分比例（float）
+GradeResult = namedtuple('GradeResult', 'scores correct credit')
+
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+DEFAULT_CHUNK_SIZE = 4096
+
+
+def encode_answers(answers):
+    """字母答案（任意形状的字符串数组）-> uint8 位掩码数组，空答案为 0"""
+    answers = np.asarray(answers, dtype=object)
+    unique, inverse = np.unique(answers.ravel().astype(str), return_inverse=True)
+    masks = np.array([letters_to_mask(a.strip().upper()) for a in unique], dtype=np.uint8)
+    return masks[inverse].reshape(answers.shape)
+
+
+class BatchGrader:
+    """按列（题目）给定标准答案，对整批答题卡判分"""
+
+    def __init__(self, answer_masks, type_codes, points=None, partial_credit=False):
+        self.answer_masks = np.asarray(answer_masks, dtype=np.uint8)
+        self.type_codes = np.asarray(type_codes, dtype=np.int8)
+        if points is None:
+            points = np.ones(len(self.answer_masks), dtype=np.float64)
+        self.points = np.asarray(points, dtype=np.float64)
+        self.partial_credit = partial_credit
+        self._answer_counts = _POPCOUNT[self.answer_masks]
+        self._multiple = self.type_codes == TYPE_CODES['multiple']
+
+    @classmethod
+    def from_store(cls, store, rows=None, points=None, partial_credit=False):
+        """从题库取标准答案；rows 为答题卡各列对应的题库行号"""
+        answer_masks = np.frombuffer(store.answer_masks, dtype=np.uint8)
+        type_codes = np.frombuffer(store.type_codes, dtype=np.int8)
+        if rows is not None:
+            rows = np.asarray(rows, dtype=np.intp)
+            answer_masks = answer_masks[rows]
+            type_codes = type_codes[rows]
+        return cls(answer_masks, type_codes, points, partial_credit)
+
+    def grade(self, selected):
+        """selected: (答题卡数, 题目数) 的 uint8 所选掩码矩阵"""
+        selected = np.asarray(selected, dtype=np.uint8)
+        answers = self.answer_masks
+        correct = (selected == answers) & (answers != 0)
+        credit = correct.astype(np.float64)
+
+        if self.partial_credit and self._multiple.any():
+            cols = self._multiple & (answers != 0)
+            sel = selected[:, cols]
+            ans = answers[cols]
+            no_wrong_pick = (sel & ~ans) == 0
+            partial = _POPCOUNT[sel & ans] / self._answer_counts[cols]
+            credit[:, cols] = np.where(no_wrong_pick, partial, 0.0)
+
+        scores = credit @ self.points
+        return GradeResult(scores, correct, credit)
+
+
+def read_sheets(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """流式读取答题卡 CSV：先产出表头中的题目 id，再逐块产出 (编号列表, 字母矩阵)"""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        yield [int(qid) for qid in header[1:]]
+        width = len(header) - 1
+        ids, rows = [], []
+        for line in reader:
+            if not line:
+                continue
+            ids.append(line[0])
+            cells = line[1:width + 1]
+            rows.append(cells + [''] * (width - len(cells)))
+            if len(rows) >= chunk_size:
+                yield ids, rows
+                ids, rows = [], []
+        if rows:
+            yield ids, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量判分答题卡")
+    parser.add_argument('sheets', help="答题卡 CSV")
+    parser.add_argument('--bank', required=True, help="题库文件（.qbk 或 .json）")
+    parser.add_argument('-o', '--output', default='scores.csv', help="每张答题卡的得分")
+    parser.add_argument('--matrix', help="逐题对错矩阵输出路径（.npy）")
+    parser.add_argument('--partial', action='store_true', help="多选题部分得分")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    store = load_store(args.bank)
+    chunks = read_sheets(args.sheets, args.chunk_size)
+    qids = next(chunks)
+    rows = [store.row_of(qid) for qid in qids]
+    missing = [qid for qid, row in zip(qids, rows) if row is None]
+    if missing:
+        raise SystemExit(f"❌ 题库中找不到这些题目: {missing[:10]}")
+
+    grader = BatchGrader.from_store(store, rows, partial_credit=args.partial)
+    matrices = []
+    total_sheets = 0
+    question_correct = np.zeros(len(qids), dtype=np.int64)
+    with open(args.output, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out)
+        writer.writerow(['sheet_id', 'score', 'correct'])
+        for sheet_ids, letters in chunks:
+            result = grader.grade(encode_answers(letters))
+            counts = result.correct.sum(axis=1)
+            writer.writerows(zip(sheet_ids, np.round(result.scores, 4).tolist(), counts.tolist()))
+            question_correct += result.correct.sum(axis=0)
+            total_sheets += len(sheet_ids)
+            if args.matrix:
+                matrices.append(result.correct)
+
+    if args.matrix:
+        matrix = np.concatenate(matrices) if matrices else np.zeros((0, len(qids)), dtype=bool)
+        np.save(args.matrix, matrix)
+    print(f"✅ 已判分 {total_sheets} 张答题卡，结果写入 {args.output}")
+    if total_sheets:
+        rates = question_correct / total_sheets
+        print(f"📊 平均正确率 {rates.mean() * 100:.1f}%，最低的题目 id: {qids[int(rates.argmin())]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""刷题服务器压力测试
+
+先创建 --sessions 个会话（服务器上同时存在），再开 --connections 条
+keep-alive 连接并发地替这些会话刷题：显示、提交、下一题、随机、解析、
+偶尔改筛选条件，按命令统计延迟分位数和吞吐量，并用服务器 /api/status
+报告的常驻内存估算每个会话的内存。
+
+不给 --url 时在子进程里用合成题库启动一个服务器（--size 题），测完关闭。
+
+用法::
+
+    python benchmarks/load_test.py --size 100000 --sessions 2000 --connections 100
+    python benchmarks/load_test.py --url http://127.0.0.1:8765 --sessions 500 -o load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from run_benchmarks import DEFAULT_CACHE, DEFAULT_SEED, ensure_bank, percentiles, random_answer
+
+DEFAULT_SESSIONS = 1000
+DEFAULT_CONNECTIONS = 100
+DEFAULT_OPERATIONS = 20         # 每个会话执行多少次操作
+
+# 操作及其相对频率
+OPERATIONS = (('show', 30), ('submit', 30), ('next', 15), ('random', 10),
+              ('explain', 8), ('filter', 5), ('stats', 2))
+FILTERS = ({}, {'type': 'single'}, {'type': 'judge'}, {'mode': 'wrong'},
+           {'type': 'multiple', 'status': '未答'})
+
+
+class Client:
+    """一条 keep-alive 连接上的 JSON 请求"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, payload=None, session=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload else b''
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}",
+                 f"Content-Length: {len(body)}"]
+        if session:
+            lines.append(f"X-Session: {session}")
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            if key.strip().lower() == 'content-length':
+                length = int(value)
+        data = await self.reader.readexactly(length)
+        return status, json.loads(data) if data else None
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def pick_operation(rng):
+    names = [name for name, _ in OPERATIONS]
+    weights = [weight for _, weight in OPERATIONS]
+    return rng.choices(names, weights)[0]
+
+
+async def run_load(host, port, sessions, connections, operations, seed):
+    """返回 {'latency': {命令: 分位数}, ...}"""
+    rng = random.Random(seed)
+    samples = {}
+    errors = {}
+    clock = time.perf_counter
+
+    async def timed(client, command, method, path, payload=None, session=None):
+        start = clock()
+        status, result = await client.request(method, path, payload, session)
+        samples.setdefault(command, []).append(clock() - start)
+        if status != 200:
+            errors[command] = errors.get(command, 0) + 1
+        return status, result
+
+    clients = [Client(host, port) for _ in range(min(connections, sessions))]
+    for client in clients:
+        await client.connect()
+    try:
+        _, before = await clients[0].request('GET', '/api/status')
+
+        # 创建全部会话：每条连接负责一部分
+        sids = [None] * sessions
+
+        async def create(slot, client):
+            for i in range(slot, sessions, len(clients)):
+                status, result = await timed(client, 'session', 'POST', '/api/session')
+                if status == 200:
+                    sids[i] = result['session']
+
+        await asyncio.gather(*(create(slot, c) for slot, c in enumerate(clients)))
+        _, created = await clients[0].request('GET', '/api/status')
+
+        # 各连接轮流替自己负责的会话刷题
+        async def work(slot, client):
+            local = random.Random(rng.random())
+            mine = [sid for sid in sids[slot::len(clients)] if sid]
+            current = {}
+            for _ in range(operations):
+                for sid in mine:
+                    command = pick_operation(local)
+                    if command == 'submit':
+                        question = current.get(sid)
+                        if question is None:
+                            command = 'show'
+                        else:
+                            await timed(client, command, 'POST', '/api/submit',
+                                        {'answer': random_answer(local, question)}, sid)
+                            continue
+                    payload = local.choice(FILTERS) if command == 'filter' else None
+                    status, result = await timed(client, command, 'POST', '/api/' + command,
+                                                 payload, sid)
+                    if command == 'show' and status == 200 and 'options' in result:
+                        current[sid] = result
+                    elif command in ('next', 'random', 'filter'):
+                        current.pop(sid, None)
+
+        start = clock()
+        await asyncio.gather(*(work(slot, c) for slot, c in enumerate(clients)))
+        elapsed = clock() - start
+        _, after = await clients[0].request('GET', '/api/status')
+    finally:
+        for client in clients:
+            client.close()
+
+    total = sum(len(v) for k, v in samples.items() if k != 'session')
+    report = {
+        'sessions': sum(1 for sid in sids if sid),
+        'connections': len(clients),
+        'requests': total,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 1) if elapsed else None,
+        'errors': errors,
+        'latency': {command: percentiles(values) for command, values in sorted(samples.items())},
+        'server': {'before': before, 'created': created, 'after': after},
+    }
+    if before.get('rss_mb') is not None and report['sessions']:
+        per_session = (after['rss_mb'] - before['rss_mb']) * 1024 / report['sessions']
+        report['kb_per_session'] = round(per_session, 1)
+    return report
+
+
+def start_server(bank_path, max_sessions):
+    """子进程里启动服务器（随机端口），返回 (进程, 端口)"""
+    command = [sys.executable, '-u', os.path.join(ROOT, 'quiz_server.py'), '--bank', bank_path,
+               '--port', '0', '--max-sessions', str(max_sessions)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    for line in process.stdout:
+        if '已启动' in line:
+            return process, int(line.split('http://', 1)[1].split('/', 1)[0].rsplit(':', 1)[1])
+    process.wait()
+    raise SystemExit("❌ 服务器启动失败")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="刷题服务器压力测试")
+    parser.add_argument('--url', help="已运行的服务器地址，不给时自动启动一个")
+    parser.add_argument('--size', type=int, default=100000, help="自动启动时合成题库的题量")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="合成题库缓存目录")
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS)
+    parser.add_argument('--connections', type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument('--operations', type=int, default=DEFAULT_OPERATIONS,
+                        help="每个会话执行多少次操作")
+    parser.add_argument('-o', '--output', help="结果 JSON 输出路径（默认打印到标准输出）")
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        print(f"⏳ 准备 {args.size} 题的合成题库并启动服务器...", file=sys.stderr)
+        bank_path = ensure_bank(args.size, args.seed, args.cache)
+        process, port = start_server(bank_path, args.sessions)
+        host = '127.0.0.1'
+
+    try:
+        print(f"⏱️ {args.sessions} 个会话，{args.connections} 条连接，"
+              f"每个会话 {args.operations} 次操作...", file=sys.stderr)
+        report = asyncio.run(run_load(host, port, args.sessions, args.connections,
+                                      args.operations, args.seed))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+"""刷题系统基准测试
+
+对 1k / 100k / 500k / 1M 题的合成题库分别测量：加载、筛选、全文检索、导航、判分、
+统计和界面渲染的延迟分位数，以及峰值内存，结果输出为 JSON，便于不同版本之间
+比较。每个题量在单独的子进程里运行，峰值内存互不影响。运行结束时按
+LATENCY_TARGETS 检查各项的 p99，超出目标的项目会打印警告。
+
+渲染测试需要 X 显示：没有 DISPLAY 时若系统装有 Xvfb 会自动启动一个
+虚拟显示，否则跳过渲染测试并在结果中注明。
+
+用法::
+
+    python benchmarks/run_benchmarks.py -o bench.json
+    python benchmarks/run_benchmarks.py --sizes 1000 100000 --compare old.json
+"""
+
+import argparse
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+from question_bank_file import BankWriter, BinaryQuestionBank
+from question_store import QuestionStore
+from quiz_engine import QuizEngine
+from search_index import index_path_for, load_search_index
+from synthetic_bank import CHAPTERS, TAGS, WORDS, iter_questions, make_questions
+
+DEFAULT_SIZES = (1000, 100000, 500000, 1000000)
+DEFAULT_SEED = 20240101
+DEFAULT_CACHE = os.path.join(HERE, '.cache')
+
+# 延迟目标：(项目, 题量下限) -> p99 毫秒上限；全文检索要求 500k 题以内 10 ms
+LATENCY_TARGETS = {
+    ('search_cold', 500000): 10.0,
+    ('search_warm', 500000): 10.0,
+    ('filter_search', 500000): 10.0,
+}
+
+# 这个题量以下才测量“导入 Python 模块”式的加载（需要先在内存里生成全部字典）
+MODULE_LOAD_LIMIT = 100000
+
+
+def percentiles(samples):
+    """延迟样本（秒）-> 毫秒分位数"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {
+        'n': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'p50_ms': pick(0.50),
+        'p90_ms': pick(0.90),
+        'p99_ms': pick(0.99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def measure(fn, repeat):
+    samples = []
+    clock = time.perf_counter
+    for _ in range(repeat):
+        start = clock()
+        fn()
+        samples.append(clock() - start)
+    return samples
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存（MB），不支持的平台返回 None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def ensure_bank(size, seed, cache_dir):
+    """生成（或复用缓存的）二进制合成题库"""
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"synthetic_{size}_{seed}.qbk")
+    if not os.path.exists(path):
+        writer = BankWriter(path)
+        writer.extend(iter_questions(size, seed))
+        writer.finish()
+    return path
+
+
+def random_answer(rng, question):
+    options = question['options']
+    if question['type'] == 'multiple':
+        picks = rng.sample(range(len(options)), rng.randint(1, len(options)))
+        return ''.join(chr(65 + p) for p in sorted(picks))
+    return chr(65 + rng.randrange(len(options)))
+
+
+def bench_size(size, seed, repeat, cache_dir, render):
+    """在当前进程里跑一个题量的全部测试"""
+    rng = random.Random(seed)
+    results = {}
+    path = ensure_bank(size, seed, cache_dir)
+    load_repeat = max(3, repeat // 50)
+
+    # 加载
+    results['load_binary'] = percentiles(measure(
+        lambda: QuestionStore.from_binary(BinaryQuestionBank(path)), load_repeat))
+    store = QuestionStore.from_binary(BinaryQuestionBank(path))
+    results['engine_init'] = percentiles(measure(lambda: QuizEngine(store), load_repeat))
+    if size <= MODULE_LOAD_LIMIT:
+        questions = make_questions(size, seed)
+        results['load_module'] = percentiles(measure(
+            lambda: QuestionStore.from_questions(questions), load_repeat))
+        del questions
+
+    engine = QuizEngine(store, seed)
+
+    # 判分（同时产生错题，供后面的筛选使用）
+    def submit_one():
+        engine.random_pick()
+        engine.submit(random_answer(rng, engine.current()))
+
+    results['submit_answer'] = percentiles(measure(submit_one, repeat))
+    results['update_stats'] = percentiles(measure(engine.stats, repeat))
+
+    # 筛选：冷（答题状态刚变化）与热（缓存命中）
+    filters = [
+        ('type', dict(type_value='single', mode='all', extra=())),
+        ('wrong', dict(type_value='all', mode='wrong', extra=())),
+        ('chapter_or_tag', dict(type_value='multiple', mode='all', combine='or',
+                                extra=(('chapter', CHAPTERS[0]), ('tag', TAGS[0])))),
+        ('unanswered', dict(type_value='all', mode='all', extra=(('unanswered',),))),
+    ]
+    for name, kwargs in filters:
+        def cold(kwargs=kwargs):
+            engine.query.set_answered(rng.randrange(size), True)
+            engine.query.set_wrong(rng.randrange(size), rng.random() < 0.5)
+            engine.set_filter(**kwargs)
+            engine.filtered()
+
+        def warm(kwargs=kwargs):
+            engine.set_filter(**kwargs)
+            engine.filtered()
+
+        results[f'filter_{name}_cold'] = percentiles(measure(cold, max(5, repeat // 10)))
+        results[f'filter_{name}_warm'] = percentiles(measure(warm, repeat))
+
+    # 全文检索：索引与合成题库一起缓存，首次运行时建立（单独计时）
+    fresh = not os.path.exists(index_path_for(path))
+    start = time.perf_counter()
+    search_index = load_search_index(store, path)
+    results['search_build' if fresh else 'search_open'] = percentiles([time.perf_counter() - start])
+    engine.query.set_search_index(search_index)
+    engine.search_index = search_index
+    queries = [rng.choice(WORDS) + (' ' + rng.choice(WORDS) if rng.random() < 0.5 else '')
+               for _ in range(repeat)]
+
+    def search_cold():
+        search_index._cache.clear()
+        search_index._match_cache.clear()
+        search_index.search(rng.choice(queries))
+
+    results['search_cold'] = percentiles(measure(search_cold, repeat))
+    results['search_warm'] = percentiles(measure(lambda: search_index.search(rng.choice(queries)), repeat))
+
+    def search_filter():
+        engine.set_filter('single', 'all', (), 'and', rng.choice(queries))
+        engine.filtered()
+
+    results['filter_search'] = percentiles(measure(search_filter, repeat))
+
+    # 导航（含读取题干和选项，二进制题库在这里解码文本）
+    engine.set_filter('all', 'all', (), 'and', '')
+
+    def navigate():
+        move = rng.random()
+        if move < 0.45:
+            engine.next()
+        elif move < 0.9:
+            engine.previous()
+        else:
+            engine.random_pick()
+        question = engine.current()
+        question['stem']
+        question['options']
+
+    results['navigate'] = percentiles(measure(navigate, repeat))
+
+    # 批量判分（需要 NumPy）
+    try:
+        import numpy as np
+        from batch_grader import BatchGrader
+    except ImportError:
+        results['batch_grade'] = {'skipped': 'numpy not installed'}
+    else:
+        columns = min(size, 100)
+        grader = BatchGrader.from_store(store, rows=range(columns))
+        sheets = np.random.default_rng(seed).integers(0, 16, (10000, columns), dtype=np.uint8)
+        results['batch_grade_10k_sheets'] = percentiles(measure(lambda: grader.grade(sheets), 5))
+
+    if render:
+        results.update(bench_render(engine, rng, repeat))
+    else:
+        results['render'] = {'skipped': 'no display'}
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    return results
+
+
+def bench_render(engine, rng, repeat):
+    """在（虚拟）显示上测量 show_question / submit_answer 的界面耗时"""
+    import tkinter as tk
+
+    app_module = importlib.import_module('智能刷题系统')
+    root = tk.Tk()
+    app = app_module.QuizApp(root, engine=engine)
+    root.update()
+    results = {}
+
+    def show():
+        if not engine.next():
+            engine.goto(0)
+        app.show_question()
+        root.update_idletasks()
+
+    def render_submit():
+        engine.random_pick()
+        app.show_question()
+        view = app.question_view
+        question = engine.current()
+        answer = random_answer(rng, question)
+        if question['type'] == 'multiple':
+            for i, var in enumerate(view.option_vars):
+                var.set(chr(65 + i) in answer)
+        else:
+            view.option_var.set(answer)
+        app.submit_answer()
+        root.update_idletasks()
+
+    results['show_question'] = percentiles(measure(show, repeat))
+    results['render_submit_answer'] = percentiles(measure(render_submit, max(5, repeat // 4)))
+    results['render_update_stats'] = percentiles(measure(app.update_stats, repeat))
+    root.destroy()
+    return results
+
+
+class VirtualDisplay:
+    """没有 DISPLAY 时尝试启动 Xvfb"""
+
+    def __init__(self):
+        self.process = None
+        self.available = bool(os.environ.get('DISPLAY'))
+
+    def __enter__(self):
+        if self.available or not shutil.which('Xvfb'):
+            return self
+        display = f":{90 + os.getpid() % 100}"
+        self.process = subprocess.Popen(['Xvfb', display, '-screen', '0', '1280x1024x24', '-nolisten', 'tcp'],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(1.0)
+        if self.process.poll() is None:
+            os.environ['DISPLAY'] = display
+            self.available = True
+        return self
+
+    def __exit__(self, *exc):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+def run_worker(size, args):
+    """以子进程运行一个题量，返回其 JSON 结果"""
+    cmd = [sys.executable, os.path.abspath(__file__), '--worker', str(size),
+           '--seed', str(args.seed), '--repeat', str(args.repeat), '--cache', args.cache]
+    if args.no_render:
+        cmd.append('--no-render')
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def check_targets(report):
+    """检查 LATENCY_TARGETS，返回超出目标的项目数"""
+    failures = 0
+    for size, phases in report['results'].items():
+        for (phase, min_size), limit in LATENCY_TARGETS.items():
+            stats = phases.get(phase)
+            if int(size) < min_size or not isinstance(stats, dict):
+                continue
+            ok = stats['p99_ms'] <= limit
+            failures += not ok
+            mark = "✅" if ok else "⚠️"
+            print(f"{mark} {size} 题 {phase}: p99 {stats['p99_ms']:.2f} ms（目标 {limit:g} ms）",
+                  file=sys.stderr)
+    return failures
+
+
+def compare(current, baseline):
+    """打印与基线结果的 p50 对比"""
+    for size, phases in current['results'].items():
+        base_phases = baseline.get('results', {}).get(size, {})
+        print(f"== {size} 题 ==")
+        for phase, stats in phases.items():
+            base = base_phases.get(phase)
+            if not isinstance(stats, dict) or 'p50_ms' not in stats:
+                continue
+            if isinstance(base, dict) and base.get('p50_ms'):
+                ratio = stats['p50_ms'] / base['p50_ms']
+                flag = "  ⚠️" if ratio > 1.2 else ""
+                print(f"  {phase:<28} {base['p50_ms']:>10.3f} -> {stats['p50_ms']:>10.3f} ms  x{ratio:.2f}{flag}")
+            else:
+                print(f"  {phase:<28} {'':>10}    {stats['p50_ms']:>10.3f} ms  (新增)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="刷题系统基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--repeat', type=int, default=200, help="每项操作的采样次数")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="合成题库缓存目录")
+    parser.add_argument('--no-render', action='store_true', help="跳过界面渲染测试")
+    parser.add_argument('-o', '--output', help="结果 JSON 输出路径（默认打印到标准输出）")
+    parser.add_argument('--compare', help="与之前的结果 JSON 比较")
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        render = not args.no_render and bool(os.environ.get('DISPLAY'))
+        result = bench_size(args.worker, args.seed, args.repeat, args.cache, render)
+        print(json.dumps(result))
+        return
+
+    report = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'repeat': args.repeat,
+        },
+        'results': {},
+    }
+    with VirtualDisplay() as display:
+        if not display.available:
+            args.no_render = True
+            print("⚠️ 没有可用的显示，跳过渲染测试", file=sys.stderr)
+        for size in args.sizes:
+            print(f"⏱️ 测试 {size} 题...", file=sys.stderr)
+            report['results'][str(size)] = run_worker(size, args)
+
+    check_targets(report)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
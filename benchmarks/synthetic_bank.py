@@ -0,0 +1,73 @@
+"""确定性的合成题库
+
+同样的题量和种子总是生成同样的题库：单选约 55%、多选约 20%、判断约 25%，
+题干、选项、解析为中英混排文本，带章节、标签和难度，用于基准测试。
+"""
+
+import random
+
+WORDS = [
+    "变量", "函数", "类", "对象", "继承", "多重继承", "封装", "多态", "列表", "元组",
+    "字典", "集合", "字符串", "异常", "模块", "包", "迭代器", "生成器", "装饰器", "闭包",
+    "作用域", "递归", "排序", "查找", "文件", "编码", "线程", "进程", "协程", "网络",
+    "数据库", "索引", "事务", "缓存", "内存", "垃圾回收", "引用计数", "解释器", "编译",
+    "关键字", "运算符", "表达式", "语句", "循环", "条件", "切片", "推导式", "lambda",
+    "Python", "def", "class", "import", "yield", "async", "await", "with", "GIL", "PEP8",
+]
+STEM_TEMPLATES = [
+    "关于{0}和{1}，下列说法正确的是",
+    "以下哪项描述了{0}在{1}中的作用",
+    "在{0}中使用{1}时需要注意什么",
+    "{0}与{1}的主要区别是",
+    "下列关于{0}的叙述，哪些与{1}有关",
+]
+JUDGE_TEMPLATES = [
+    "{0}可以直接用于{1}。",
+    "{0}是{1}的一种实现方式。",
+    "使用{0}一定会影响{1}的性能。",
+]
+CHAPTERS = [f"第{i}章" for i in range(1, 21)]
+TAGS = ["基础", "进阶", "面试", "易错", "语法", "标准库", "并发", "性能"]
+
+
+def _phrase(rng, n):
+    return "".join(rng.choice(WORDS) for _ in range(n))
+
+
+def iter_questions(count, seed=20240101):
+    """逐题生成，不在内存中保留整个题库"""
+    rng = random.Random(seed)
+    for i in range(count):
+        roll = rng.random()
+        a, b = rng.choice(WORDS), rng.choice(WORDS)
+        if roll < 0.25:
+            qtype = "judge"
+            stem = rng.choice(JUDGE_TEMPLATES).format(a, b)
+            options = ["正确", "错误"]
+            answer = rng.choice("AB")
+        else:
+            qtype = "single" if roll < 0.80 else "multiple"
+            stem = rng.choice(STEM_TEMPLATES).format(a, b) + _phrase(rng, rng.randint(0, 12))
+            n_options = rng.choice((4, 4, 4, 5, 6, 8)) if qtype == "multiple" else rng.choice((4, 4, 4, 5))
+            options = [_phrase(rng, rng.randint(1, 6)) for _ in range(n_options)]
+            if qtype == "single":
+                answer = chr(65 + rng.randrange(n_options))
+            else:
+                picks = rng.sample(range(n_options), rng.randint(2, n_options))
+                answer = "".join(chr(65 + p) for p in sorted(picks))
+        yield {
+            "id": i + 1,
+            "stem": stem,
+            "type": qtype,
+            "answer": answer,
+            "options": options,
+            "explanation": f"{a}和{b}：" + _phrase(rng, rng.randint(4, 20)),
+            "chapter": CHAPTERS[rng.randrange(len(CHAPTERS))],
+            "tags": rng.sample(TAGS, rng.randint(1, 3)),
+            "difficulty": rng.randint(1, 5),
+        }
+
+
+def make_questions(count, seed=20240101):
+    """生成题目字典列表"""
+    return list(iter_questions(count, seed))
@@ -0,0 +1,466 @@
+"""题目质量分析（经典测量理论的项目分析）
+
+汇总大量学生的作答记录，找出答案标错、太难 / 太易、区分不开好坏学生或
+选项设计有问题的题目。作答记录可以来自（可混用、可各给多个）::
+
+    --events    作答事件 CSV，表头含 student,question_id,answer（其余列忽略）
+    --sheets    答题卡 CSV（与 batch_grader 相同：首列编号，表头其余列为题目 id）
+    --profiles  目录，每个子目录是一名学生的答题进度（只读，每题只有最后一次作答）
+
+每条记录都算一次作答；空答案和题库中没有的题目 id 跳过并计数。数据分两遍
+流式读取，每块用 NumPy 的 bincount 累加到定长数组里，内存只与题数和学生数
+有关，与作答条数无关::
+
+    第一遍  每名学生的答对数 / 作答数 -> 得分（答对比例），按得分取前后 27% 为高 / 低分组
+    第二遍  每题：作答数、答对数                    -> 难度 p 值
+                  高 / 低分组的作答数、答对数          -> 区分度 D = p高 - p低
+                  去掉本题后的得分之和、平方和等       -> 点二列相关（校正后的题总相关）
+                  各选项被选次数（总体、高分组、低分组）-> 干扰项分析
+
+报告每题一行，flags 列列出触发的问题（见 FLAG_DESCRIPTIONS）；--matrices
+另存全部累计矩阵（.npz）供进一步分析。
+
+用法::
+
+    python item_analysis.py --bank combined_question_bank.qbk --events answers.csv -o items.csv
+    python item_analysis.py --bank bank.json --sheets sheets.csv --profiles ~/.quiz_progress
+    python item_analysis.py --bank bank.qbk --events a.csv --events b.csv --matrices items.npz
+"""
+
+import argparse
+import csv
+import math
+import os
+import re
+from itertools import compress
+
+import numpy as np
+
+from batch_grader import encode_answers, read_sheets
+from progress_journal import JOURNAL_NAME, SNAPSHOT_NAME, ProgressJournal
+from question_bank_file import TYPE_CODES
+from question_store import LETTERS, letters_to_mask, load_store
+
+EVENT_COLUMNS = ('student', 'question_id', 'answer')
+DEFAULT_CHUNK_SIZE = 1 << 20            # 每块作答条数
+EVENT_LINE_BYTES = 16                   # 按每行约多少字节把块大小换算成读取字节数
+GROUP_FRACTION = 0.27                   # 高 / 低分组各占多少学生
+
+# 标记阈值
+DEFAULT_MIN_RESPONSES = 30              # 作答数少于此值的题目不标记
+TOO_HARD = 0.2
+TOO_EASY = 0.95
+LOW_DISCRIMINATION = 0.2
+DISTRACTOR_GAP = 0.05                   # 干扰项在高分组的选择率比低分组高出多少算“吸引好学生”
+DEAD_DISTRACTOR = 0.02                  # 选择率低于此值的干扰项基本没人选
+
+FLAG_DESCRIPTIONS = {
+    'too_hard': f"p 值低于 {TOO_HARD}",
+    'too_easy': f"p 值高于 {TOO_EASY}",
+    'low_discrimination': f"区分度低于 {LOW_DISCRIMINATION}",
+    'negative_discrimination': "低分组答对率反而更高，答案可能标错",
+    'distractor_beats_key': "某个错误选项比正确选项选的人多，答案可能标错或题意含糊",
+    'attractive_distractor': "某个错误选项高分组选得比低分组多，可能有两个说得通的答案",
+}
+
+_TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+_BITS = np.arange(len(LETTERS), dtype=np.uint8)
+_ANSWER_NOISE = re.compile(r'[^A-Za-z]')
+
+
+# ---- 数据源：每次调用 chunks() 都从头读起，逐块产出 (学生编号列表, 题目 id, 掩码) ----
+
+class EventsSource:
+    """作答事件 CSV
+
+    整块按逗号切开后 reshape 成列，题目 id 一次 astype 转换；块里有引号、
+    列数对不上或 id 不是整数时改用 csv 模块逐行解析并跳过坏行。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.skipped = 0
+
+    def chunks(self, chunk_size):
+        self.skipped = 0
+        with open(self.path, 'rb') as f:
+            header = f.readline().decode('utf-8-sig').strip().lower().split(',')
+            missing = [name for name in EVENT_COLUMNS if name not in header]
+            if missing:
+                raise ValueError(f"{self.path}: 表头缺少 {','.join(missing)} 列")
+            columns = [header.index(name) for name in EVENT_COLUMNS]
+            width = len(header)
+            while True:
+                lines = f.readlines(chunk_size * EVENT_LINE_BYTES)
+                if not lines:
+                    break
+                block = b''.join(lines)
+                parsed = self._fast(block, width, columns)
+                if parsed is None:
+                    parsed = self._slow(block, width, columns)
+                yield parsed
+
+    @staticmethod
+    def _fast(block, width, columns):
+        if b'"' in block:
+            return None
+        cells = block.decode('utf-8', 'replace').replace('\r', '').rstrip('\n')
+        cells = cells.replace('\n', ',').split(',')
+        if len(cells) % width:
+            return None
+        count = len(cells) // width
+        try:
+            qids = np.fromiter(map(int, cells[columns[1]::width]), dtype=np.int64, count=count)
+        except ValueError:
+            return None
+        return cells[columns[0]::width], qids, _answer_masks(cells[columns[2]::width])
+
+    def _slow(self, block, width, columns):
+        students, qids, answers = [], [], []
+        for line in csv.reader(block.decode('utf-8', 'replace').splitlines()):
+            if not line:
+                continue
+            try:
+                qid = int(line[columns[1]])
+                student, answer = line[columns[0]], line[columns[2]]
+            except (IndexError, ValueError):
+                self.skipped += 1
+                continue
+            students.append(student)
+            qids.append(qid)
+            answers.append(answer)
+        return students, np.array(qids, dtype=np.int64), _answer_masks(answers)
+
+
+class SheetsSource:
+    """答题卡 CSV：每个非空单元格是一条作答"""
+
+    def __init__(self, path):
+        self.path = path
+        self.skipped = 0
+
+    def chunks(self, chunk_size):
+        sheets = read_sheets(self.path, max(1, chunk_size // 64))
+        qids = np.array(next(sheets), dtype=np.int64)
+        for sheet_ids, letters in sheets:
+            masks = encode_answers(letters)
+            sheet_rows, columns = np.nonzero(masks)
+            yield ([sheet_ids[i] for i in sheet_rows.tolist()], qids[columns],
+                   masks[sheet_rows, columns])
+
+
+class ProfilesSource:
+    """进度目录：每个含 journal/快照的子目录是一名学生，取各题最后一次作答"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.skipped = 0
+
+    def profiles(self):
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if (os.path.exists(os.path.join(path, JOURNAL_NAME))
+                    or os.path.exists(os.path.join(path, SNAPSHOT_NAME))):
+                yield name, path
+
+    def chunks(self, chunk_size):
+        students, qids, masks = [], [], []
+        for name, path in self.profiles():
+            state = ProgressJournal(path).read()
+            students.extend([name] * len(state))
+            qids.extend(state)
+            masks.extend(value & 0xFF for value in state.values())
+            if len(qids) >= chunk_size:
+                yield _profile_chunk(students, qids, masks)
+                students, qids, masks = [], [], []
+        if qids:
+            yield _profile_chunk(students, qids, masks)
+
+
+def _profile_chunk(students, qids, masks):
+    return students, np.array(qids, dtype=np.int64), np.array(masks, dtype=np.uint8)
+
+
+def _answer_masks(answers):
+    """字母答案列表 -> uint8 掩码数组；逗号、空格等分隔符忽略，不同写法只解析一次"""
+    table = {answer: letters_to_mask(_ANSWER_NOISE.sub('', answer).upper())
+             for answer in dict.fromkeys(answers)}
+    return np.fromiter(map(table.__getitem__, answers), dtype=np.uint8, count=len(answers))
+
+
+# ---- 累计 ----
+
+def _grow(values, size):
+    if len(values) >= size:
+        return values
+    grown = np.zeros(max(size, 2 * len(values)), dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+def _count(index, size, weights=None):
+    return np.bincount(index, weights=weights, minlength=size)[:size]
+
+
+class ItemAnalysis:
+    """两遍流式累计；analyse() 之后读各属性或 report_rows()"""
+
+    def __init__(self, store, chunk_size=DEFAULT_CHUNK_SIZE, group_fraction=GROUP_FRACTION):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.group_fraction = group_fraction
+        self.ids = np.array(store.ids, dtype=np.int64)
+        self.type_codes = np.array(store.type_codes, dtype=np.int8)
+        self.option_counts = np.array(store.option_counts, dtype=np.uint8)
+        self.answer_masks = np.array(store.answer_masks, dtype=np.uint8)
+        self._order = np.argsort(self.ids, kind='stable')
+        self._sorted_ids = self.ids[self._order]
+        self._students = {}                     # 学生编号 -> 下标
+        self.events = 0
+        self.unknown = 0                        # 题库中没有的题目 id
+        self.blank = 0                          # 空答案
+
+    @property
+    def student_count(self):
+        return len(self._students)
+
+    def _events(self, sources, count):
+        """逐块产出 (学生下标, 题库行号, 掩码, 是否答对)；count 为 True 时统计跳过的记录"""
+        students = self._students
+        for source in sources:
+            for keys, qids, masks in source.chunks(self.chunk_size):
+                answered = masks != 0
+                positions = np.searchsorted(self._sorted_ids, qids)
+                known = positions < len(self._sorted_ids)
+                known[known] = self._sorted_ids[positions[known]] == qids[known]
+                keep = answered & known
+                if count:
+                    self.blank += int((~answered).sum())
+                    self.unknown += int((answered & ~known).sum())
+                    self.events += int(keep.sum())
+                if not keep.any():
+                    continue
+                rows = self._order[positions[keep]]
+                masks = masks[keep]
+                if not keep.all():
+                    keys = list(compress(keys, keep.tolist()))
+                # 新学生按首次出现的顺序编号，结果与分块方式无关
+                for key in dict.fromkeys(keys):
+                    if key not in students:
+                        students[key] = len(students)
+                student = np.fromiter(map(students.__getitem__, keys), dtype=np.int64,
+                                      count=len(keys))
+                key_masks = self.answer_masks[rows]
+                correct = (masks == key_masks) & (key_masks != 0)
+                yield student, rows, masks, correct
+
+    def analyse(self, sources):
+        sources = list(sources)
+        size = len(self.ids)
+
+        # 第一遍：学生得分
+        student_correct = np.zeros(1024, dtype=np.int64)
+        student_answered = np.zeros(1024, dtype=np.int64)
+        for student, _, _, correct in self._events(sources, True):
+            count = self.student_count
+            student_correct = _grow(student_correct, count)
+            student_answered = _grow(student_answered, count)
+            student_correct[:count] += _count(student, count, correct).astype(np.int64)
+            student_answered[:count] += _count(student, count)
+        count = self.student_count
+        self.student_correct = student_correct[:count]
+        self.student_answered = student_answered[:count]
+
+        # 按得分排序，前后各 group_fraction 为高 / 低分组（1 / -1，其余 0）
+        scores = self.student_correct / np.maximum(self.student_answered, 1)
+        order = np.argsort(scores, kind='stable')
+        group_size = int(math.ceil(count * self.group_fraction)) if count >= 2 else 0
+        self.groups = np.zeros(count, dtype=np.int8)
+        if group_size:
+            self.groups[order[:group_size]] = -1
+            self.groups[order[-group_size:]] = 1
+
+        # 第二遍：逐题累计
+        options = len(LETTERS)
+        self.responses = np.zeros(size, dtype=np.int64)
+        self.correct = np.zeros(size, dtype=np.int64)
+        self.group_responses = np.zeros((2, size), dtype=np.int64)      # 高, 低
+        self.group_correct = np.zeros((2, size), dtype=np.int64)
+        self.picks = np.zeros((size, options), dtype=np.int64)
+        self.group_picks = np.zeros((2, size, options), dtype=np.int64)
+        # 点二列相关：去掉本题后的得分 x 与本题对错 y（只算作答数 >= 2 的学生）
+        self.pb_n = np.zeros(size, dtype=np.int64)
+        self.pb_y = np.zeros(size, dtype=np.int64)
+        self.pb_x = np.zeros(size)
+        self.pb_xx = np.zeros(size)
+        self.pb_xy = np.zeros(size)
+
+        for student, rows, masks, correct in self._events(sources, False):
+            self.responses += _count(rows, size)
+            self.correct += _count(rows, size, correct).astype(np.int64)
+            selected = (masks[:, None] >> _BITS) & 1 != 0
+            cells = (rows[:, None] * options + _BITS)[selected]
+            self.picks += _count(cells, size * options).astype(np.int64).reshape(size, options)
+
+            group = self.groups[student]
+            for slot, value in enumerate((1, -1)):
+                members = group == value
+                in_group = rows[members]
+                self.group_responses[slot] += _count(in_group, size)
+                self.group_correct[slot] += _count(in_group, size, correct[members]).astype(np.int64)
+                cells = (in_group[:, None] * options + _BITS)[selected[members]]
+                self.group_picks[slot] += _count(cells, size * options).astype(
+                    np.int64).reshape(size, options)
+
+            answered = self.student_answered[student]
+            usable = answered >= 2
+            y = correct[usable]
+            x = ((self.student_correct[student] - correct)[usable]
+                 / (answered[usable] - 1))
+            rows = rows[usable]
+            self.pb_n += _count(rows, size)
+            self.pb_y += _count(rows, size, y).astype(np.int64)
+            self.pb_x += _count(rows, size, x)
+            self.pb_xx += _count(rows, size, x * x)
+            self.pb_xy += _count(rows, size, x * y)
+        return self
+
+    # ---- 指标 ----
+
+    def metrics(self):
+        """返回 (p 值, 区分度, 点二列相关)，没有数据的位置为 nan"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_value = self.correct / self.responses
+            upper, lower = self.group_correct / self.group_responses
+            discrimination = upper - lower
+
+            n = self.pb_n
+            mean = self.pb_x / n
+            variance = self.pb_xx / n - mean * mean
+            p = self.pb_y / n
+            # r = (均值1 - 均值0) / 标准差 * sqrt(p q) = 协方差 / (标准差 * sqrt(p q))
+            covariance = self.pb_xy / n - mean * p
+            point_biserial = covariance / np.sqrt(np.maximum(variance, 0) * p * (1 - p))
+            point_biserial[~np.isfinite(point_biserial)] = np.nan
+        return p_value, discrimination, point_biserial
+
+    def flags(self, min_responses=DEFAULT_MIN_RESPONSES):
+        """每题触发的标记列表（作答数不足的题目为空列表）"""
+        p_value, discrimination, _ = self.metrics()
+        upper_n, lower_n = np.maximum(self.group_responses, 1)
+        upper_rates = self.group_picks[0] / upper_n[:, None]
+        lower_rates = self.group_picks[1] / lower_n[:, None]
+        result = [[] for _ in range(len(self.ids))]
+        for row in np.flatnonzero(self.responses >= min_responses).tolist():
+            marks = result[row]
+            if p_value[row] < TOO_HARD:
+                marks.append('too_hard')
+            elif p_value[row] > TOO_EASY:
+                marks.append('too_easy')
+            d = discrimination[row]
+            if d < 0:
+                marks.append('negative_discrimination')
+            elif d < LOW_DISCRIMINATION:
+                marks.append('low_discrimination')
+
+            key = int(self.answer_masks[row])
+            distractors = [b for b in range(self.option_counts[row]) if not key >> b & 1]
+            picks = self.picks[row]
+            if key and distractors:
+                if self.type_codes[row] != TYPE_CODES['multiple']:
+                    key_picks = picks[key.bit_length() - 1]
+                    if max(picks[b] for b in distractors) > key_picks:
+                        marks.append('distractor_beats_key')
+                if self.group_responses[:, row].all() and any(
+                        upper_rates[row, b] - lower_rates[row, b] > DISTRACTOR_GAP
+                        for b in distractors):
+                    marks.append('attractive_distractor')
+        return result
+
+    def report_rows(self, min_responses=DEFAULT_MIN_RESPONSES):
+        """报告 CSV 的行（只含有作答的题目），第一行为表头"""
+        p_value, discrimination, point_biserial = self.metrics()
+        flags = self.flags(min_responses)
+        yield (['question_id', 'type', 'responses', 'p_value', 'discrimination',
+                'point_biserial', 'key'] + [f'pick_{letter}' for letter in LETTERS]
+               + ['dead_distractors', 'flags'])
+        rates = self.picks / np.maximum(self.responses, 1)[:, None]
+        for row in np.flatnonzero(self.responses).tolist():
+            key = int(self.answer_masks[row])
+            option_count = int(self.option_counts[row])
+            dead = sum(1 for b in range(option_count)
+                       if not key >> b & 1 and rates[row, b] < DEAD_DISTRACTOR)
+            picks = [_round(rates[row, b]) if b < option_count else ''
+                     for b in range(len(LETTERS))]
+            yield ([int(self.ids[row]), _TYPE_NAMES.get(int(self.type_codes[row]), ''),
+                    int(self.responses[row]), _round(p_value[row]),
+                    _round(discrimination[row]), _round(point_biserial[row]),
+                    ''.join(LETTERS[b] for b in range(8) if key >> b & 1)]
+                   + picks + [dead, ';'.join(flags[row])])
+
+    def save_matrices(self, path):
+        np.savez_compressed(path, question_ids=self.ids, responses=self.responses,
+                            correct=self.correct, group_responses=self.group_responses,
+                            group_correct=self.group_correct, picks=self.picks,
+                            group_picks=self.group_picks)
+
+
+def _round(value):
+    return '' if math.isnan(value) else round(float(value), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="题目质量分析（难度、区分度、干扰项）")
+    parser.add_argument('--bank', required=True, help="题库文件（.qbk 或 .json）")
+    parser.add_argument('--events', action='append', default=[], help="作答事件 CSV（可多次给出）")
+    parser.add_argument('--sheets', action='append', default=[], help="答题卡 CSV（可多次给出）")
+    parser.add_argument('--profiles', action='append', default=[],
+                        help="进度目录，每个子目录一名学生（可多次给出）")
+    parser.add_argument('-o', '--output', default='item_analysis.csv', help="报告 CSV")
+    parser.add_argument('--matrices', help="累计矩阵输出路径（.npz）")
+    parser.add_argument('--min-responses', type=int, default=DEFAULT_MIN_RESPONSES,
+                        help="作答数少于此值的题目不标记")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="每块大约多少条作答")
+    args = parser.parse_args()
+
+    sources = ([EventsSource(p) for p in args.events] + [SheetsSource(p) for p in args.sheets]
+               + [ProfilesSource(p) for p in args.profiles])
+    if not sources:
+        raise SystemExit("❌ 至少给出一个 --events、--sheets 或 --profiles")
+
+    store = load_store(args.bank)
+    analysis = ItemAnalysis(store, args.chunk_size)
+    try:
+        analysis.analyse(sources)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ 读取作答记录失败: {e}")
+
+    flagged = {}
+    with open(args.output, 'w', encoding='utf-8', newline='') as out:
+        writer = csv.writer(out)
+        lines = analysis.report_rows(args.min_responses)
+        writer.writerow(next(lines))
+        for line in lines:
+            writer.writerow(line)
+            for flag in filter(None, line[-1].split(';')):
+                flagged[flag] = flagged.get(flag, 0) + 1
+    if args.matrices:
+        analysis.save_matrices(args.matrices)
+
+    skipped = sum(source.skipped for source in sources)
+    print(f"✅ 分析了 {analysis.events} 条作答（{analysis.student_count} 名学生，"
+          f"{int((analysis.responses > 0).sum())} 道题），报告写入 {args.output}")
+    if analysis.unknown or analysis.blank or skipped:
+        print(f"⚠️ 跳过: 题库中没有的题目 {analysis.unknown} 条，空答案 {analysis.blank} 条，"
+              f"无法解析的行 {skipped} 行")
+    if flagged:
+        for flag, description in FLAG_DESCRIPTIONS.items():
+            if flag in flagged:
+                print(f"📊 {flag}: {flagged[flag]} 题（{description}）")
+    else:
+        print("📊 没有需要关注的题目")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+"""组卷
+
+从题库生成多份不同的试卷：每份试卷各题型题数固定（如单选 40、多选 10、
+判断 20），指定的章节每章至少若干题，任意两份试卷共有的题不超过上限；
+每份试卷的选项顺序单独打乱，答案字母随之换算（判断题保持“正确/错误”）。
+
+选题直接在题型、章节、标签位图索引上分层：每个 (题型, 章节) 和每个题型
+各有一个候选队列，队列按题目已被选用的次数分层、同层内为随机顺序，每次
+顺序取使用次数最少、且加入后不会让重叠超限的题，不做“随机抽一份、不满足
+就重抽”的拒绝采样。选题要看到之前的全部试卷，在主进程里顺序完成（每份
+只是几十次队列操作）；读题文、打乱选项、排版按试卷分给进程池，每份试卷的
+随机种子由总种子和试卷编号决定，结果与进程数无关。试卷和答案按编号顺序
+边生成边写出。
+
+用法::
+
+    python paper_generator.py --bank combined_question_bank.qbk -n 300 \\
+        --quota single=40 multiple=10 judge=20 --all-chapters --max-overlap 10 -o papers/
+    python paper_generator.py --bank bank.json -n 50 --quota single=20 judge=10 \\
+        --chapters 第1章 第2章 --tags 基础 --format jsonl --seed 7 -o out/
+
+输出目录中每份试卷一个 paper_001.txt（--format jsonl 时全部写入 papers.jsonl），
+answer_key.csv 每行一题：试卷编号、题号、题目 id、题型、答案、选项顺序
+（原选项字母按新顺序排列，如 CADB）。
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from question_bank_file import BANK_SUFFIX, TYPE_NAMES, BinaryQuestionBank
+from question_index import QuestionIndex, bits_to_positions, codes_to_bits, popcount
+from question_store import canonical_answer_mask, load_store, mask_to_letters
+from quiz_engine import TYPE_FILTER_NAMES
+
+DEFAULT_QUOTA = {'single': 40, 'multiple': 10, 'judge': 20}
+DEFAULT_PAPERS = 10
+FORMATS = ('text', 'jsonl')
+SECTION_NUMBERS = '一二三四五六七八九十'
+FIXED_ORDER_TYPES = ('judge',)      # 这些题型不打乱选项
+
+KEY_HEADER = ['paper', 'number', 'question_id', 'type', 'answer', 'option_order']
+
+
+class PaperError(ValueError):
+    """组卷约束无法满足"""
+
+
+class UsagePool:
+    """一组候选题，按已被选用的次数分层，同层内为随机顺序
+
+    uses 是各候选队列共用的使用次数列：题目经别的队列选用后，在本队列里
+    仍留在旧的一层，轮到它时再移到应在的层（惰性调整）。升层的题插到新一层
+    的随机位置，免得同一份试卷的题在下一轮里又挨在一起、集中与它重叠。
+    """
+
+    def __init__(self, rows, uses, rng):
+        rows = list(rows)
+        rng.shuffle(rows)
+        self.size = len(rows)
+        self.uses = uses
+        self.levels = [deque(rows)]
+        self._rng = rng
+
+    def take(self, accept):
+        """取出使用次数最少且 accept(行号) 为真的一题并计一次使用，没有时返回 None"""
+        uses = self.uses
+        levels = self.levels
+        level_no = 0
+        while level_no < len(levels):
+            level = levels[level_no]
+            skipped = []
+            found = None
+            for _ in range(len(level)):
+                row = level.popleft()
+                if uses[row] != level_no:
+                    self._place(row)
+                elif accept(row):
+                    found = row
+                    break
+                else:
+                    skipped.append(row)
+            level.extendleft(reversed(skipped))
+            if found is not None:
+                uses[found] += 1
+                self._place(found)
+                return found
+            level_no += 1
+        return None
+
+    def _place(self, row):
+        level = self.uses[row]
+        while len(self.levels) <= level:
+            self.levels.append(deque())
+        target = self.levels[level]
+        target.insert(self._rng.randrange(len(target) + 1), row)
+
+
+class PaperPlanner:
+    """逐份选题：题型配额、章节覆盖、两两重叠上限"""
+
+    def __init__(self, store, quota, chapters=(), min_per_chapter=1, max_overlap=None,
+                 tags=(), seed=0, index=None):
+        if index is None:
+            index = QuestionIndex(store)
+        rng = random.Random(seed)
+        self.quota = {name: count for name, count in quota.items() if count > 0}
+        self.min_per_chapter = min_per_chapter if chapters else 0
+        self.max_overlap = max_overlap
+        self.uses = array('I', bytes(4 * len(store)))
+        self.papers_of = {}         # 行号 -> 选用过这道题的试卷编号
+        self.planned = 0
+
+        # 答案写法不规范的题无法换算字母，不参与组卷
+        pool = index.all_bits & ~codes_to_bits(store.answer_masks, 0)
+        if tags:
+            tag_bits = 0
+            for tag in tags:
+                tag_bits |= index.bits('tag', tag)
+            pool &= tag_bits
+
+        self.by_type = {}
+        self.by_chapter = {}
+        for name, count in self.quota.items():
+            bits = pool & index.bits('type', name)
+            available = popcount(bits)
+            if available < count:
+                raise PaperError(f"{TYPE_FILTER_NAMES[name]}只有{available}道可用，不够每份{count}道")
+            self.by_type[name] = UsagePool(bits_to_positions(bits), self.uses, rng)
+            for chapter in chapters:
+                rows = bits_to_positions(bits & index.bits('chapter', chapter))
+                if rows:
+                    self.by_chapter[(name, chapter)] = UsagePool(rows, self.uses, rng)
+
+        if len(chapters) * self.min_per_chapter > sum(self.quota.values()):
+            raise PaperError(f"{len(chapters)}个章节每章至少{self.min_per_chapter}题，超过了每份试卷的总题数")
+        for chapter in chapters:
+            available = sum(self.by_chapter[(name, chapter)].size for name in self.quota
+                            if (name, chapter) in self.by_chapter)
+            if available < self.min_per_chapter:
+                raise PaperError(f"章节“{chapter}”只有{available}道可用题")
+        # 可选题型少的章节先覆盖，免得它能用的题型配额被别的章节占满
+        self.chapters = sorted(chapters, key=lambda c: sum((name, c) in self.by_chapter
+                                                           for name in self.quota))
+
+    def plan(self):
+        """选下一份试卷的题，返回 {题型: [行号, ...]}（题库顺序）"""
+        number = self.planned + 1
+        papers_of = self.papers_of
+        limit = self.max_overlap
+        chosen = set()
+        overlap = {}
+        rows = {name: [] for name in self.quota}
+        remaining = dict(self.quota)
+
+        def accept(row):
+            if row in chosen:
+                return False
+            if limit is not None:
+                for other in papers_of.get(row, ()):
+                    if overlap.get(other, 0) >= limit:
+                        return False
+            return True
+
+        def add(name, row):
+            chosen.add(row)
+            rows[name].append(row)
+            remaining[name] -= 1
+            for other in papers_of.get(row, ()):
+                overlap[other] = overlap.get(other, 0) + 1
+            papers_of.setdefault(row, []).append(number)
+
+        for chapter in self.chapters:
+            for _ in range(self.min_per_chapter):
+                # 优先占用剩余配额最多的题型
+                names = sorted((name for name in self.quota
+                                if remaining[name] and (name, chapter) in self.by_chapter),
+                               key=lambda name: -remaining[name])
+                for name in names:
+                    row = self.by_chapter[(name, chapter)].take(accept)
+                    if row is not None:
+                        add(name, row)
+                        break
+                else:
+                    raise PaperError(f"第{number}份试卷无法覆盖章节“{chapter}”，配额或重叠上限太紧")
+
+        for name in self.quota:
+            pool = self.by_type[name]
+            while remaining[name]:
+                row = pool.take(accept)
+                if row is None:
+                    raise PaperError(f"第{number}份试卷凑不齐{TYPE_FILTER_NAMES[name]}，重叠上限太紧")
+                add(name, row)
+
+        self.planned = number
+        return {name: sorted(picked) for name, picked in rows.items()}
+
+    def overlap_stats(self):
+        """(两份试卷最多共有的题数, 一道题最多被几份试卷选用)"""
+        pairs = {}
+        for papers in self.papers_of.values():
+            for i, a in enumerate(papers):
+                for b in papers[i + 1:]:
+                    pairs[(a, b)] = pairs.get((a, b), 0) + 1
+        most_used = max((len(papers) for papers in self.papers_of.values()), default=0)
+        return max(pairs.values(), default=0), most_used
+
+
+def shuffle_options(options, answer_mask, rng, fixed=False):
+    """打乱选项，返回 (新选项, 新答案字母, 原选项字母按新顺序排列)"""
+    order = list(range(len(options)))
+    if not fixed:
+        rng.shuffle(order)
+    mask = 0
+    for new, old in enumerate(order):
+        if answer_mask >> old & 1:
+            mask |= 1 << new
+    return [options[i] for i in order], mask_to_letters(mask), ''.join(chr(65 + i) for i in order)
+
+
+# ---- 工作进程 ----
+
+_source = None
+
+
+def open_source(path):
+    """按扩展名打开题库：二进制题库直接按行读 mmap，不建列式索引"""
+    if path.endswith(BANK_SUFFIX):
+        return BinaryQuestionBank(path)
+    return load_store(path)
+
+
+def _init_worker(source):
+    """进程池初始化：source 为题库路径（工作进程各自打开）或已打开的题库"""
+    global _source
+    _source = open_source(source) if isinstance(source, str) else source
+
+
+def render_paper(number, seed, sections, fmt='text'):
+    """排版一份试卷，返回 (试卷文本, 答案表行)
+
+    sections 为 [(题型, [行号, ...]), ...]；题目在各题型内、选项在各题内按
+    由总种子和试卷编号决定的顺序打乱。
+    """
+    rng = random.Random(f"{seed}:{number}")
+    field = _source.field
+    questions = []
+    key_rows = []
+    for name, rows in sections:
+        rows = list(rows)
+        rng.shuffle(rows)
+        for row in rows:
+            options, answer, order = shuffle_options(
+                field(row, 'options'), canonical_answer_mask(field(row, 'answer')), rng,
+                fixed=name in FIXED_ORDER_TYPES)
+            qid = field(row, 'id')
+            questions.append({'number': len(questions) + 1, 'id': qid, 'type': name,
+                              'stem': field(row, 'stem'), 'options': options})
+            key_rows.append([number, len(questions), qid, name, answer, order])
+
+    if fmt == 'jsonl':
+        return json.dumps({'paper': number, 'questions': questions}, ensure_ascii=False) + '\n', key_rows
+
+    lines = [f"试卷 {number:03d}（共{len(questions)}题）"]
+    section_no = 0
+    previous = None
+    for q in questions:
+        if q['type'] != previous:
+            count = sum(1 for other in questions if other['type'] == q['type'])
+            lines += ["", f"{SECTION_NUMBERS[section_no]}、{TYPE_FILTER_NAMES[q['type']]}（共{count}题）"]
+            section_no += 1
+            previous = q['type']
+        lines.append(f"{q['number']}. {q['stem']}")
+        lines += [f"   {chr(65 + i)}. {option}" for i, option in enumerate(q['options'])]
+    return '\n'.join(lines) + '\n', key_rows
+
+
+def _rendered(tasks, source, workers):
+    """按试卷编号顺序产出排版结果；进程池里同时最多 2 x workers 份"""
+    if workers <= 1:
+        _init_worker(source)
+        for task in tasks:
+            yield render_paper(*task)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(source,)) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(render_paper, *task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_papers(bank_path, count, output, quota=DEFAULT_QUOTA, chapters=(), min_per_chapter=1,
+                    max_overlap=None, tags=(), seed=0, workers=None, fmt='text', store=None,
+                    index=None, on_paper=None):
+    """生成 count 份试卷写入 output 目录，返回 PaperPlanner（可查看重叠统计）
+
+    store / index 为已经加载好的题库和索引（省去重新加载）；on_paper(编号)
+    在每份写完后调用。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"未知的输出格式: {fmt}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if store is None:
+        store = load_store(bank_path)
+    planner = PaperPlanner(store, quota, chapters, min_per_chapter, max_overlap, tags, seed, index)
+    order = [name for name in TYPE_NAMES if name in planner.quota]
+
+    def tasks():
+        for number in range(1, count + 1):
+            rows = planner.plan()
+            yield number, seed, [(name, rows[name]) for name in order], fmt
+
+    # 单进程时直接用已加载的题库，多进程时各工作进程按路径自己打开
+    source = store if workers <= 1 else bank_path
+    os.makedirs(output, exist_ok=True)
+    jsonl = open(os.path.join(output, 'papers.jsonl'), 'w', encoding='utf-8') if fmt == 'jsonl' else None
+    try:
+        with open(os.path.join(output, 'answer_key.csv'), 'w', encoding='utf-8', newline='') as f:
+            key = csv.writer(f)
+            key.writerow(KEY_HEADER)
+            for number, (text, key_rows) in enumerate(_rendered(tasks(), source, workers), 1):
+                if jsonl is not None:
+                    jsonl.write(text)
+                else:
+                    with open(os.path.join(output, f"paper_{number:03d}.txt"), 'w', encoding='utf-8') as paper:
+                        paper.write(text)
+                key.writerows(key_rows)
+                if on_paper is not None:
+                    on_paper(number)
+    finally:
+        if jsonl is not None:
+            jsonl.close()
+    return planner
+
+
+def parse_quota(items):
+    """['single=40', 'judge=20'] -> {'single': 40, 'judge': 20}"""
+    quota = {}
+    for item in items:
+        name, sep, value = item.partition('=')
+        if not sep or name not in TYPE_NAMES or not value.isdigit():
+            raise ValueError(f"题型配额应为 题型=题数（题型为 {'/'.join(TYPE_NAMES)}）: {item}")
+        quota[name] = int(value)
+    if not any(quota.values()):
+        raise ValueError("每份试卷至少要有一道题")
+    return quota
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按题型配额、章节覆盖和重叠上限批量组卷")
+    parser.add_argument('--bank', required=True, help="题库文件（.qbk 或 .json）")
+    parser.add_argument('-n', '--papers', type=int, default=DEFAULT_PAPERS, help="试卷份数")
+    parser.add_argument('-o', '--output', default='papers', help="输出目录")
+    parser.add_argument('--quota', nargs='+', help="各题型题数，如 single=40 multiple=10 judge=20")
+    chapters = parser.add_mutually_exclusive_group()
+    chapters.add_argument('--chapters', nargs='+', default=(), help="必须覆盖的章节")
+    chapters.add_argument('--all-chapters', action='store_true', help="覆盖题库中的全部章节")
+    parser.add_argument('--min-per-chapter', type=int, default=1, help="每个章节至少几题")
+    parser.add_argument('--max-overlap', type=int, help="任意两份试卷最多共有几题（默认不限）")
+    parser.add_argument('--tags', nargs='+', default=(), help="只从带这些标签的题中选")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子（相同参数和种子生成相同试卷）")
+    parser.add_argument('--workers', type=int, help="排版进程数（默认 CPU 核数）")
+    parser.add_argument('--format', choices=FORMATS, default='text', help="试卷输出格式")
+    args = parser.parse_args()
+
+    try:
+        quota = parse_quota(args.quota) if args.quota else DEFAULT_QUOTA
+        store = load_store(args.bank)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+    index = QuestionIndex(store)
+    chapters = index.values('chapter') if args.all_chapters else args.chapters
+
+    def progress(number):
+        if number % 50 == 0 or number == args.papers:
+            print(f"⏳ 已生成 {number}/{args.papers} 份")
+
+    try:
+        planner = generate_papers(args.bank, args.papers, args.output, quota, chapters,
+                                  args.min_per_chapter, args.max_overlap, args.tags, args.seed,
+                                  args.workers, args.format, store, index, progress)
+    except PaperError as e:
+        raise SystemExit(f"❌ {e}")
+    shared, most_used = planner.overlap_stats()
+    print(f"✅ 已生成 {args.papers} 份试卷（每份{sum(planner.quota.values())}题），写入 {args.output}")
+    print(f"📊 两份试卷最多共有 {shared} 题，一道题最多出现在 {most_used} 份试卷中")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""性能埋点
+
+学生反映“卡”的时候需要有数据可看。设置环境变量 QUIZ_TRACE 后，加了
+@traced 的热点函数（加载题库、筛选、显示题目、提交、更新统计、显示解析）
+每次调用都会记录：
+
+    耗时        对数分桶的定长直方图（每个 2 的幂再分 8 桶，误差不超过 12.5%）
+    控件        调用期间新建 / 销毁的 tkinter 控件数，以及全程的累计数
+    事件循环    Tk 心跳定时器的实际触发时间比预定晚了多少（界面卡顿的直接度量）
+
+最近 TRACE_EVENTS 次调用另外保存在定长环形缓冲里，退出时导出::
+
+    <前缀>.json         各函数、控件和事件循环延迟的汇总（分位数、调用次数）
+    <前缀>.trace.json   Chrome trace 格式，可在 chrome://tracing 或 Perfetto 中打开
+
+QUIZ_TRACE=1 时前缀为 quiz_trace，其他值作为前缀（可带目录）。未设置时
+@traced 在定义函数时直接返回原函数，运行时没有任何额外开销。
+
+用法::
+
+    QUIZ_TRACE=1 python 智能刷题系统.py             # 退出后生成 quiz_trace.json 等
+    QUIZ_TRACE=logs/lag python 智能刷题系统.py      # 生成 logs/lag.json 和 logs/lag.trace.json
+"""
+
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from collections import deque
+
+ENV_VAR = 'QUIZ_TRACE'
+DEFAULT_PREFIX = 'quiz_trace'
+
+SUB_BUCKETS = 8                 # 每个 2 的幂分几个桶
+OCTAVES = 40                    # 1 微秒到约 12 天
+TRACE_EVENTS = 20000            # Chrome trace 保留最近多少次调用
+LAG_INTERVAL_MS = 100           # 事件循环心跳间隔
+LAG_TRACE_MS = 50               # 延迟超过这个值时记为一个 trace 事件
+
+
+class Histogram:
+    """微秒耗时的对数分桶直方图，记录 O(1)，内存固定"""
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * SUB_BUCKETS * OCTAVES))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(us):
+        if us < 1:
+            return 0
+        mantissa, exponent = math.frexp(us)
+        return min(exponent * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS),
+                   SUB_BUCKETS * OCTAVES - 1)
+
+    @staticmethod
+    def upper_bound(index):
+        """某个桶的上界（微秒）"""
+        exponent, sub = divmod(index, SUB_BUCKETS)
+        return 2.0 ** (exponent - 1) * (1 + (sub + 1) / SUB_BUCKETS)
+
+    def record(self, us):
+        self.counts[self.bucket(us)] += 1
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+
+    def percentile(self, p):
+        """第 p 百分位（0–100）的近似值（微秒），取所在桶的上界且不超过最大值"""
+        if not self.count:
+            return 0
+        target = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= target:
+                return min(self.upper_bound(index), self.max)
+        return self.max
+
+    def summary(self):
+        if not self.count:
+            return {'count': 0}
+        return {'count': self.count,
+                'mean_ms': round(self.total / self.count / 1000, 3),
+                'p50_ms': round(self.percentile(50) / 1000, 3),
+                'p90_ms': round(self.percentile(90) / 1000, 3),
+                'p99_ms': round(self.percentile(99) / 1000, 3),
+                'max_ms': round(self.max / 1000, 3)}
+
+
+class Monitor:
+    """全局埋点记录：各函数的耗时直方图、控件计数、事件循环延迟、最近的调用"""
+
+    def __init__(self, prefix=None):
+        self.enabled = prefix is not None
+        self.prefix = prefix
+        self.histograms = {}
+        self.widget_deltas = {}         # 函数名 -> [新建, 销毁]
+        self.widgets_created = 0
+        self.widgets_destroyed = 0
+        self.lag = Histogram()
+        self.events = deque(maxlen=TRACE_EVENTS)
+        self._origin = time.perf_counter_ns()
+        self._root = None
+        self._exported = False
+
+    # ---- 记录 ----
+
+    def record(self, name, start_ns, end_ns, created=0, destroyed=0):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+            self.widget_deltas[name] = [0, 0]
+        hist.record((end_ns - start_ns) / 1000)
+        if created or destroyed:
+            delta = self.widget_deltas[name]
+            delta[0] += created
+            delta[1] += destroyed
+        self.events.append((name, start_ns, end_ns, threading.get_ident(), created, destroyed))
+
+    def span(self, name):
+        """with monitor.span(名称): ... 记录一段代码；未启用时什么也不做"""
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    # ---- tkinter ----
+
+    def attach(self, root):
+        """统计控件新建/销毁，并用心跳定时器测量事件循环延迟"""
+        if not self.enabled or self._root is not None:
+            return
+        self._root = root
+        _count_widgets(self)
+        interval = LAG_INTERVAL_MS / 1000
+
+        def beat(expected):
+            now = time.perf_counter()
+            late_ms = max(0.0, (now - expected) * 1000)
+            self.lag.record(late_ms * 1000)
+            if late_ms >= LAG_TRACE_MS:
+                end = time.perf_counter_ns()
+                self.events.append(('event_loop_lag', end - int(late_ms * 1e6), end,
+                                    threading.get_ident(), 0, 0))
+            try:
+                root.after(LAG_INTERVAL_MS, beat, now + interval)
+            except Exception:
+                pass                    # 窗口已经销毁
+
+        root.after(LAG_INTERVAL_MS, beat, time.perf_counter() + interval)
+
+    # ---- 导出 ----
+
+    def summary(self):
+        functions = {}
+        for name, hist in sorted(self.histograms.items()):
+            created, destroyed = self.widget_deltas[name]
+            functions[name] = dict(hist.summary(), widgets_created=created,
+                                   widgets_destroyed=destroyed)
+        return {'functions': functions,
+                'widgets': {'created': self.widgets_created,
+                            'destroyed': self.widgets_destroyed,
+                            'live': self.widgets_created - self.widgets_destroyed},
+                'event_loop_lag': self.lag.summary()}
+
+    def chrome_trace(self):
+        """Chrome trace 事件格式（完整事件 ph=X，时间单位微秒）"""
+        pid = os.getpid()
+        origin = self._origin
+        events = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - origin) / 1000, 'dur': (end - start) / 1000,
+                   'args': {'widgets_created': created, 'widgets_destroyed': destroyed}}
+                  for name, start, end, tid, created, destroyed in list(self.events)]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, prefix=None):
+        """写出 <前缀>.json 和 <前缀>.trace.json，返回两个路径"""
+        prefix = prefix or self.prefix or DEFAULT_PREFIX
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        paths = (prefix + '.json', prefix + '.trace.json')
+        for path, data in zip(paths, (self.summary(), self.chrome_trace())):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=1 if path == paths[0] else None)
+        self._exported = True
+        return paths
+
+    def _export_at_exit(self):
+        if self.enabled and not self._exported and self.histograms:
+            try:
+                paths = self.export()
+            except OSError as e:
+                print(f"❌ 写出性能记录失败: {e}")
+                return
+            print(f"⏱️ 性能记录已写入 {paths[0]} 和 {paths[1]}")
+
+
+class _Span:
+    __slots__ = ('monitor', 'name', 'start', 'widgets')
+
+    def __init__(self, monitor, name):
+        self.monitor = monitor
+        self.name = name
+
+    def __enter__(self):
+        monitor = self.monitor
+        self.widgets = (monitor.widgets_created, monitor.widgets_destroyed)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        monitor = self.monitor
+        monitor.record(self.name, self.start, end,
+                       monitor.widgets_created - self.widgets[0],
+                       monitor.widgets_destroyed - self.widgets[1])
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _count_widgets(monitor):
+    """包装 tkinter 控件的建立和销毁（ttk 控件同样经过这两个方法）"""
+    import tkinter
+
+    setup = tkinter.BaseWidget._setup
+    destroy = tkinter.BaseWidget.destroy
+
+    def counted_setup(widget, *args, **kwargs):
+        monitor.widgets_created += 1
+        return setup(widget, *args, **kwargs)
+
+    def counted_destroy(widget):
+        monitor.widgets_destroyed += 1
+        return destroy(widget)
+
+    tkinter.BaseWidget._setup = counted_setup
+    tkinter.BaseWidget.destroy = counted_destroy
+
+
+def _prefix_from_env():
+    value = os.environ.get(ENV_VAR, '').strip()
+    if not value or value == '0':
+        return None
+    if value == '1':
+        return DEFAULT_PREFIX
+    return value[:-5] if value.endswith('.json') else value
+
+
+monitor = Monitor(_prefix_from_env())
+atexit.register(monitor._export_at_exit)
+
+
+def traced(name=None):
+    """装饰器：记录每次调用的耗时和控件增减；未启用时原样返回函数"""
+    def decorate(func):
+        if not monitor.enabled:
+            return func
+        label = name or func.__name__
+        record = monitor.record
+        clock = time.perf_counter_ns
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            created, destroyed = monitor.widgets_created, monitor.widgets_destroyed
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, start, clock(), monitor.widgets_created - created,
+                       monitor.widgets_destroyed - destroyed)
+
+        return wrapper
+    return decorate
@@ -0,0 +1,259 @@
+"""答题进度日志
+
+提交答案只写进内存缓冲区，由调用方定时 flush()：缓冲的记录打包成一帧
+追加到 journal 文件并 fsync，不在每次点击时刷盘。帧内按列存放
+（qid 数组 + 状态数组），整帧一个 CRC，重放时一次校验、一次批量更新。
+记录条数超过阈值时把当前状态压缩成快照::
+
+    snapshot.bin   文件头 + 条目数/CRC + qid 数组 + 状态数组
+    journal.bin    文件头（含代号）+ 若干帧
+
+状态值把所选掩码和标志打包成一个整数（mask | flags << 8）。子类可以改用
+更宽的状态列（value_code）和别的文件名，复习计划就是这样保存的。快照和新
+journal 都先写临时文件再 os.replace，快照代号比旧 journal 大，因此任何
+时刻崩溃都只会丢掉最后一批未刷盘的记录，不会破坏已有状态：启动时读取
+快照，再重放代号相同的 journal，遇到残缺或校验失败的帧即停止并截断。
+"""
+
+import os
+import struct
+import zlib
+from array import array
+
+JOURNAL_MAGIC = b'QJNL'
+SNAPSHOT_MAGIC = b'QSNP'
+FORMAT_VERSION = 1
+
+FILE_HEADER = struct.Struct('<4sHxxQ')      # magic, version, generation
+SNAPSHOT_COUNT = struct.Struct('<QI')      # 条目数, 数据 CRC
+FRAME_HEADER = struct.Struct('<BxxxII')    # 帧类型, 记录数, 数据 CRC
+
+FRAME_ANSWERS = 1
+FRAME_RESET = 2
+
+FLAG_CORRECT = 0x1
+FLAG_WRONG = 0x2        # 提交后仍在错题集中
+
+JOURNAL_NAME = 'journal.bin'
+SNAPSHOT_NAME = 'snapshot.bin'
+SYNC_DIR_NAME = 'sync'          # 启用多设备同步后的同步记录目录（见 progress_sync）
+
+DEFAULT_COMPACT_EVERY = 50000
+
+
+def default_profile_dir(profile="default"):
+    """进度文件默认存放位置"""
+    return os.path.join(os.path.expanduser("~"), ".quiz_progress", profile)
+
+
+def pack_entry(mask, is_correct, is_wrong):
+    """所选掩码 + 标志 -> 状态值"""
+    flags = (FLAG_CORRECT if is_correct else 0) | (FLAG_WRONG if is_wrong else 0)
+    return mask | flags << 8
+
+
+def unpack_entry(value):
+    """状态值 -> (所选掩码, 标志)"""
+    return value & 0xFF, value >> 8
+
+
+def _fsync_dir(directory):
+    # Windows 不支持对目录 fsync
+    if os.name != 'nt':
+        fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _write_atomic(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path))
+
+
+def _columns(qids, values, value_code='H'):
+    """把 qid、状态两列编码成帧/快照的数据部分"""
+    return array('q', qids).tobytes() + array(value_code, values).tobytes()
+
+
+def _decode_columns(body, count, value_code='H'):
+    qids = array('q')
+    qids.frombytes(body[:count * 8])
+    values = array(value_code)
+    values.frombytes(body[count * 8:])
+    return qids, values
+
+
+class ProgressJournal:
+    """追加写的答题日志 + 快照压缩
+
+    state 为 qid -> 状态值 的当前状态，随每条记录同步更新。
+    """
+
+    journal_name = JOURNAL_NAME
+    snapshot_name = SNAPSHOT_NAME
+    value_code = 'H'
+
+    def __init__(self, directory, compact_every=DEFAULT_COMPACT_EVERY):
+        self.directory = directory
+        self.compact_every = compact_every
+        self.journal_path = os.path.join(directory, self.journal_name)
+        self.snapshot_path = os.path.join(directory, self.snapshot_name)
+        self.entry_size = 8 + array(self.value_code).itemsize
+        self.state = {}
+        self.generation = 0
+        self.records_since_snapshot = 0
+        self._pending = []      # 未刷盘的帧：(帧类型, qid 列表, 状态列表)
+        self._file = None
+
+    # ---- 启动恢复 ----
+
+    def load(self):
+        """读取最新快照并重放 journal，返回当前状态"""
+        os.makedirs(self.directory, exist_ok=True)
+        journal_generation, valid_end = self._read()
+
+        if journal_generation == self.generation:
+            # 截掉残缺的尾部帧后继续追加
+            self._file = open(self.journal_path, 'r+b')
+            self._file.truncate(valid_end)
+            self._file.seek(valid_end)
+        else:
+            # 没有 journal，或 journal 已被更新的快照覆盖
+            self._start_journal(self.generation)
+        return self.state
+
+    def read(self):
+        """只读地恢复当前状态：不截断、不新建文件，之后也不能追加（供离线统计）"""
+        self._read()
+        return self.state
+
+    def _read(self):
+        """读取快照并重放代号相同的 journal，返回 (journal 代号, 有效数据结尾)"""
+        self.state = {}
+        self.generation = 0
+        self._load_snapshot()
+
+        valid_end = FILE_HEADER.size
+        journal_generation = None
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'rb') as f:
+                data = f.read()
+            if len(data) >= FILE_HEADER.size:
+                magic, version, journal_generation = FILE_HEADER.unpack_from(data)
+                if magic != JOURNAL_MAGIC or version != FORMAT_VERSION:
+                    journal_generation = None
+            if journal_generation == self.generation:
+                valid_end = self._replay(data)
+        return journal_generation, valid_end
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+        with open(self.snapshot_path, 'rb') as f:
+            data = f.read()
+        try:
+            magic, version, generation = FILE_HEADER.unpack_from(data)
+            count, crc = SNAPSHOT_COUNT.unpack_from(data, FILE_HEADER.size)
+        except struct.error:
+            return
+        body = data[FILE_HEADER.size + SNAPSHOT_COUNT.size:]
+        if (magic != SNAPSHOT_MAGIC or version != FORMAT_VERSION
+                or len(body) != count * self.entry_size or zlib.crc32(body) != crc):
+            print(f"⚠️ 进度快照已损坏，忽略: {self.snapshot_path}")
+            return
+
+        self.state = dict(zip(*_decode_columns(body, count, self.value_code)))
+        self.generation = generation
+
+    def _replay(self, data):
+        """重放 journal 中的帧，返回有效数据的结尾偏移"""
+        state = self.state
+        offset = FILE_HEADER.size
+        count = 0
+        while offset + FRAME_HEADER.size <= len(data):
+            kind, n, crc = FRAME_HEADER.unpack_from(data, offset)
+            start = offset + FRAME_HEADER.size
+            body = data[start:start + n * self.entry_size]
+            if len(body) != n * self.entry_size or zlib.crc32(body) != crc:
+                break
+            if kind == FRAME_ANSWERS:
+                state.update(zip(*_decode_columns(body, n, self.value_code)))
+            elif kind == FRAME_RESET:
+                state.clear()
+            else:
+                break
+            offset = start + len(body)
+            count += max(n, 1)
+        self.records_since_snapshot = count
+        return offset
+
+    def _start_journal(self, generation):
+        if self._file is not None:
+            self._file.close()
+        _write_atomic(self.journal_path, FILE_HEADER.pack(JOURNAL_MAGIC, FORMAT_VERSION, generation))
+        self._file = open(self.journal_path, 'r+b')
+        self._file.seek(0, os.SEEK_END)
+        self.records_since_snapshot = 0
+
+    # ---- 写入 ----
+
+    def record_answer(self, qid, mask, is_correct, is_wrong):
+        """记录一次提交（只进缓冲区）"""
+        self.record(qid, pack_entry(mask, is_correct, is_wrong))
+
+    def record(self, qid, value):
+        """记录某题的新状态值（只进缓冲区）"""
+        self.state[qid] = value
+        if not self._pending or self._pending[-1][0] != FRAME_ANSWERS:
+            self._pending.append((FRAME_ANSWERS, [], []))
+        _, qids, values = self._pending[-1]
+        qids.append(qid)
+        values.append(value)
+        self.records_since_snapshot += 1
+
+    def record_reset(self):
+        """记录一次重置进度"""
+        self.state.clear()
+        self._pending.append((FRAME_RESET, [], []))
+        self.records_since_snapshot += 1
+
+    def flush(self):
+        """把缓冲的记录写盘并 fsync；记录过多时顺带压缩"""
+        if self._file is None:
+            return
+        if self._pending:
+            frames = []
+            for kind, qids, values in self._pending:
+                body = _columns(qids, values, self.value_code)
+                frames.append(FRAME_HEADER.pack(kind, len(qids), zlib.crc32(body)) + body)
+            self._file.write(b''.join(frames))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = []
+        if self.records_since_snapshot >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """把当前状态写成新快照，并开始新一代 journal"""
+        body = _columns(self.state.keys(), self.state.values(), self.value_code)
+        generation = self.generation + 1
+        self._pending = []
+        _write_atomic(self.snapshot_path,
+                      FILE_HEADER.pack(SNAPSHOT_MAGIC, FORMAT_VERSION, generation)
+                      + SNAPSHOT_COUNT.pack(len(self.state), zlib.crc32(body)) + body)
+        # 快照落盘后旧 journal 即失效（代号更小），再换上新的空 journal
+        self.generation = generation
+        self._start_journal(generation)
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
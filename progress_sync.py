@@ -0,0 +1,605 @@
+"""多设备进度同步
+
+同一个学生在机房电脑和笔记本上刷题时，两边的答题记录、错题集和复习计划
+互不相通，直接拷贝进度文件又会覆盖另一台设备上做过的题。这里把进度建模
+成可合并的复制日志：
+
+    每台设备有自己的设备号和一个只由它追加的记录文件 <设备号>.qsync，
+    每次提交 / 重置进度是一条定长记录（序号、时间、题目 id、状态值），
+    序号就是记录在文件里的位置。各设备已有多少条记录构成向量时钟，
+    同步时只交换对方时钟之后的记录（定长记录，按序号 seek 即可）。
+
+合并结果只取决于记录的集合，与同步的先后顺序无关::
+
+    答题状态    每题取 (时间, 设备号, 序号) 最大的那条记录（后写者胜）
+    复习计划    每题从最近的基线出发，按时间顺序重放所有设备的作答记录（并集）
+    重置进度    排在最后一次重置之前的记录全部作废
+
+设备第一次同步时，已有的进度（答题状态和复习计划）写成一批基线记录。旧进度
+没有作答时间，基线的时间记为 0，排在所有设备的真实作答之前，不会盖掉别的
+设备上更新的答案。之后
+QuizEngine 每次提交都在档案目录的 sync/ 下追加一条记录（见 SyncLog）。
+本机保存全部设备记录的副本和一份合并状态。同步时只把已合并时钟之后的新增
+记录（新下载的和本机的）并进合并状态，再把涉及的题写进答题日志和复习日志，
+下次打开刷题程序即生效。同步前请先关闭刷题程序。
+
+两台设备之间可以通过共享文件夹（网盘同步目录、U 盘）或局域网内的简易
+同步服务器交换记录。
+
+用法::
+
+    python progress_sync.py --folder "D:/网盘/quiz_sync"
+    python progress_sync.py --url http://192.168.1.10:8766 --profile lab
+    python progress_sync.py --serve --folder sync_store --port 8766
+"""
+
+import argparse
+import json
+import os
+import re
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.error import HTTPError, URLError
+from urllib.parse import parse_qs, urlsplit
+from urllib.request import Request, urlopen
+
+from progress_journal import (FLAG_CORRECT, SYNC_DIR_NAME, ProgressJournal,
+                              default_profile_dir, unpack_entry)
+from review_scheduler import ReviewJournal, SparseReviewScheduler
+
+LOG_MAGIC = b'QSYN'
+LOG_VERSION = 1
+LOG_SUFFIX = '.qsync'
+LOG_HEADER = struct.Struct('<4sH2x16s')          # magic, version, 设备号
+OP = struct.Struct('<QdqIB3xQ')                  # 序号, 时间, qid, 答题状态值, 类型, 复习状态
+OP_FIELDS = [('seq', '<u8'), ('time', '<f8'), ('qid', '<i8'), ('value', '<u4'),
+             ('kind', 'u1'), ('pad', 'V3'), ('review', '<u8')]
+MERGED_MAGIC = b'QSYM'
+MERGED_HEADER = struct.Struct('<4sH2x')          # magic, version
+MERGED_FIELDS = [('device', 'S16')] + OP_FIELDS  # 合并状态里的记录：设备号 + 一条记录
+
+OP_ANSWER = 1           # 一次提交：答题状态值（mask | flags << 8）
+OP_RESET = 2            # 重置进度
+OP_BASE = 3             # 第一次同步时已有的进度：答题状态值 + 复习状态（pack_state）
+
+DEVICE_FILE = 'device'
+APPLIED_FILE = 'applied.json'    # 已合并进答题日志的各设备记录数
+MERGED_FILE = 'merged.bin'       # 合并状态（保留下来的记录），与 APPLIED_FILE 对应
+DEFAULT_PORT = 8766
+HTTP_TIMEOUT = 30
+
+_DEVICE_RE = re.compile(r'^[0-9a-f]{16}$')
+
+
+class SyncError(Exception):
+    """记录文件损坏、设备号冲突或同步服务器出错"""
+
+
+# ---- 记录文件 ----
+
+class DeviceLog:
+    """一台设备的记录文件：文件头 + 定长记录，只在末尾追加"""
+
+    def __init__(self, path, device):
+        self.path = path
+        self.device = device
+
+    def count(self):
+        """完整记录的条数（写到一半的尾部不算）"""
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+        return max(0, (size - LOG_HEADER.size) // OP.size)
+
+    def read(self, start=0):
+        """第 start 条（从 0 开始）之后的全部完整记录"""
+        if not os.path.exists(self.path):
+            return b''
+        with open(self.path, 'rb') as f:
+            self._check_header(f.read(LOG_HEADER.size))
+            f.seek(LOG_HEADER.size + start * OP.size)
+            data = f.read()
+        return data[:len(data) - len(data) % OP.size]
+
+    def append(self, start, data):
+        """追加从第 start 条开始的记录；已有的部分跳过，中间缺记录时报错"""
+        if len(data) % OP.size:
+            raise SyncError(f"{self.device}: 记录长度不是 {OP.size} 的整数倍")
+        count = self.count()
+        if start > count:
+            raise SyncError(f"{self.device}: 缺少第 {count + 1}–{start} 条记录")
+        data = data[(count - start) * OP.size:]
+        if not data:
+            return 0
+        exists = os.path.exists(self.path)
+        with open(self.path, 'r+b' if exists else 'wb') as f:
+            if exists:
+                self._check_header(f.read(LOG_HEADER.size))
+            else:
+                f.write(LOG_HEADER.pack(LOG_MAGIC, LOG_VERSION, self.device.encode('ascii')))
+            # 截掉写到一半的尾部再追加
+            f.truncate(LOG_HEADER.size + count * OP.size)
+            f.seek(0, os.SEEK_END)
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(data) // OP.size
+
+    def _check_header(self, header):
+        if len(header) < LOG_HEADER.size:
+            raise SyncError(f"{self.path}: 文件头不完整")
+        magic, version, device = LOG_HEADER.unpack(header)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            raise SyncError(f"{self.path}: 不是同步记录文件或版本不支持")
+        if device.decode('ascii', 'replace') != self.device:
+            raise SyncError(f"{self.path}: 文件头中的设备号与文件名不符")
+
+
+class LogFolder:
+    """一个目录下各设备的记录文件；本机副本和共享文件夹都用它"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def log(self, device):
+        if not _DEVICE_RE.fullmatch(device):
+            raise SyncError(f"设备号格式不对: {device!r}")
+        return DeviceLog(os.path.join(self.directory, device + LOG_SUFFIX), device)
+
+    def clock(self):
+        """向量时钟：{设备号: 记录条数}"""
+        if not os.path.isdir(self.directory):
+            return {}
+        clock = {}
+        for name in os.listdir(self.directory):
+            device, suffix = os.path.splitext(name)
+            if suffix == LOG_SUFFIX and _DEVICE_RE.fullmatch(device):
+                clock[device] = self.log(device).count()
+        return clock
+
+    def fetch(self, device, start):
+        return self.log(device).read(start)
+
+    def push(self, device, start, data):
+        os.makedirs(self.directory, exist_ok=True)
+        return self.log(device).append(start, data)
+
+
+class HttpRemote:
+    """同步服务器（--serve）的客户端，接口与 LogFolder 相同"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+
+    def _request(self, method, path, data=None):
+        request = Request(self.url + path, data=data, method=method,
+                          headers={'Content-Type': 'application/octet-stream'})
+        try:
+            with urlopen(request, timeout=HTTP_TIMEOUT) as response:
+                return response.read()
+        except HTTPError as e:
+            raise SyncError(f"同步服务器返回 {e.code}: {e.read().decode('utf-8', 'replace')}")
+        except URLError as e:
+            raise SyncError(f"连不上同步服务器: {e.reason}")
+
+    def clock(self):
+        return json.loads(self._request('GET', '/clock'))
+
+    def fetch(self, device, start):
+        return self._request('GET', f'/ops/{device}?start={start}')
+
+    def push(self, device, start, data):
+        return json.loads(self._request('POST', f'/ops/{device}?start={start}', data))['appended']
+
+
+# ---- 本设备的记录 ----
+
+def sync_directory(directory):
+    return os.path.join(directory, SYNC_DIR_NAME)
+
+
+def read_device(directory):
+    """档案目录的设备号，没有启用同步时为 None"""
+    try:
+        with open(os.path.join(sync_directory(directory), DEVICE_FILE), encoding='ascii') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def enable_sync(directory):
+    """第一次同步：生成设备号，把已有进度写成基线记录（时间记为 0）；返回设备号"""
+    device = read_device(directory)
+    if device is not None:
+        return device
+    device = uuid.uuid4().hex[:16]
+    state = ProgressJournal(directory).read() if os.path.isdir(directory) else {}
+    reviews = ReviewJournal(directory).read() if os.path.isdir(directory) else {}
+    ops = [OP.pack(seq, 0.0, qid, state.get(qid, 0), OP_BASE, reviews.get(qid, 0))
+           for seq, qid in enumerate(sorted(set(state) | set(reviews)), 1)]
+    LogFolder(sync_directory(directory)).push(device, 0, b''.join(ops))
+    # 设备号最后写：中途失败时下次重新生成，残留的记录文件不会被当成本设备的
+    with open(os.path.join(sync_directory(directory), DEVICE_FILE), 'w', encoding='ascii') as f:
+        f.write(device)
+    return device
+
+
+class SyncLog:
+    """QuizEngine 用的本设备记录：提交 / 重置只进缓冲区，随答题日志一起 flush"""
+
+    def __init__(self, directory):
+        self.device = read_device(directory)
+        if self.device is None:
+            raise SyncError(f"{directory} 没有启用同步")
+        self.log = LogFolder(sync_directory(directory)).log(self.device)
+        self.count = self.log.count()
+        self._pending = []
+
+    def record_answer(self, qid, value, now):
+        self._pending.append(OP.pack(self.count + len(self._pending) + 1, now, qid, value,
+                                     OP_ANSWER, 0))
+
+    def record_reset(self, now):
+        self._pending.append(OP.pack(self.count + len(self._pending) + 1, now, 0, 0, OP_RESET, 0))
+
+    def flush(self):
+        if self._pending:
+            self.count += self.log.append(self.count, b''.join(self._pending))
+            self._pending = []
+
+    def close(self):
+        self.flush()
+
+
+def open_sync_log(directory):
+    """启用了同步的档案返回 SyncLog，否则返回 None"""
+    return SyncLog(directory) if read_device(directory) is not None else None
+
+
+# ---- 合并 ----
+#
+# 合并用 numpy，只在这里的函数里导入：刷题程序写同步记录（SyncLog）时用不到。
+#
+# 本机除了各设备记录的副本，还保存一份合并状态：只留下还可能影响结果的记录
+# （每题答题状态值非 0 的最后一条、最后一条基线和它之后的作答，以及最近一次
+# 重置），存成 MERGED_FILE。新记录到来时只取出涉及的题的保留记录，
+# 与新记录一起重新合并；这些记录按任意顺序合并结果都一样，与从头合并全部
+# 记录相同。
+
+def _load_ops(device, data):
+    """一台设备的一段记录 -> 带设备号列的记录表"""
+    import numpy as np
+
+    raw = np.frombuffer(data, dtype=OP_FIELDS)
+    ops = np.empty(len(raw), dtype=MERGED_FIELDS)
+    ops['device'] = device.encode('ascii')
+    for name, _ in OP_FIELDS:
+        ops[name] = raw[name]
+    return ops
+
+
+def _after(ops, op):
+    """排在记录 op 之后（按 (时间, 设备号, 序号)）的行"""
+    time, device, seq = op['time'], op['device'], op['seq']
+    return (ops['time'] > time) | ((ops['time'] == time) & (
+        (ops['device'] > device) | ((ops['device'] == device) & (ops['seq'] > seq))))
+
+
+def _merge_ops(ops):
+    """合并若干题的全部有效记录，返回 ({qid: 答题状态值}, {qid: 复习状态}, 需要保留的记录)"""
+    import numpy as np
+
+    # 按题分组，组内按 (时间, 设备号, 序号) 排成全序
+    ops = ops[np.lexsort((ops['seq'], ops['device'], ops['time'], ops['qid']))]
+    # 同一条记录合并两次（上次存完合并状态、没来得及存时钟）只算一次
+    same = np.ones(max(len(ops) - 1, 0), dtype=bool)
+    for name in ('qid', 'time', 'device', 'seq'):
+        same &= ops[name][1:] == ops[name][:-1]
+    ops = ops[np.r_[True, ~same]] if len(ops) else ops
+    keep = np.zeros(len(ops), dtype=bool)
+
+    # 后写者胜：每题答题状态值非 0 的最后一条；基线里没有答题记录的值为 0，
+    # 先去掉再挑，免得它挡住更早的真实作答
+    valued = np.flatnonzero(ops['value'] != 0)
+    qid_column = ops['qid'][valued]
+    last = valued[np.r_[qid_column[1:] != qid_column[:-1], True]] if len(valued) else valued
+    keep[last] = True
+    answers = dict(zip(ops['qid'][last].tolist(), ops['value'][last].tolist()))
+
+    # 复习计划：从每题最后一条基线起，按时间顺序重放作答记录
+    reviews = {}
+    if not len(ops):
+        return answers, reviews, ops
+    rows = np.arange(len(ops))
+    starts = np.r_[0, np.flatnonzero(np.diff(ops['qid'])) + 1]
+    ends = np.r_[starts[1:], len(ops)]
+    last_base = np.maximum.reduceat(np.where(ops['kind'] == OP_BASE, rows, -1), starts)
+    firsts = np.maximum(last_base, starts)
+    keep |= rows >= np.repeat(firsts, ends - starts)
+
+    qids, kinds = ops['qid'].tolist(), ops['kind'].tolist()
+    times, values, packed = ops['time'].tolist(), ops['value'].tolist(), ops['review'].tolist()
+    scheduler = SparseReviewScheduler(1)
+    for first, end, base in zip(firsts.tolist(), ends.tolist(), last_base.tolist()):
+        scheduler.reset()
+        if base >= 0 and packed[base]:
+            scheduler.restore([(0, packed[base])])
+        for i in range(first, end):
+            if kinds[i] == OP_ANSWER:
+                scheduler.record_result(0, bool(unpack_entry(values[i])[1] & FLAG_CORRECT), times[i])
+        if scheduler.state(0) is not None:
+            reviews[qids[first]] = scheduler.packed(0)
+    return answers, reviews, ops[keep]
+
+
+def merge_delta(retained, delta):
+    """在保留记录 retained 上合并新记录 delta（都是 _load_ops 的记录表）
+
+    返回 (答案, 复习, 新的保留记录, 是否整体重算)：没有新的重置时只重算
+    delta 涉及的题，答案与复习只含这些题；有新的重置时重算全部题。
+    """
+    import numpy as np
+
+    ops = np.concatenate([retained, delta])
+    resets = ops[ops['kind'] == OP_RESET]
+    reset = resets[np.lexsort((resets['seq'], resets['device'], resets['time']))[-1]] \
+        if len(resets) else None
+    full = reset is not None and bool((delta == reset).any())
+    if full:
+        # 新的重置：排在它前面的记录全部作废，剩下的整体重新合并
+        live = ops[(ops['kind'] != OP_RESET) & _after(ops, reset)]
+        answers, reviews, kept = _merge_ops(live)
+        return answers, reviews, np.concatenate([reset.reshape(1), kept]), True
+
+    delta = delta[delta['kind'] != OP_RESET]
+    if reset is not None:
+        delta = delta[_after(delta, reset)]
+    touched = np.isin(retained['qid'], delta['qid']) & (retained['kind'] != OP_RESET)
+    answers, reviews, kept = _merge_ops(np.concatenate([retained[touched], delta]))
+    return answers, reviews, np.concatenate([retained[~touched], kept]), False
+
+
+def merge_state(folder, qids=None):
+    """从头合并全部设备的记录，返回 ({qid: 答题状态值}, {qid: 复习状态})；qids 为 None 时合并全部题"""
+    import numpy as np
+
+    empty = np.zeros(0, dtype=MERGED_FIELDS)
+    delta = [_load_ops(device, folder.fetch(device, 0)) for device in sorted(folder.clock())]
+    answers, reviews, _, _ = merge_delta(empty, np.concatenate([empty] + delta))
+    if qids is not None:
+        qids = set(qids)
+        answers = {qid: v for qid, v in answers.items() if qid in qids}
+        reviews = {qid: v for qid, v in reviews.items() if qid in qids}
+    return answers, reviews
+
+
+def _load_merged(directory):
+    """读取保留记录；不存在或损坏时返回 None（从头合并）"""
+    import numpy as np
+
+    path = os.path.join(sync_directory(directory), MERGED_FILE)
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    body = data[MERGED_HEADER.size:]
+    itemsize = np.dtype(MERGED_FIELDS).itemsize
+    if (len(data) < MERGED_HEADER.size or len(body) % itemsize
+            or MERGED_HEADER.unpack_from(data) != (MERGED_MAGIC, LOG_VERSION)):
+        print(f"⚠️ 合并状态已损坏，从头合并: {path}")
+        return None
+    return np.frombuffer(body, dtype=MERGED_FIELDS)
+
+
+def _save_merged(directory, retained):
+    path = os.path.join(sync_directory(directory), MERGED_FILE)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(MERGED_HEADER.pack(MERGED_MAGIC, LOG_VERSION))
+        f.write(retained.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+
+def _load_applied(directory):
+    try:
+        with open(os.path.join(sync_directory(directory), APPLIED_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_applied(directory, clock):
+    path = os.path.join(sync_directory(directory), APPLIED_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(clock, f)
+    os.replace(path + '.tmp', path)
+
+
+def apply_pending(directory):
+    """把还没合并的记录（新下载的和本机新增的）合并进答题日志和复习日志
+
+    只读取已合并时钟之后的记录，在保存的合并状态上增量合并；没有合并状态
+    时从头合并本机保存的全部记录。本机新增的记录也要参与：别的设备可能对
+    同一题有时间更晚的记录。返回答题状态或复习计划真正变化了的题数。
+    """
+    import numpy as np
+
+    folder = LogFolder(sync_directory(directory))
+    clock = folder.clock()
+    retained = _load_merged(directory)
+    rebuild = retained is None
+    if rebuild:
+        retained, applied = np.zeros(0, dtype=MERGED_FIELDS), {}
+    else:
+        applied = _load_applied(directory)
+    delta = [_load_ops(device, folder.fetch(device, applied.get(device, 0)))
+             for device, count in sorted(clock.items()) if count > applied.get(device, 0)]
+    if not delta and not rebuild:
+        _save_applied(directory, clock)
+        return 0
+
+    delta = np.concatenate(delta) if delta else np.zeros(0, dtype=MERGED_FIELDS)
+    answers, reviews, retained, full = merge_delta(retained, delta)
+    full = full or rebuild
+    qids = set(delta['qid'][delta['kind'] != OP_RESET].tolist())
+    journal = ProgressJournal(directory)
+    review_journal = ReviewJournal(directory)
+    old_answers = dict(journal.load())
+    old_reviews = dict(review_journal.load())
+    try:
+        # 有新的重置（或从头合并）时整体重写，否则只改变化了的题
+        if full:
+            journal.record_reset()
+            review_journal.record_reset()
+            state, review_state = {}, {}
+        else:
+            state, review_state = old_answers, old_reviews
+        for qid, value in answers.items():
+            if state.get(qid) != value:
+                journal.record(qid, value)
+        for qid, value in reviews.items():
+            if review_state.get(qid) != value:
+                review_journal.record(qid, value)
+        new_answers, new_reviews = journal.state, review_journal.state
+    finally:
+        journal.close()
+        review_journal.close()
+    # 先存合并状态再存时钟：中途失败时重新合并同一批记录，结果不变
+    _save_merged(directory, retained)
+    _save_applied(directory, clock)
+    touched = set(old_answers) | set(old_reviews) | set(new_answers) | set(new_reviews) if full else qids
+    return sum(1 for qid in touched
+               if old_answers.get(qid) != new_answers.get(qid)
+               or old_reviews.get(qid) != new_reviews.get(qid))
+
+
+def sync(directory, remote):
+    """与共享文件夹或同步服务器交换记录并合并，返回统计信息"""
+    start = time.perf_counter()
+    device = enable_sync(directory)
+    folder = LogFolder(sync_directory(directory))
+    local = folder.clock()
+    theirs = remote.clock()
+
+    mine, uploaded_from = local.get(device, 0), theirs.get(device, 0)
+    if uploaded_from > mine:
+        raise SyncError("远端的本设备记录比本机多：两台设备可能在用同一个档案目录的副本，"
+                        f"请删除其中一台的 {sync_directory(directory)} 后重新同步")
+    uploaded = remote.push(device, uploaded_from, folder.fetch(device, uploaded_from)) \
+        if mine > uploaded_from else 0
+
+    downloaded = 0
+    for other, count in sorted(theirs.items()):
+        have = local.get(other, 0)
+        if other != device and count > have:
+            downloaded += folder.push(other, have, remote.fetch(other, have))
+
+    changed = apply_pending(directory)
+    return {'device': device, 'uploaded': uploaded, 'downloaded': downloaded,
+            'changed_questions': changed, 'devices': len(set(theirs) | {device}),
+            'seconds': round(time.perf_counter() - start, 4)}
+
+
+# ---- 同步服务器 ----
+
+class _SyncHandler(BaseHTTPRequestHandler):
+    """GET /clock、GET /ops/<设备号>?start=N、POST /ops/<设备号>?start=N"""
+
+    folder = None
+    lock = threading.Lock()
+
+    def _reply(self, status, body, content_type='application/json; charset=utf-8'):
+        if isinstance(body, (dict, str)):
+            body = (json.dumps(body) if isinstance(body, dict) else body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _target(self):
+        parts = urlsplit(self.path)
+        start = int(parse_qs(parts.query).get('start', ['0'])[0])
+        return parts.path.rstrip('/'), start
+
+    def do_GET(self):
+        try:
+            path, start = self._target()
+            if path == '/clock':
+                self._reply(200, self.folder.clock())
+            elif path.startswith('/ops/'):
+                self._reply(200, self.folder.fetch(path[5:], start), 'application/octet-stream')
+            else:
+                self._reply(404, "not found")
+        except (SyncError, ValueError) as e:
+            self._reply(400, str(e))
+
+    def do_POST(self):
+        try:
+            path, start = self._target()
+            if not path.startswith('/ops/'):
+                self._reply(404, "not found")
+                return
+            data = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            with self.lock:
+                appended = self.folder.push(path[5:], start, data)
+            self._reply(200, {'appended': appended})
+        except SyncError as e:
+            self._reply(409, str(e))
+        except ValueError as e:
+            self._reply(400, str(e))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(folder, host, port):
+    _SyncHandler.folder = LogFolder(folder)
+    server = ThreadingHTTPServer((host, port), _SyncHandler)
+    print(f"✅ 同步服务器已启动: http://{host}:{server.server_address[1]}/  记录目录 {folder}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多设备同步答题进度")
+    parser.add_argument('--folder', help="共享文件夹（--serve 时为服务器的记录目录）")
+    parser.add_argument('--url', help="同步服务器地址")
+    parser.add_argument('--profile', default="default", help="档案名")
+    parser.add_argument('--profile-dir', help="档案目录（默认 ~/.quiz_progress/<档案名>）")
+    parser.add_argument('--serve', action='store_true', help="作为同步服务器运行")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    if args.serve:
+        if not args.folder:
+            raise SystemExit("❌ --serve 需要 --folder 指定记录目录")
+        serve(args.folder, args.host, args.port)
+        return
+    if bool(args.folder) == bool(args.url):
+        raise SystemExit("❌ 请给出 --folder 或 --url 之一")
+
+    directory = args.profile_dir or default_profile_dir(args.profile)
+    remote = LogFolder(args.folder) if args.folder else HttpRemote(args.url)
+    try:
+        report = sync(directory, remote)
+    except (OSError, SyncError) as e:
+        raise SystemExit(f"❌ 同步失败: {e}")
+    print(f"✅ 同步完成（设备 {report['device']}，共 {report['devices']} 台设备）："
+          f"上传 {report['uploaded']} 条，下载 {report['downloaded']} 条，"
+          f"更新 {report['changed_questions']} 题，用时 {report['seconds'] * 1000:.1f} 毫秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,428 @@
+"""二进制题库格式（.qbk）
+
+文件布局（小端序）::
+
+    文件头      64 字节，见 HEADER
+    题目索引    每题 20 字节定长记录：id、题型、选项数、答案
+    块目录 x4   题干、选项、解析、附加信息四个字符串堆各一份，每块 (偏移, 长度)
+    字符串堆 x4 每 block_size 道题打包成一块，可整体 zlib 压缩
+
+字符串堆的每一块由 (n+1) 个 uint32 偏移量加上拼接后的 UTF-8 文本组成。
+打开题库时只 mmap 文件、解析文件头；题干、选项、解析在第一次被访问时
+才解压、解码，最近用过的块保存在一个小的 LRU 缓存里。
+
+用法::
+
+    python question_bank_file.py                       # 编译桌面上的 combined_question_bank.py
+    python question_bank_file.py --json bank.json -o combined_question_bank.qbk
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Mapping
+
+MAGIC = b'QBANK\x00\x00\x01'
+VERSION = 1
+FLAG_COMPRESSED = 0x1
+FLAG_HAS_META = 0x2
+
+HEADER = struct.Struct('<8sHHIIQ4Q4x')
+RECORD = struct.Struct('<qBB8s2x')
+BLOCK_ENTRY = struct.Struct('<QI')
+
+TYPE_NAMES = ('single', 'multiple', 'judge')
+TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+# 字符串堆编号
+HEAP_STEM, HEAP_OPTIONS, HEAP_EXPLANATION, HEAP_META = range(4)
+HEAP_COUNT = 4
+
+OPTION_SEPARATOR = '\x1f'
+META_KEYS = ('chapter', 'tags', 'difficulty')
+# 每道题都有的字段；解析和附加信息只在有值时出现
+BASE_FIELDS = ('id', 'type', 'answer', 'stem', 'options')
+
+DEFAULT_BLOCK_SIZE = 64
+BANK_SUFFIX = '.qbk'
+
+
+class BankFormatError(ValueError):
+    """题库文件损坏或格式不符"""
+
+
+def encode_meta(question):
+    """附加信息（章节、标签、难度）编码为紧凑 JSON，没有时为空串"""
+    meta = {key: question[key] for key in META_KEYS if question.get(key) is not None}
+    if not meta:
+        return ''
+    return json.dumps(meta, ensure_ascii=False, separators=(',', ':'))
+
+
+class BankWriter:
+    """流式写出二进制题库
+
+    题目逐条 add()，满一块就压缩写入临时文件，内存中只保留当前块；
+    finish() 时拼装成最终文件并原子替换目标路径。
+    """
+
+    def __init__(self, path, compress=True, block_size=DEFAULT_BLOCK_SIZE):
+        import tempfile  # 只有写题库时才需要，读题库的进程不必导入
+
+        self.path = path
+        self.compress = compress
+        self.block_size = block_size
+        self.count = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        self._index = tempfile.TemporaryFile(dir=directory)
+        self._heaps = [tempfile.TemporaryFile(dir=directory) for _ in range(HEAP_COUNT)]
+        self._heap_sizes = [0] * HEAP_COUNT
+        self._blocks = [[] for _ in range(HEAP_COUNT)]
+        self._pending = [[] for _ in range(HEAP_COUNT)]
+        self._has_meta = False
+
+    def add(self, question):
+        """追加一道题"""
+        qtype = question['type']
+        if qtype not in TYPE_CODES:
+            raise ValueError(f"题目 {question.get('id')} 的题型无效: {qtype!r}")
+        options = list(question['options'])
+        answer = question['answer'].encode('ascii')
+        if len(answer) > 8 or len(options) > 255:
+            raise ValueError(f"题目 {question.get('id')} 的答案或选项数超出范围")
+
+        self._index.write(RECORD.pack(int(question['id']), TYPE_CODES[qtype],
+                                      len(options), answer))
+        self._pending[HEAP_STEM].append(question['stem'])
+        self._pending[HEAP_OPTIONS].append(OPTION_SEPARATOR.join(options))
+        self._pending[HEAP_EXPLANATION].append(question.get('explanation') or '')
+        meta = encode_meta(question)
+        if meta:
+            self._has_meta = True
+        self._pending[HEAP_META].append(meta)
+        self.count += 1
+        if len(self._pending[HEAP_STEM]) >= self.block_size:
+            self._flush_block()
+
+    def extend(self, questions):
+        for question in questions:
+            self.add(question)
+
+    def _flush_block(self):
+        for heap in range(HEAP_COUNT):
+            strings = self._pending[heap]
+            if not strings:
+                continue
+            payloads = [s.encode('utf-8') for s in strings]
+            offsets = [0]
+            for payload in payloads:
+                offsets.append(offsets[-1] + len(payload))
+            block = struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(payloads)
+            if self.compress:
+                block = zlib.compress(block, 6)
+            self._heaps[heap].write(block)
+            self._blocks[heap].append((self._heap_sizes[heap], len(block)))
+            self._heap_sizes[heap] += len(block)
+            self._pending[heap] = []
+
+    def finish(self):
+        """写出文件头和块目录，返回题目数量"""
+        self._flush_block()
+        nblocks = len(self._blocks[HEAP_STEM])
+        index_offset = HEADER.size
+        directory_offset = index_offset + self.count * RECORD.size
+        data_offset = directory_offset + HEAP_COUNT * nblocks * BLOCK_ENTRY.size
+
+        directory_offsets = []
+        heap_bases = []
+        for heap in range(HEAP_COUNT):
+            directory_offsets.append(directory_offset + heap * nblocks * BLOCK_ENTRY.size)
+            heap_bases.append(data_offset)
+            data_offset += self._heap_sizes[heap]
+
+        flags = FLAG_COMPRESSED if self.compress else 0
+        if self._has_meta:
+            flags |= FLAG_HAS_META
+        import shutil
+
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as out:
+                out.write(HEADER.pack(MAGIC, VERSION, flags, self.count, self.block_size,
+                                      index_offset, *directory_offsets))
+                self._index.seek(0)
+                shutil.copyfileobj(self._index, out)
+                for heap in range(HEAP_COUNT):
+                    out.write(b''.join(BLOCK_ENTRY.pack(heap_bases[heap] + offset, length)
+                                       for offset, length in self._blocks[heap]))
+                for heap in range(HEAP_COUNT):
+                    self._heaps[heap].seek(0)
+                    shutil.copyfileobj(self._heaps[heap], out)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            # 写到一半失败（磁盘满、被中断）时不留下残缺的临时文件
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            self.close()
+        return self.count
+
+    def close(self):
+        self._index.close()
+        for f in self._heaps:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.finish()
+        else:
+            self.close()
+
+
+def write_bank(path, questions, compress=True, block_size=DEFAULT_BLOCK_SIZE):
+    """把题目列表写成二进制题库"""
+    writer = BankWriter(path, compress, block_size)
+    writer.extend(questions)
+    return writer.finish()
+
+
+class LazyQuestion(Mapping):
+    """延迟解码的题目，用法与原来的题目字典一致"""
+
+    __slots__ = ('_bank', '_row')
+
+    def __init__(self, bank, row):
+        self._bank = bank
+        self._row = row
+
+    def __getitem__(self, key):
+        value = self._bank.field(self._row, key)
+        if key == 'explanation' and not value:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self._bank.field_names(self._row))
+
+    def __len__(self):
+        return len(self._bank.field_names(self._row))
+
+    def __repr__(self):
+        return f"<LazyQuestion row={self._row} id={self['id']}>"
+
+
+class BinaryQuestionBank:
+    """只读打开的二进制题库，表现为题目序列"""
+
+    def __init__(self, path, cache_blocks=64):
+        self.path = path
+        self._cache = OrderedDict()
+        self._cache_blocks = cache_blocks
+        # 后台线程建立检索索引时界面线程也在读题，块缓存需要加锁
+        self._cache_lock = threading.Lock()
+        self._mm = None
+        self._file = open(path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise BankFormatError(f"题库文件为空: {path}")
+        try:
+            self._parse_header()
+        except BankFormatError:
+            self.close()
+            raise
+
+    def _parse_header(self):
+        size = len(self._mm)
+        if size < HEADER.size:
+            raise BankFormatError(f"题库文件不完整: {self.path}")
+        header = HEADER.unpack_from(self._mm, 0)
+        magic, version, self.flags, self.count, self.block_size, self._index_offset = header[:6]
+        if magic != MAGIC or version != VERSION:
+            raise BankFormatError(f"不是有效的题库文件: {self.path}")
+        self._directory_offsets = header[6:]
+        self.compressed = bool(self.flags & FLAG_COMPRESSED)
+        self.has_meta = bool(self.flags & FLAG_HAS_META)
+        # 定长索引和块目录必须完整落在文件内，截断的文件在打开时就报错
+        blocks = -(-self.count // self.block_size) if self.block_size else 0
+        if self.count and not blocks:
+            raise BankFormatError(f"题库文件头损坏: {self.path}")
+        ends = [self._index_offset + self.count * RECORD.size]
+        ends.extend(offset + blocks * BLOCK_ENTRY.size for offset in self._directory_offsets)
+        if max(ends) > size:
+            raise BankFormatError(f"题库文件不完整: {self.path}")
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [LazyQuestion(self, r) for r in range(*row.indices(self.count))]
+        if row < 0:
+            row += self.count
+        if not 0 <= row < self.count:
+            raise IndexError(row)
+        return LazyQuestion(self, row)
+
+    def __iter__(self):
+        for row in range(self.count):
+            yield LazyQuestion(self, row)
+
+    def record(self, row):
+        """定长索引记录：(id, 题型编号, 选项数, 答案)"""
+        return RECORD.unpack_from(self._mm, self._index_offset + row * RECORD.size)
+
+    def iter_records(self):
+        """按行顺序遍历全部索引记录"""
+        end = self._index_offset + self.count * RECORD.size
+        return RECORD.iter_unpack(self._mm[self._index_offset:end])
+
+    def field(self, row, key):
+        """读取单个字段，文本字段只在这里解码"""
+        if key == 'stem':
+            return self._string(HEAP_STEM, row)
+        if key == 'options':
+            text = self._string(HEAP_OPTIONS, row)
+            return text.split(OPTION_SEPARATOR) if text else []
+        if key == 'explanation':
+            return self._string(HEAP_EXPLANATION, row)
+        qid, type_code, _, answer = self.record(row)
+        if key == 'id':
+            return qid
+        if key == 'type':
+            return TYPE_NAMES[type_code]
+        if key == 'answer':
+            return answer.rstrip(b'\0').decode('ascii')
+        meta = self.meta(row)
+        if key in meta:
+            return meta[key]
+        raise KeyError(key)
+
+    def field_names(self, row):
+        """这一行实际有的字段名（没有解析、附加信息时不列出）"""
+        names = list(BASE_FIELDS)
+        if self._string(HEAP_EXPLANATION, row):
+            names.append('explanation')
+        names.extend(self.meta(row))
+        return names
+
+    def meta(self, row):
+        if not self.has_meta:
+            return {}
+        text = self._string(HEAP_META, row)
+        return json.loads(text) if text else {}
+
+    def iter_meta(self, start=0, stop=None):
+        """按行顺序解码 [start, stop) 的附加信息，没有附加信息的行为 {}
+
+        每块的字符串拼成一个 JSON 数组整体解析一次，比逐行 json.loads 快得多；
+        这些块不进 LRU 缓存，顺序加载时不会挤掉正在浏览的题干块。
+        """
+        if stop is None:
+            stop = self.count
+        if not self.has_meta:
+            for _ in range(start, stop):
+                yield {}
+            return
+        block_size = self.block_size
+        for block_no in range(start // block_size, -(-stop // block_size)):
+            first = block_no * block_size
+            n = min(block_size, self.count - first)
+            block = self._read_block(HEAP_META, block_no)
+            try:
+                offsets = struct.unpack_from(f'<{n + 1}I', block)
+            except struct.error as e:
+                raise BankFormatError(f"题库数据块损坏: {self.path} ({e})")
+            base = (n + 1) * 4
+            data = bytes(block[base:base + offsets[-1]])
+            items = [data[offsets[i]:offsets[i + 1]] or b'{}'
+                     for i in range(max(start - first, 0), min(stop - first, n))]
+            yield from json.loads(b'[' + b','.join(items) + b']')
+
+    def _read_block(self, heap, block_no):
+        offset, length = BLOCK_ENTRY.unpack_from(
+            self._mm, self._directory_offsets[heap] + block_no * BLOCK_ENTRY.size)
+        if offset + length > len(self._mm):
+            raise BankFormatError(f"题库文件不完整: {self.path}")
+        if self.compressed:
+            try:
+                return zlib.decompress(self._mm[offset:offset + length])
+            except zlib.error as e:
+                raise BankFormatError(f"题库数据块损坏: {self.path} ({e})")
+        # 未压缩时直接引用映射区，不复制
+        return memoryview(self._mm)[offset:offset + length]
+
+    def _block(self, heap, block_no):
+        key = (heap, block_no)
+        with self._cache_lock:
+            block = self._cache.get(key)
+            if block is not None:
+                self._cache.move_to_end(key)
+                return block
+            block = self._read_block(heap, block_no)
+            self._cache[key] = block
+            if len(self._cache) > self._cache_blocks:
+                self._cache.popitem(last=False)
+            return block
+
+    def _string(self, heap, row):
+        block_no, i = divmod(row, self.block_size)
+        block = self._block(heap, block_no)
+        n = min(self.block_size, self.count - block_no * self.block_size)
+        base = (n + 1) * 4
+        try:
+            start, end = struct.unpack_from('<2I', block, i * 4)
+            if base + end > len(block):
+                raise ValueError("字符串超出数据块")
+            return bytes(block[base + start:base + end]).decode('utf-8')
+        except (struct.error, ValueError) as e:
+            raise BankFormatError(f"题库数据块损坏: {self.path} ({e})")
+
+    def close(self):
+        self._cache.clear()
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+
+def main():
+    import argparse  # 仅命令行使用，避免拖慢 import
+
+    parser = argparse.ArgumentParser(description="把题库编译为二进制 .qbk 格式")
+    parser.add_argument('--module', default='combined_question_bank',
+                        help="题库模块名（默认从桌面导入 combined_question_bank）")
+    parser.add_argument('--json', help="改为从 JSON 文件读取题目列表")
+    parser.add_argument('-o', '--output', help="输出路径（默认桌面上的 combined_question_bank.qbk）")
+    parser.add_argument('--no-compress', action='store_true', help="字符串堆不压缩")
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    desktop = os.path.join(os.path.expanduser("~"), "Desktop")
+    if args.json:
+        with open(args.json, encoding='utf-8') as f:
+            questions = json.load(f)
+    else:
+        if desktop not in sys.path:
+            sys.path.append(desktop)
+        questions = __import__(args.module).question_bank
+
+    output = args.output or os.path.join(desktop, 'combined_question_bank' + BANK_SUFFIX)
+    count = write_bank(output, questions, not args.no_compress, args.block_size)
+    print(f"✅ 已写入 {output}，共{count}题")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""题目查询引擎
+
+题库加载后为题型、章节、标签、难度预先建立位图索引（Python 整数即位图）。
+错题集、已答集按 4096 题一块分块存放（只保存有置位的块），单题更新只改
+一个小整数，内存随答过的题数增长；查询用到时才拼成整个题库宽度的位图。筛选条件用嵌套元组表示，可用
+and / or / not 任意组合，例如::
+
+    ('and', ('type', 'single'), ('or', ('chapter', '第一章'), ('unanswered',)))
+
+全文检索结果也可以作为筛选条件：('search', '多重继承')，由挂在查询引擎
+上的 search_index.SearchIndex 计算。
+
+筛选结果按“条件 + 动态集合版本号”缓存，只有筛选条件或答题状态真正
+变化时才会重新计算。服务器上多个会话共用一份题库时，与答题状态无关的
+筛选结果放在共用的 SelectionCache 里，每个会话只保存自己的动态结果。
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from question_bank_file import TYPE_NAMES
+
+# 每个字节值对应的置位下标，用于位图 -> 下标列表的快速展开
+_BYTE_BITS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
+# 支持的静态维度与动态维度
+STATIC_DIMENSIONS = ('type', 'chapter', 'tag', 'difficulty')
+DYNAMIC_DIMENSIONS = ('wrong', 'answered', 'unanswered')
+
+ALL = ('all',)
+
+# 动态集合分块：每块 1 << CHUNK_SHIFT 题，存为一个 Python 整数
+CHUNK_SHIFT = 12
+CHUNK_BYTES = (1 << CHUNK_SHIFT) >> 3
+CHUNK_MASK = (1 << CHUNK_SHIFT) - 1
+
+# 共用缓存最多保留多少种静态筛选结果
+SHARED_CACHE_LIMIT = 256
+# 每个查询引擎最多记住多少个筛选条件依赖哪些动态集合
+DEPS_CACHE_LIMIT = 256
+
+
+def popcount(bits):
+    """位图中置位的个数"""
+    return bin(bits).count('1')
+
+
+if hasattr(int, 'bit_count'):  # Python 3.10+
+    popcount = int.bit_count
+
+
+def positions_to_bits(positions, size):
+    """下标序列 -> 位图"""
+    buf = bytearray((size + 7) >> 3)
+    for p in positions:
+        buf[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(buf, 'little')
+
+
+def codes_to_bits(codes, code):
+    """每行一个字节的编号列 -> 编号等于 code 的行的位图
+
+    把编号列翻译成 '0'/'1' 数字串后按二进制整体解析，不逐行循环。
+    """
+    table = bytearray(b'0' * 256)
+    table[code & 0xFF] = ord('1')
+    digits = bytes(codes).translate(table)
+    return int(digits[::-1], 2) if digits else 0
+
+
+def bits_to_positions(bits):
+    """位图 -> 升序下标列表"""
+    if not bits:
+        return []
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, 'little')
+    return [base + i
+            for base, byte in zip(range(0, len(data) << 3, 8), data) if byte
+            for i in _BYTE_BITS[byte]]
+
+
+def question_tags(question):
+    """读取题目标签，兼容列表和逗号分隔字符串两种写法"""
+    tags = question.get('tags')
+    if not tags:
+        return ()
+    if isinstance(tags, str):
+        return tuple(t.strip() for t in tags.replace('，', ',').split(',') if t.strip())
+    return tuple(tags)
+
+
+def build_filter(type_value="all", mode="all", extra=(), combine="and", search=""):
+    """根据界面上的选择拼出筛选表达式
+
+    题型、练习模式和检索词始终取交集；extra 中的附加条件（章节、标签、
+    难度、答题状态）按 combine 指定的 and / or 组合后再与前者取交集。
+    """
+    clauses = []
+    if type_value != "all":
+        clauses.append(('type', type_value))
+    if mode == "wrong":
+        clauses.append(('wrong',))
+    if search:
+        clauses.append(('search', search))
+    extra = tuple(extra)
+    if len(extra) == 1:
+        clauses.append(extra[0])
+    elif extra:
+        clauses.append((combine,) + extra)
+
+    if not clauses:
+        return ALL
+    if len(clauses) == 1:
+        return clauses[0]
+    return ('and',) + tuple(clauses)
+
+
+class QuestionIndex:
+    """题库静态索引：各维度取值 -> 位图（基于列式题库构建）"""
+
+    def __init__(self, store):
+        self.size = len(store)
+        self.all_bits = (1 << self.size) - 1
+        self._bits = {}
+        self._values = {}
+
+        # 题型直接从编号列生成位图
+        codes = store.type_codes
+        types = [TYPE_NAMES[code] for code in sorted(set(codes))]
+        self._values['type'] = sorted(types)
+        for name in types:
+            self._bits[('type', name)] = codes_to_bits(codes, TYPE_NAMES.index(name))
+
+        # 附加信息按行号递增存放，位置列表天然有序
+        groups = {dim: {} for dim in STATIC_DIMENSIONS if dim != 'type'}
+        chapters, difficulties, tags = groups['chapter'], groups['difficulty'], groups['tag']
+        for pos, meta in store.meta_items():
+            chapter = meta.get('chapter')
+            if chapter is not None:
+                chapters.setdefault(chapter, []).append(pos)
+            difficulty = meta.get('difficulty')
+            if difficulty is not None:
+                difficulties.setdefault(difficulty, []).append(pos)
+            for tag in question_tags(meta):
+                tags.setdefault(tag, []).append(pos)
+
+        for dim, by_value in groups.items():
+            self._values[dim] = sorted(by_value, key=str)
+            for value, positions in by_value.items():
+                self._bits[(dim, value)] = positions_to_bits(positions, self.size)
+
+    def values(self, dim):
+        """某一维度下出现过的全部取值"""
+        return list(self._values.get(dim, ()))
+
+    def bits(self, dim, value):
+        """某一维度取值对应的位图，不存在时为空位图"""
+        return self._bits.get((dim, value), 0)
+
+    def count(self, dim, value):
+        """某一维度取值下的题目数量"""
+        return popcount(self.bits(dim, value))
+
+
+class BitPositions:
+    """位图表示的升序下标序列：按 4096 题分块保存块内位图，用到哪块才展开哪块
+
+    筛选结果很大时（例如检索常见词命中几十万题中的十几万题），逐个展开
+    成下标列表本身就要十几毫秒；这里只记每块的起始序号，长度、按序号
+    取下标、查某行的序号都只需在块之间二分，再在块内数置位。
+    """
+
+    __slots__ = ('_keys', '_blocks', '_starts', '_count', '_open', '_rows')
+
+    def __init__(self, bits):
+        data = bits.to_bytes((bits.bit_length() + 7) >> 3, 'little') if bits else b''
+        keys, blocks, starts = [], [], []
+        count = 0
+        for key, offset in enumerate(range(0, len(data), CHUNK_BYTES)):
+            block = int.from_bytes(data[offset:offset + CHUNK_BYTES], 'little')
+            if block:
+                keys.append(key)
+                blocks.append(block)
+                starts.append(count)
+                count += popcount(block)
+        self._keys = keys
+        self._blocks = blocks
+        self._starts = starts
+        self._count = count
+        self._open = None    # 最近展开的块及其下标列表，顺序浏览时反复命中
+        self._rows = None
+
+    def _block_rows(self, j):
+        base = self._keys[j] << CHUNK_SHIFT
+        return [base + p for p in bits_to_positions(self._blocks[j])]
+
+    def _expand(self, j):
+        if self._open != j:
+            self._rows = self._block_rows(j)
+            self._open = j
+        return self._rows
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("下标超出筛选结果范围")
+        j = bisect_right(self._starts, i) - 1
+        return self._expand(j)[i - self._starts[j]]
+
+    def __iter__(self):
+        for j in range(len(self._keys)):
+            yield from self._block_rows(j)
+
+    def __contains__(self, row):
+        return self.index_of(row) is not None
+
+    def index_of(self, row):
+        """row 在序列中的序号，不在其中时为 None"""
+        key = row >> CHUNK_SHIFT
+        j = bisect_left(self._keys, key)
+        if j == len(self._keys) or self._keys[j] != key:
+            return None
+        block, offset = self._blocks[j], row & CHUNK_MASK
+        if not block >> offset & 1:
+            return None
+        return self._starts[j] + popcount(block & ((1 << offset) - 1))
+
+    def tolist(self):
+        """展开成下标列表"""
+        return list(self)
+
+
+class Selection:
+    """筛选结果：按题库顺序排列的题目序列，只保存下标不复制题目"""
+
+    __slots__ = ('questions', 'positions')
+
+    def __init__(self, questions, positions):
+        self.questions = questions
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __bool__(self):
+        return len(self.positions) > 0
+
+    def __getitem__(self, i):
+        return self.questions[self.positions[i]]
+
+    def __iter__(self):
+        for p in self.positions:
+            yield self.questions[p]
+
+    def position(self, i):
+        """第 i 道筛选结果在题库中的下标"""
+        return self.positions[i]
+
+
+class SelectionCache:
+    """多个查询引擎共用的静态筛选结果（条件 -> 升序下标数组），按最近使用淘汰"""
+
+    def __init__(self, limit=SHARED_CACHE_LIMIT):
+        self.limit = limit
+        self._items = OrderedDict()
+
+    def get(self, expr):
+        positions = self._items.get(expr)
+        if positions is not None:
+            self._items.move_to_end(expr)
+        return positions
+
+    def put(self, expr, positions):
+        self._items[expr] = positions
+        self._items.move_to_end(expr)
+        while len(self._items) > self.limit:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+class QueryEngine:
+    """查询引擎：静态索引 + 错题/已答动态位图 + 结果缓存
+
+    cache 为共用的 SelectionCache 时，静态条件的结果从中存取。筛选结果
+    稠密时存为分块位图（BitPositions），稀疏时存为 4 字节一项的 array('I')，
+    取两者中较小的一种，每个会话的缓存不超过题库大小 x 4 字节。
+    """
+
+    def __init__(self, index, search_index=None, cache=None):
+        self.index = index
+        self.search_index = search_index
+        self.shared = cache
+        self._chunks = {'wrong': {}, 'answered': {}}   # 动态集合 -> {块号: 块内位图}
+        self._versions = {'wrong': 0, 'answered': 0}
+        self._deps = OrderedDict()   # 筛选条件 -> 依赖的动态集合，按最近使用淘汰
+        self._cache_key = None
+        self._cache_positions = None
+
+    # ---- 动态集合维护 ----
+
+    def _set(self, name, pos, flag):
+        chunks = self._chunks[name]
+        block = pos >> CHUNK_SHIFT
+        bit = 1 << (pos & CHUNK_MASK)
+        word = chunks.get(block, 0)
+        if bool(word & bit) == bool(flag):
+            return
+        word ^= bit
+        if word:
+            chunks[block] = word
+        else:
+            del chunks[block]
+        self._versions[name] += 1
+
+    def set_wrong(self, pos, flag):
+        """标记/取消错题，状态未变化时不使缓存失效"""
+        self._set('wrong', pos, flag)
+
+    def set_answered(self, pos, flag=True):
+        """标记/取消已答"""
+        self._set('answered', pos, flag)
+
+    def clear(self):
+        """清空错题和已答状态（重置进度）"""
+        for name, chunks in self._chunks.items():
+            if chunks:
+                chunks.clear()
+                self._versions[name] += 1
+
+    def dynamic_bits(self, name):
+        """动态集合的位图：各块按块号拼接，未出现的块补零（在 C 里完成）"""
+        chunks = self._chunks[name]
+        if not chunks:
+            return 0
+        buf = bytearray((max(chunks) + 1) * CHUNK_BYTES)
+        for block, word in chunks.items():
+            start = block * CHUNK_BYTES
+            buf[start:start + CHUNK_BYTES] = word.to_bytes(CHUNK_BYTES, 'little')
+        return int.from_bytes(buf, 'little')
+
+    @property
+    def wrong_bits(self):
+        return self.dynamic_bits('wrong')
+
+    @property
+    def answered_bits(self):
+        return self.dynamic_bits('answered')
+
+    def set_search_index(self, search_index):
+        """挂上（或更换）全文检索索引，旧的检索结果缓存随之作废"""
+        self.search_index = search_index
+        self._cache_key = None
+
+    # ---- 查询 ----
+
+    def evaluate(self, expr):
+        """计算筛选表达式对应的位图"""
+        op = expr[0]
+        if op == 'all':
+            return self.index.all_bits
+        if op == 'and':
+            bits = self.index.all_bits
+            for sub in expr[1:]:
+                bits &= self.evaluate(sub)
+                if not bits:
+                    break
+            return bits
+        if op == 'or':
+            bits = 0
+            for sub in expr[1:]:
+                bits |= self.evaluate(sub)
+            return bits
+        if op == 'not':
+            return self.index.all_bits & ~self.evaluate(expr[1])
+        if op == 'wrong':
+            return self.wrong_bits
+        if op == 'answered':
+            return self.answered_bits
+        if op == 'unanswered':
+            return self.index.all_bits & ~self.answered_bits
+        if op in STATIC_DIMENSIONS:
+            return self.index.bits(op, expr[1])
+        if op == 'search':
+            if self.search_index is None:
+                raise ValueError("题库还没有建立检索索引")
+            return self.search_index.match_bits(expr[1])
+        raise ValueError(f"未知的筛选条件: {expr!r}")
+
+    def select(self, expr=ALL):
+        """返回筛选结果的题库下标（升序），条件和答题状态不变时直接复用缓存"""
+        versions = self._dynamic_versions(expr)
+        key = (expr, versions)
+        if key != self._cache_key:
+            shared = self.shared if not versions else None
+            positions = None if shared is None else shared.get(expr)
+            if positions is None:
+                positions = self._positions(self.evaluate(expr))
+                if shared is not None:
+                    shared.put(expr, positions)
+            self._cache_positions = positions
+            self._cache_key = key
+        return self._cache_positions
+
+    def _positions(self, bits):
+        if bits == self.index.all_bits:
+            return range(self.index.size)
+        positions = BitPositions(bits)
+        if len(positions) << 5 < len(positions._blocks) << CHUNK_SHIFT:
+            # 结果稀疏时下标数组比分块位图还小，直接展开
+            positions = array('I', positions) if self.shared is not None else positions.tolist()
+        return positions
+
+    def _dynamic_versions(self, expr):
+        deps = self._deps.get(expr)
+        if deps is None:
+            deps = tuple(sorted(self._collect_deps(expr)))
+            self._deps[expr] = deps
+            if len(self._deps) > DEPS_CACHE_LIMIT:
+                self._deps.popitem(last=False)
+        else:
+            self._deps.move_to_end(expr)
+        return tuple(self._versions[d] for d in deps)
+
+    def _collect_deps(self, expr):
+        op = expr[0]
+        if op in ('and', 'or', 'not'):
+            deps = set()
+            for sub in expr[1:]:
+                deps |= self._collect_deps(sub)
+            return deps
+        if op == 'wrong':
+            return {'wrong'}
+        if op in ('answered', 'unanswered'):
+            return {'answered'}
+        return set()
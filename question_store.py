@@ -0,0 +1,269 @@
+"""列式题库存储
+
+题目 id、题型编号、选项数和正确答案（A–H 位掩码）分别存放在紧凑的
+array 列里，题干、选项、解析等文本按行号存放，二进制题库则直接委托给
+mmap 读取器按需解码。界面拿到的 Question 对象只保存 (store, row)，
+用法与原来的题目字典一致。
+
+答题记录、错题集都以行号（int）为键，不再每次 str(q['id'])。
+"""
+
+import json
+from array import array
+from collections import namedtuple
+from collections.abc import Mapping
+from itertools import islice
+
+from question_bank_file import BANK_SUFFIX, BASE_FIELDS, TYPE_CODES, TYPE_NAMES, BinaryQuestionBank
+
+LETTERS = 'ABCDEFGH'
+
+# 分块加载时每块的题数（二进制题库块大小的整数倍）
+LOAD_CHUNK_ROWS = 8192
+
+# 单条答题记录：selected 为所选字母，is_correct 为是否答对
+AnswerRecord = namedtuple('AnswerRecord', 'selected is_correct')
+
+
+def letters_to_mask(letters):
+    """'ACD' -> 0b1101；含 A–H 以外的字符时返回 0"""
+    mask = 0
+    for ch in letters:
+        i = ord(ch) - 65
+        if not 0 <= i < 8:
+            return 0
+        mask |= 1 << i
+    return mask
+
+
+def mask_to_letters(mask):
+    """0b1101 -> 'ACD'"""
+    return ''.join(LETTERS[i] for i in range(8) if mask >> i & 1)
+
+
+def canonical_answer_mask(answer):
+    """答案字符串是规范写法（A–H 升序且不重复）时返回位掩码，否则返回 0
+
+    原来按字符串比较判分，用户提交的答案总是规范写法，因此不规范的
+    标准答案永远判错；掩码为 0 时同样永远不会与非空选择相等。
+    """
+    mask = letters_to_mask(answer)
+    if mask and mask_to_letters(mask) == answer:
+        return mask
+    return 0
+
+
+class Question(Mapping):
+    """题库中的一行，按需从列存储中取字段"""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key):
+        return self.store.field(self.row, key)
+
+    def __iter__(self):
+        return iter(self.store.field_names(self.row))
+
+    def __len__(self):
+        return len(self.store.field_names(self.row))
+
+    def __eq__(self, other):
+        if isinstance(other, Question):
+            return self.store is other.store and self.row == other.row
+        return Mapping.__eq__(self, other)
+
+    def __hash__(self):
+        return hash((id(self.store), self.row))
+
+    def __repr__(self):
+        return f"<Question row={self.row} id={self.store.ids[self.row]}>"
+
+
+class QuestionStore:
+    """列式题库，表现为 Question 序列"""
+
+    def __init__(self):
+        self.ids = array('q')
+        self.type_codes = array('b')
+        self.option_counts = array('B')
+        self.answer_masks = array('B')
+        self._raw_answers = {}       # 不规范答案：行号 -> 原始字符串
+        self._stems = []
+        self._options = []
+        self._explanations = []
+        self._meta = {}              # 稀疏：行号 -> 章节/标签/难度
+        self._binary = None
+        self._row_of_id = None
+        self.source = None           # 题库文件路径（检索索引等附属文件放在旁边）
+
+    # ---- 构建 ----
+
+    @classmethod
+    def from_questions(cls, questions):
+        """从题目字典列表构建"""
+        store = cls()
+        store.extend(questions)
+        return store
+
+    @classmethod
+    def from_binary(cls, bank):
+        """从二进制题库构建：只读入定长索引，文本仍留在 mmap 中"""
+        store = cls()
+        for _ in store.load_binary(bank):
+            pass
+        return store
+
+    def load_binary(self, bank, chunk_rows=LOAD_CHUNK_ROWS):
+        """分块读入二进制题库的定长索引和附加信息，每读完一块 yield 已读题数
+
+        后台加载线程借此汇报进度。不同的答案写法很少，规范化结果按原始
+        字节缓存；附加信息整块解析。空题库也会 yield 一次。
+        """
+        self._binary = bank
+        self.source = bank.path
+        count = len(bank)
+        records = bank.iter_records()
+        answers = {}
+        for start in range(0, count or 1, chunk_rows):
+            stop = min(start + chunk_rows, count)
+            for qid, type_code, option_count, raw in islice(records, stop - start):
+                parsed = answers.get(raw)
+                if parsed is None:
+                    answer = raw.rstrip(b'\0').decode('ascii')
+                    parsed = answers[raw] = (answer, canonical_answer_mask(answer))
+                self._append_columns(qid, type_code, option_count, *parsed)
+            if bank.has_meta:
+                meta = self._meta
+                for row, value in enumerate(bank.iter_meta(start, stop), start):
+                    if value:
+                        meta[row] = value
+            yield stop
+
+    def extend(self, questions):
+        """追加题目字典（仅内存题库）"""
+        for q in questions:
+            row = len(self.ids)
+            self._append_columns(int(q['id']), TYPE_CODES[q['type']],
+                                 len(q['options']), q['answer'])
+            self._stems.append(q['stem'])
+            self._options.append(tuple(q['options']))
+            self._explanations.append(q.get('explanation'))
+            meta = {key: q[key] for key in ('chapter', 'tags', 'difficulty')
+                    if q.get(key) is not None}
+            if meta:
+                self._meta[row] = meta
+        self._row_of_id = None
+
+    def _append_columns(self, qid, type_code, option_count, answer, mask=None):
+        row = len(self.ids)
+        if mask is None:
+            mask = canonical_answer_mask(answer)
+        if not mask:
+            self._raw_answers[row] = answer
+        self.ids.append(qid)
+        self.type_codes.append(type_code)
+        self.option_counts.append(option_count)
+        self.answer_masks.append(mask)
+
+    # ---- 序列接口 ----
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self.ids)
+        if not 0 <= row < len(self.ids):
+            raise IndexError(row)
+        return Question(self, row)
+
+    def __iter__(self):
+        for row in range(len(self.ids)):
+            yield Question(self, row)
+
+    # ---- 字段访问 ----
+
+    def field(self, row, key):
+        if key == 'id':
+            return self.ids[row]
+        if key == 'type':
+            return TYPE_NAMES[self.type_codes[row]]
+        if key == 'answer':
+            return self.answer_text(row)
+        if key in ('stem', 'options'):
+            return self.text(row, key)
+        if key == 'explanation':
+            value = self.text(row, key)
+            if value is None:
+                raise KeyError(key)
+            return value
+        meta = self.meta(row)
+        if key in meta:
+            return meta[key]
+        raise KeyError(key)
+
+    def field_names(self, row):
+        """这一行能用 field() 取到的全部字段名"""
+        names = list(BASE_FIELDS)
+        if self.text(row, 'explanation') is not None:
+            names.append('explanation')
+        names.extend(self.meta(row))
+        return names
+
+    def text(self, row, key):
+        """题干/选项/解析；二进制题库在这里才解码"""
+        if self._binary is not None:
+            value = self._binary.field(row, key)
+            if key == 'explanation' and not value:
+                return None
+            return value
+        if key == 'stem':
+            return self._stems[row]
+        if key == 'options':
+            return list(self._options[row])
+        return self._explanations[row]
+
+    def meta(self, row):
+        return self._meta.get(row, {})
+
+    def meta_items(self):
+        """有附加信息的行：(行号, 附加信息)"""
+        return self._meta.items()
+
+    def answer_text(self, row):
+        mask = self.answer_masks[row]
+        if mask:
+            return mask_to_letters(mask)
+        return self._raw_answers[row]
+
+    def type_name(self, row):
+        return TYPE_NAMES[self.type_codes[row]]
+
+    def is_correct(self, row, selected_mask):
+        """判分：所选位掩码与标准答案完全一致"""
+        answer_mask = self.answer_masks[row]
+        return answer_mask != 0 and selected_mask == answer_mask
+
+    def row_of(self, qid):
+        """题目 id -> 行号，首次调用时建立映射"""
+        if self._row_of_id is None:
+            self._row_of_id = {qid: row for row, qid in enumerate(self.ids)}
+        return self._row_of_id.get(qid)
+
+    def type_counts(self):
+        """各题型数量"""
+        return {name: self.type_codes.count(code) for code, name in enumerate(TYPE_NAMES)}
+
+
+def load_store(path):
+    """按扩展名打开题库文件：.qbk 二进制题库或 .json 题目列表"""
+    if path.endswith(BANK_SUFFIX):
+        return QuestionStore.from_binary(BinaryQuestionBank(path))
+    with open(path, encoding='utf-8') as f:
+        store = QuestionStore.from_questions(json.load(f))
+    store.source = path
+    return store
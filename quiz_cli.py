@@ -0,0 +1,238 @@
+"""命令行刷题
+
+用脚本驱动一整场练习，不需要图形界面。脚本每行一条命令，# 开头为注释::
+
+    filter type=single mode=wrong chapter=第一章 status=未答 combine=or
+    filter mode=review      # 到期复习（间隔重复）
+    filter search=多重继承  # 检索结果作为筛选条件
+    search 多重继承 python   # 按相关度列出检索结果
+    next | prev | random | goto 12
+    order shuffle       # 洗牌顺序（order sequential 恢复题库顺序）
+    show                # 显示当前题
+    submit ABC          # 提交答案
+    explain             # 显示解析
+    stats
+    breakdown           # 按题型/章节/标签/难度/模式的统计
+    reset
+    flush               # 立即保存进度
+
+用法::
+
+    python quiz_cli.py session.txt --bank combined_question_bank.qbk --profile lab01
+    python quiz_cli.py --json < session.txt
+
+不给 --bank 时与图形界面相同：桌面上的 .qbk、combined_question_bank 模块、示例题库。
+"""
+
+import json
+import sys
+
+from quiz_engine import QuizEngine
+
+FILTER_KEYS = ('type', 'mode', 'combine', 'search')
+EXTRA_KEYS = ('chapter', 'tag', 'difficulty', 'status')
+
+
+class CommandError(ValueError):
+    """脚本命令有误"""
+
+
+def question_payload(engine, question):
+    """当前题目的可序列化描述"""
+    record = engine.answer_for(question.row)
+    index, count = engine.progress()
+    return {
+        'index': index,
+        'count': count,
+        'id': question['id'],
+        'type': question['type'],
+        'stem': question['stem'],
+        'options': question['options'],
+        'answered': None if record is None else record.selected,
+    }
+
+
+class Session:
+    """逐条执行命令，返回每条命令的结果"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def execute(self, line):
+        parts = line.split()
+        command, args = parts[0].lower(), parts[1:]
+        handler = getattr(self, 'do_' + command, None)
+        if handler is None:
+            raise CommandError(f"未知命令: {command}")
+        return handler(args)
+
+    def do_filter(self, args):
+        options = {}
+        extra = []
+        for arg in args:
+            key, sep, value = arg.partition('=')
+            if not sep:
+                raise CommandError(f"筛选参数应为 key=value: {arg}")
+            if key in FILTER_KEYS:
+                options[key] = value
+            elif key in EXTRA_KEYS:
+                clause = self.engine.extra_choices(key).get(value)
+                if clause is None:
+                    raise CommandError(f"没有这个{key}: {value}")
+                extra.append(clause)
+            else:
+                raise CommandError(f"未知筛选条件: {key}")
+        self.engine.set_filter(options.get('type', 'all'), options.get('mode', 'all'),
+                               extra, options.get('combine', 'and'), options.get('search', ''))
+        return {'count': len(self.engine.filtered())}
+
+    def do_search(self, args):
+        if not args:
+            raise CommandError("search 需要检索词")
+        total, hits = self.engine.search(' '.join(args))
+        return {'total': total,
+                'hits': [{'id': q['id'], 'score': round(score, 3), 'stem': q['stem']}
+                         for q, score in hits]}
+
+    def do_next(self, args):
+        return {'moved': self.engine.next(), 'index': self.engine.progress()[0]}
+
+    def do_prev(self, args):
+        return {'moved': self.engine.previous(), 'index': self.engine.progress()[0]}
+
+    def do_random(self, args):
+        return {'moved': self.engine.random_pick(), 'index': self.engine.progress()[0]}
+
+    def do_order(self, args):
+        if not args or args[0] not in ('shuffle', 'sequential'):
+            raise CommandError("order 需要 shuffle 或 sequential")
+        self.engine.set_shuffle(args[0] == 'shuffle')
+        return {'order': args[0], 'index': self.engine.progress()[0]}
+
+    def do_goto(self, args):
+        if not args or not args[0].isdigit():
+            raise CommandError("goto 需要题号")
+        return {'moved': self.engine.goto(int(args[0]) - 1), 'index': self.engine.progress()[0]}
+
+    def do_show(self, args):
+        question = self.engine.current()
+        if question is None:
+            return {'empty': True, 'hint': self.engine.empty_hint()}
+        return question_payload(self.engine, question)
+
+    def do_submit(self, args):
+        question = self.engine.current()
+        if question is None:
+            raise CommandError("当前没有题目")
+        answer = ''.join(sorted(set(''.join(args).upper())))
+        record = self.engine.submit(answer)
+        return {'id': question['id'], 'selected': record.selected,
+                'correct': record.is_correct, 'answer': question['answer']}
+
+    def do_explain(self, args):
+        question = self.engine.current()
+        if question is None:
+            raise CommandError("当前没有题目")
+        return {'id': question['id'], 'explanation': question.get('explanation', '暂无解析')}
+
+    def do_stats(self, args):
+        return self.engine.stats()
+
+    def do_breakdown(self, args):
+        breakdown = self.engine.breakdown()
+        result = {dim: [{'value': value, 'answered': answered, 'correct': correct, 'total': total}
+                        for value, answered, correct, total in rows]
+                  for dim, rows in breakdown.items() if dim != 'mode'}
+        result['mode'] = {mode: {'attempts': attempts, 'correct': correct}
+                          for mode, (attempts, correct) in breakdown['mode'].items()}
+        return result
+
+    def do_reset(self, args):
+        self.engine.reset()
+        return {'reset': True}
+
+    def do_flush(self, args):
+        self.engine.flush()
+        return {'flushed': True}
+
+
+def format_result(command, result):
+    """人类可读的输出"""
+    if command == 'show' and 'stem' in result:
+        lines = [f"第{result['index']}/{result['count']}题 (ID: {result['id']}) [{result['type']}]",
+                 result['stem']]
+        lines += [f"  {chr(65 + i)}. {option}" for i, option in enumerate(result['options'])]
+        return '\n'.join(lines)
+    if command == 'submit':
+        mark = "✅ 回答正确！" if result['correct'] else "❌ 回答错误！"
+        return f"{mark} 正确答案: {result['answer']}  您的答案: {result['selected']}"
+    if command == 'search':
+        lines = [f"共命中{result['total']}题"]
+        lines += [f"  [{hit['id']}] {hit['score']:.2f}  {hit['stem']}" for hit in result['hits']]
+        return '\n'.join(lines)
+    if command == 'stats':
+        recent = "  ".join(f"最近{size}题 {accuracy:.1f}%"
+                           for size, (count, accuracy) in result['recent'].items() if count)
+        return (f"总题数 {result['total']}  已答 {result['answered']}  "
+                f"正确率 {result['accuracy']:.1f}%  错题 {result['wrong']}  {recent}").rstrip()
+    if command == 'breakdown':
+        lines = []
+        for dim, rows in result.items():
+            if dim == 'mode':
+                lines += [f"  [模式] {mode}: {c['correct']}/{c['attempts']}" for mode, c in rows.items()]
+            else:
+                lines += [f"  [{dim}] {r['value']}: {r['correct']}/{r['answered']} (共{r['total']}题)"
+                          for r in rows if r['answered']]
+        return '\n'.join(lines) or "暂无答题记录"
+    return ' '.join(f"{key}={value}" for key, value in result.items())
+
+
+def run(lines, engine, as_json=False, out=sys.stdout):
+    """执行脚本，返回出错的命令数"""
+    session = Session(engine)
+    errors = 0
+    for lineno, raw in enumerate(lines, 1):
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        command = line.split()[0].lower()
+        try:
+            result = session.execute(line)
+        except (CommandError, ValueError) as e:
+            errors += 1
+            result = {'error': str(e), 'line': lineno}
+            if not as_json:
+                print(f"❌ 第{lineno}行: {e}", file=out)
+                continue
+        if as_json:
+            print(json.dumps({'command': command, **result}, ensure_ascii=False), file=out)
+        else:
+            print(format_result(command, result), file=out)
+    return errors
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="用脚本驱动刷题会话")
+    parser.add_argument('script', nargs='?', help="命令脚本（默认读标准输入）")
+    parser.add_argument('--bank', help="题库文件（.qbk 或 .json）")
+    parser.add_argument('--profile', help="保存/恢复进度的档案名")
+    parser.add_argument('--seed', type=int, help="随机选题的种子")
+    parser.add_argument('--json', action='store_true', help="每条命令输出一行 JSON")
+    args = parser.parse_args(argv)
+
+    engine = QuizEngine.load(args.bank, args.profile, args.seed)
+    try:
+        if args.script:
+            with open(args.script, encoding='utf-8') as f:
+                errors = run(f, engine, args.json)
+        else:
+            errors = run(sys.stdin, engine, args.json)
+    finally:
+        engine.close()
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,619 @@
+"""刷题引擎
+
+加载题库、筛选、导航、判分、统计和错题集维护都在 QuizEngine 里完成，
+不依赖 tkinter，图形界面（智能刷题系统.py）、命令行（quiz_cli.py）和
+服务器都只是它的外壳。本模块只导入标准库中的轻量模块，便于无界面的
+判分、分析进程快速启动。
+"""
+
+import os
+import random
+import sys
+import time
+
+from adaptive_sampler import AdaptiveSampler, ShuffleDeck, index_of
+from perf_monitor import traced
+from progress_journal import (FLAG_CORRECT, FLAG_WRONG, SYNC_DIR_NAME, ProgressJournal,
+                              default_profile_dir, pack_entry, unpack_entry)
+from question_bank_file import BANK_SUFFIX, BankFormatError, BinaryQuestionBank
+from question_index import ALL, QueryEngine, QuestionIndex, Selection, build_filter
+from question_store import (LOAD_CHUNK_ROWS, AnswerRecord, QuestionStore, canonical_answer_mask,
+                            load_store, mask_to_letters)
+from quiz_stats import StatsAggregator
+from review_scheduler import ReviewJournal, ReviewScheduler, SparseReviewScheduler
+from search_index import load_search_index
+
+MODE_NAMES = {"all": "全部题目", "wrong": "错题重练", "review": "到期复习"}
+TYPE_FILTER_NAMES = {
+    "all": "全部题型",
+    "single": "单选题",
+    "multiple": "多选题",
+    "judge": "判断题"
+}
+STATUS_CHOICES = {"未答": ('unanswered',), "已答": ('answered',)}
+
+# 到期复习模式一批最多取多少道到期题
+REVIEW_BATCH = 200
+
+# 示例题库（找不到题库时使用）
+SAMPLE_QUESTIONS = [
+    {
+        "id": 1,
+        "stem": "Python中哪个关键字用于定义函数？",
+        "type": "single",
+        "answer": "A",
+        "options": ["def", "function", "define", "func"],
+        "explanation": "在Python中，使用def关键字来定义函数。"
+    },
+    {
+        "id": 2,
+        "stem": "以下哪些是Python的基本数据类型？",
+        "type": "multiple",
+        "answer": "ABC",
+        "options": ["int", "str", "list", "class"],
+        "explanation": "int、str、list都是Python的基本数据类型，class是关键字。"
+    },
+    {
+        "id": 3,
+        "stem": "Python是一种编译型语言。",
+        "type": "judge",
+        "answer": "B",
+        "options": ["正确", "错误"],
+        "explanation": "Python是一种解释型语言，不是编译型语言。"
+    },
+    {
+        "id": 4,
+        "stem": "下列哪个不是Python的数据类型？",
+        "type": "single",
+        "answer": "D",
+        "options": ["list", "tuple", "dict", "array"],
+        "explanation": "array不是Python的基本数据类型，需要从array模块导入。"
+    },
+    {
+        "id": 5,
+        "stem": "Python支持多重继承。",
+        "type": "judge",
+        "answer": "A",
+        "options": ["正确", "错误"],
+        "explanation": "Python确实支持多重继承，一个类可以继承多个父类。"
+    }
+]
+
+
+@traced()
+def load_question_bank():
+    """加载题库数据：优先打开编译好的二进制题库，其次导入 Python 模块
+
+    返回列式存储的 QuestionStore。
+    """
+    store = None
+    for store, _, _ in load_question_bank_chunks():
+        pass
+    return store
+
+
+def load_question_bank_chunks(chunk_rows=LOAD_CHUNK_ROWS):
+    """分块加载题库（查找顺序同 load_question_bank），每读完一块 yield (题库, 已读题数, 总题数)
+
+    题库在原地逐块追加，后台加载线程据此汇报进度、提前显示第一题；
+    二进制题库读到一半出错时改用后备题库，之后 yield 的是新的题库对象。
+    """
+    desktop = os.path.join(os.path.expanduser("~"), "Desktop")
+    binary_path = os.path.join(desktop, "combined_question_bank" + BANK_SUFFIX)
+    if os.path.exists(binary_path):
+        try:
+            bank = BinaryQuestionBank(binary_path)
+            store = QuestionStore()
+            for loaded in store.load_binary(bank, chunk_rows):
+                yield store, loaded, len(bank)
+            print(f"✅ 成功打开二进制题库，共{len(store)}题")
+            return
+        except (OSError, BankFormatError) as e:
+            print(f"❌ 打开二进制题库失败: {e}")
+
+    try:
+        # 添加桌面路径到系统路径
+        if desktop not in sys.path:
+            sys.path.append(desktop)
+
+        # 直接导入合并后的题库
+        from combined_question_bank import question_bank
+        print(f"✅ 成功加载题库，共{len(question_bank)}题")
+
+    except ImportError as e:
+        print(f"❌ 导入题库失败: {e}")
+        print("⚠️ 使用示例题库")
+
+        # 使用示例题库
+        yield QuestionStore.from_questions(SAMPLE_QUESTIONS), len(SAMPLE_QUESTIONS), len(SAMPLE_QUESTIONS)
+        return
+
+    # 分块转为列式存储，之后释放模块里的题目字典
+    store = QuestionStore()
+    module = sys.modules.pop('combined_question_bank', None)
+    store.source = getattr(module, '__file__', None)
+    total = len(question_bank)
+    for start in range(0, total or 1, chunk_rows):
+        store.extend(question_bank[start:start + chunk_rows])
+        yield store, len(store), total
+    del question_bank
+
+    # 统计各题型数量
+    type_count = store.type_counts()
+    print(
+        f"📊 题型统计 - 单选: {type_count['single']}题, 多选: {type_count['multiple']}题, 判断: {type_count['judge']}题")
+
+
+class QuizEngine:
+    """刷题状态机：筛选、导航、提交、统计，与界面无关"""
+
+    def __init__(self, questions, seed=None, clock=time.time, index=None, cache=None,
+                 compact=False):
+        """index / cache 传入共用的静态索引和筛选结果缓存（服务器上多个会话共用一份
+        题库）；compact 为 True 时每个会话的状态只随答过的题增长：复习计划用稀疏
+        存储，随机选题不按错题历史加权（权重树与题库等长）"""
+        self.questions = questions
+
+        # 查询引擎：预建题型/章节/标签/难度索引，筛选结果带缓存
+        self.question_index = index if index is not None else QuestionIndex(questions)
+        self.query = QueryEngine(self.question_index, cache=cache)
+        self._selection = None
+
+        # 用户数据（以行号为键）
+        self.user_answers = {}
+        self.wrong_questions = set()
+        self.current_question_index = 0
+
+        # 增量统计：提交时 O(1) 更新，统计栏和统计详情直接读取
+        self.tally = StatsAggregator(questions, self.question_index)
+
+        # 筛选条件
+        self.mode = "all"
+        self.type_filter = "all"
+        self.extra_filters = ()
+        self.combine = "and"
+        self.search_text = ""
+        self.filter_expr = ALL
+
+        # 间隔重复复习计划；到期复习模式下的当前一批题和本批已复习的题
+        scheduler_class = SparseReviewScheduler if compact else ReviewScheduler
+        self.scheduler = scheduler_class(len(questions))
+        self._review_rows = None
+        self._reviewed = set()
+
+        # 随机选题按错题历史加权（首次随机选题时建立）；可选洗牌顺序
+        self.adaptive_random = not compact
+        self.sampler = None
+        self.shuffle = False
+        self._deck = None
+        self._deck_pos = 0
+        # 预先抽好的下一次随机选题：(筛选结果下标序列, 下标)，见 peek_random
+        self._random_ahead = None
+
+        self.search_index = None
+        self.journal = None
+        self.review_journal = None
+        self.sync_log = None
+        self.random = random.Random(seed)
+        self.clock = clock
+
+    @classmethod
+    def load(cls, path=None, profile=None, seed=None):
+        """加载题库（默认与图形界面相同的查找顺序），可选恢复某个档案的进度"""
+        store = load_store(path) if path else load_question_bank()
+        engine = cls(store, seed)
+        engine.enable_search()
+        if profile:
+            engine.open_journal(default_profile_dir(profile))
+        return engine
+
+    # ---- 进度持久化 ----
+
+    def open_journal(self, directory):
+        """打开答题日志并恢复答题记录和错题集"""
+        journal = ProgressJournal(directory)
+        review_journal = ReviewJournal(directory)
+        try:
+            state = journal.load()
+            review_state = review_journal.load()
+        except OSError as e:
+            print(f"❌ 读取答题进度失败: {e}")
+            return
+
+        self.journal = journal
+        for qid, value in state.items():
+            row = self.questions.row_of(qid)
+            if row is None:
+                continue
+            mask, flags = unpack_entry(value)
+            self.user_answers[row] = AnswerRecord(mask_to_letters(mask), bool(flags & FLAG_CORRECT))
+            self.query.set_answered(row)
+            if flags & FLAG_WRONG:
+                self.wrong_questions.add(row)
+                self.query.set_wrong(row, True)
+        if state:
+            self.tally.rebuild(self.user_answers)
+            print(f"📂 已恢复答题进度，共{len(self.user_answers)}题")
+
+        self.review_journal = review_journal
+        row_of = self.questions.row_of
+        self.scheduler.restore((row, value) for row, value in
+                               ((row_of(qid), value) for qid, value in review_state.items())
+                               if row is not None)
+
+        # 启用了多设备同步的档案：每次提交另记一条带时间和序号的同步记录
+        if os.path.isdir(os.path.join(directory, SYNC_DIR_NAME)):
+            from progress_sync import SyncError, open_sync_log
+            try:
+                self.sync_log = open_sync_log(directory)
+            except (OSError, SyncError) as e:
+                print(f"❌ 打开同步记录失败: {e}")
+
+    def flush(self):
+        """把缓冲的答题日志写盘"""
+        for journal in (self.journal, self.review_journal, self.sync_log):
+            if journal is not None:
+                try:
+                    journal.flush()
+                except OSError as e:
+                    print(f"❌ 保存答题进度失败: {e}")
+
+    def close_journal(self):
+        """写盘并关闭答题日志（不关闭检索索引，服务器上它由各会话共用）"""
+        for journal in (self.journal, self.review_journal, self.sync_log):
+            if journal is not None:
+                try:
+                    journal.close()
+                except OSError as e:
+                    print(f"❌ 保存答题进度失败: {e}")
+        self.journal = None
+        self.review_journal = None
+        self.sync_log = None
+
+    def close(self):
+        self.close_journal()
+        if self.search_index is not None:
+            self.search_index.close()
+            self.search_index = None
+
+    # ---- 全文检索 ----
+
+    def enable_search(self, bank_path=None):
+        """打开（必要时建立）题库旁边的检索索引"""
+        try:
+            index = load_search_index(self.questions, bank_path)
+        except (OSError, ValueError) as e:
+            print(f"❌ 建立检索索引失败: {e}")
+            return False
+        self.set_search_index(index)
+        return True
+
+    def set_search_index(self, index):
+        """挂上已经打开的检索索引（后台线程建好后交给界面线程）"""
+        self.search_index = index
+        self.query.set_search_index(index)
+
+    def search(self, text, limit=20):
+        """排序检索，返回 (命中总数, [(题目, 得分), ...])"""
+        if self.search_index is None:
+            raise ValueError("题库还没有建立检索索引")
+        result = self.search_index.search(text, limit)
+        return result.total, [(self.questions[row], score) for row, score in result.hits]
+
+    # ---- 筛选 ----
+
+    def extra_choices(self, dim):
+        """附加筛选某一维度的可选项：显示文字 -> 条件"""
+        if dim == "status":
+            return dict(STATUS_CHOICES)
+        return {str(v): (dim, v) for v in self.question_index.values(dim)}
+
+    def set_filter(self, type_value=None, mode=None, extra=None, combine=None, search=None):
+        """修改筛选条件（None 表示不变），并回到第一题"""
+        if search is not None:
+            search = search.strip()
+            if search and self.search_index is None:
+                raise ValueError("题库还没有建立检索索引")
+            self.search_text = search
+        if type_value is not None:
+            self.type_filter = type_value
+        if mode is not None:
+            self.mode = mode
+        if extra is not None:
+            self.extra_filters = tuple(extra)
+        if combine is not None:
+            self.combine = combine
+        self.filter_expr = build_filter(self.type_filter, self.mode, self.extra_filters,
+                                        self.combine, self.search_text)
+        self.current_question_index = 0
+        self._review_rows = None
+        self._deck = None
+        if self.shuffle:
+            self._sync_deck()
+
+    def set_shuffle(self, flag):
+        """打开/关闭洗牌顺序：打开后上一题/下一题按不重复的随机顺序遍历筛选结果"""
+        self.shuffle = bool(flag)
+        self._deck = None
+        if self.shuffle:
+            self._sync_deck()
+
+    def _sync_deck(self):
+        """筛选结果数量变化时重新洗牌，并停在新牌序的第一张"""
+        count = len(self.filtered())
+        if self._deck is None or self._deck.size != count:
+            self._deck = ShuffleDeck(count, self.random.getrandbits(64))
+            self._deck_pos = 0
+            if count:
+                self.current_question_index = self._deck[0]
+        return self._deck
+
+    @property
+    def uses_deck(self):
+        return self.shuffle and not self.is_review_mode
+
+    def filtered(self):
+        """筛选后的题目序列（由查询引擎缓存，条件和答题状态不变时不重新计算）
+
+        到期复习模式下是当前这一批到期题，按到期先后排列。
+        """
+        if self.is_review_mode:
+            if self._review_rows is None:
+                self._review_rows = self._due_batch()
+                self._reviewed = set()
+            positions = self._review_rows
+        else:
+            positions = self.query.select(self.filter_expr)
+        if self._selection is None or self._selection.positions is not positions:
+            self._selection = Selection(self.questions, positions)
+        return self._selection
+
+    @property
+    def is_wrong_mode(self):
+        return self.mode == "wrong"
+
+    @property
+    def is_review_mode(self):
+        return self.mode == "review"
+
+    def _due_batch(self):
+        """从到期队列取一批符合其余筛选条件的题"""
+        accept = None
+        if self.filter_expr != ALL:
+            data = self.query.evaluate(self.filter_expr).to_bytes((len(self.questions) + 7) >> 3, 'little')
+            accept = lambda row: data[row >> 3] >> (row & 7) & 1
+        return self.scheduler.due_rows(self.clock(), REVIEW_BATCH, accept)
+
+    def current(self):
+        """当前题目，筛选结果为空时返回 None"""
+        questions = self.filtered()
+        if not questions:
+            return None
+        if self.current_question_index >= len(questions):
+            self.current_question_index = len(questions) - 1
+        return questions[self.current_question_index]
+
+    def progress(self):
+        """(当前是第几题, 共几题)；洗牌顺序下按牌序计数（随机选题、跳转后除外）"""
+        count = len(self.filtered())
+        deck = self._deck
+        if (self.uses_deck and deck is not None and deck.size == count and count
+                and deck[self._deck_pos] == self.current_question_index):
+            return self._deck_pos + 1, count
+        return self.current_question_index + 1, count
+
+    def filter_description(self):
+        """(模式文字, 题型文字)"""
+        return MODE_NAMES.get(self.mode, self.mode), TYPE_FILTER_NAMES[self.type_filter]
+
+    def empty_hint(self):
+        """筛选结果为空时的提示"""
+        if self.is_wrong_mode and len(self.wrong_questions) == 0:
+            return "您还没有错题，继续努力！"
+        if self.search_text:
+            return f"没有找到包含“{self.search_text}”的题目"
+        if self.is_review_mode:
+            upcoming = self.scheduler.next_due()
+            if upcoming is None:
+                return "还没有复习计划，先在“全部题目”里答几道题吧"
+            when = time.strftime("%m-%d %H:%M", time.localtime(upcoming[0]))
+            return f"暂无到期的题目，下一题将于 {when} 到期"
+        if self.is_wrong_mode and self.type_filter != "all":
+            return "该题型下暂无错题，试试其他题型或全部题型"
+        if self.type_filter != "all":
+            return "该题型下暂无题目，请检查题库"
+        return ""
+
+    # ---- 导航 ----
+
+    def next(self):
+        """下一题，已是最后一题时返回 False
+
+        到期复习模式下这一批做完后取下一批到期题。
+        """
+        if self.uses_deck:
+            deck = self._sync_deck()
+            if self._deck_pos < len(deck) - 1:
+                self._deck_pos += 1
+                self.current_question_index = deck[self._deck_pos]
+                return True
+            return False
+        if self.current_question_index < len(self.filtered()) - 1:
+            self.current_question_index += 1
+            return True
+        if self.is_review_mode:
+            self._review_rows = None
+            self.current_question_index = 0
+            return bool(self.filtered())
+        return False
+
+    def previous(self):
+        """上一题，已是第一题时返回 False"""
+        if self.uses_deck:
+            deck = self._sync_deck()
+            if self._deck_pos > 0:
+                self._deck_pos -= 1
+                self.current_question_index = deck[self._deck_pos]
+                return True
+            return False
+        if self.current_question_index > 0:
+            self.current_question_index -= 1
+            return True
+        return False
+
+    def random_pick(self):
+        """随机选题：默认按错题历史加权（O(log n)），到期复习模式下等概率"""
+        questions = self.filtered()
+        if not questions:
+            return False
+        ahead, self._random_ahead = self._random_ahead, None
+        if ahead is not None and ahead[0] is questions.positions:
+            self.current_question_index = ahead[1]
+        else:
+            self.current_question_index = self._draw_random(questions)
+        return True
+
+    def peek_random(self):
+        """预先抽出下一次随机选题的下标（界面据此在空闲时预取），random_pick 会用掉它；
+        筛选结果变化或提交答案后作废重抽"""
+        questions = self.filtered()
+        if not questions:
+            return None
+        ahead = self._random_ahead
+        if ahead is None or ahead[0] is not questions.positions:
+            ahead = self._random_ahead = (questions.positions, self._draw_random(questions))
+        return ahead[1]
+
+    def _draw_random(self, questions):
+        if not self.adaptive_random or self.is_review_mode:
+            return self.random.randint(0, len(questions) - 1)
+        if self.sampler is None:
+            self.sampler = AdaptiveSampler(self.scheduler, self.clock)
+        row = self.sampler.sample(self.random, questions.positions)
+        return index_of(questions.positions, row)
+
+    def upcoming(self, count):
+        """下一题、上一题方向各 count 道题在筛选结果中的下标，近的在前（供预取）"""
+        size = len(self.filtered())
+        deck = self._deck
+        if self.uses_deck and deck is not None and deck.size == size:
+            return [deck[p] for k in range(1, count + 1)
+                    for p in (self._deck_pos + k, self._deck_pos - k) if 0 <= p < size]
+        index = self.current_question_index
+        return [i for k in range(1, count + 1) for i in (index + k, index - k) if 0 <= i < size]
+
+    def goto(self, index):
+        """跳到筛选结果中的第 index 题（从 0 开始）"""
+        if 0 <= index < len(self.filtered()):
+            self.current_question_index = index
+            return True
+        return False
+
+    # ---- 作答 ----
+
+    def answer_for(self, row):
+        """某行的答题记录"""
+        return self.user_answers.get(row)
+
+    def row_status(self, row):
+        """某行的答题状态：'unanswered'、'correct' 或 'wrong'（在错题集中）"""
+        if row in self.wrong_questions:
+            return 'wrong'
+        return 'correct' if row in self.user_answers else 'unanswered'
+
+    def has_result(self, row):
+        """普通模式下已答过的题显示结果；错题重练模式下题目总是可以重新作答，
+        到期复习模式下只显示本批刚复习过的结果"""
+        if self.is_review_mode:
+            return row in self._reviewed
+        return row in self.user_answers and not self.is_wrong_mode
+
+    def submit(self, user_answer):
+        """提交当前题的答案（规范字母串），返回答题记录"""
+        questions = self.filtered()
+        if not questions:
+            return None
+        if not user_answer:
+            raise ValueError("请选择答案！")
+
+        row = questions.position(self.current_question_index)
+        # 只接受本题选项范围内的规范写法，不合法的答案不记录、不写日志
+        mask = canonical_answer_mask(user_answer)
+        option_count = self.questions.option_counts[row]
+        if not mask or mask >> option_count:
+            raise ValueError(f"答案不合法: {user_answer!r}（本题共{option_count}个选项，"
+                             f"应为 {mask_to_letters((1 << option_count) - 1)} 中的字母）")
+        is_correct = self.questions.is_correct(row, mask)
+
+        if self.is_wrong_mode:
+            # 错题重练模式下，更新答题记录但不影响错题集合
+            # 只有当用户答对时，才从错题集中移除
+            if is_correct:
+                self.wrong_questions.discard(row)
+        else:
+            # 普通模式下正常记录
+            if not is_correct:
+                self.wrong_questions.add(row)
+            else:
+                self.wrong_questions.discard(row)
+
+        # 增量更新查询引擎中的错题/已答位图
+        self.query.set_wrong(row, row in self.wrong_questions)
+        self.query.set_answered(row)
+
+        record = AnswerRecord(user_answer, is_correct)
+        self.tally.record(row, self.user_answers.get(row), record, self.mode)
+        self.user_answers[row] = record
+        if self.journal is not None:
+            self.journal.record_answer(self.questions.ids[row], mask,
+                                       is_correct, row in self.wrong_questions)
+
+        # 每次提交都更新这道题的复习计划和随机选题权重（预先抽好的随机题随之作废）
+        now = self.clock()
+        self.scheduler.record_result(row, is_correct, now)
+        self._random_ahead = None
+        if self.sampler is not None:
+            self.sampler.update(row)
+        if self.is_review_mode:
+            self._reviewed.add(row)
+        if self.review_journal is not None:
+            self.review_journal.record(self.questions.ids[row], self.scheduler.packed(row))
+        if self.sync_log is not None:
+            self.sync_log.record_answer(self.questions.ids[row],
+                                        pack_entry(mask, is_correct, row in self.wrong_questions), now)
+        return record
+
+    def reset(self):
+        """重置学习进度"""
+        self.user_answers.clear()
+        self.wrong_questions.clear()
+        self.tally.reset()
+        self.query.clear()
+        self.scheduler.reset()
+        self.sampler = None
+        self._random_ahead = None
+        self._review_rows = None
+        self._reviewed = set()
+        if self.journal is not None:
+            self.journal.record_reset()
+        if self.review_journal is not None:
+            self.review_journal.record_reset()
+        if self.sync_log is not None:
+            self.sync_log.record_reset(self.clock())
+        self.current_question_index = 0
+        self._deck = None
+        if self.shuffle:
+            self._sync_deck()
+
+    def stats(self):
+        """统计信息（读取增量计数器，不遍历答题记录）"""
+        tally = self.tally
+        return {'total': len(self.questions), 'answered': tally.answered,
+                'correct': tally.correct, 'wrong': len(self.wrong_questions),
+                'accuracy': tally.accuracy(), 'recent': tally.recent()}
+
+    def breakdown(self):
+        """分维度、分模式的统计：{'type': [(取值, 已答, 答对, 总数), ...], ..., 'mode': {...}}"""
+        result = {dim: self.tally.breakdown(dim) for dim in self.tally.by_dim}
+        result['mode'] = {mode: tuple(counts) for mode, counts in self.tally.by_mode.items()}
+        return result
@@ -0,0 +1,406 @@
+"""多用户刷题服务器
+
+机房共用一台服务器时，每个学生各开一个图形界面进程就要各自加载一份
+完整题库。服务器模式只加载一次题库，静态索引、检索索引和与答题状态无关
+的筛选结果由全部会话共用；每个会话只保存自己的答题记录、错题集、当前
+位置和筛选条件（QuizEngine 的 compact 模式：稀疏复习计划、错题/已答分块位图、
+4 字节一项的筛选结果），内存随答过的题数增长，而不是随题库大小。
+
+基于 asyncio 的单线程 HTTP/1.1 + JSON 接口，支持 keep-alive。所有操作都在
+事件循环里同步完成，同一会话的请求天然串行，不需要加锁::
+
+    POST   /api/session       {"user": "alice"}     创建会话（user 可省略）
+    DELETE /api/session                             结束会话
+    GET    /api/status                              服务器状态
+    POST   /api/<命令>         {...}                 执行命令
+
+会话号放在 X-Session 请求头或 session Cookie 里。命令与 quiz_cli 相同：
+filter next prev random goto order show submit explain search stats
+breakdown reset flush，请求体（JSON 对象，可省略）::
+
+    filter  {"type": "single", "mode": "wrong", "chapter": "第一章", "status": "未答"}
+    goto    {"index": 12}
+    submit  {"answer": "AB"}
+    order   {"order": "shuffle"}
+    search  {"text": "多重继承 python"}
+
+给了 --profiles 时，带 user 的会话在 <目录>/<user>/ 下保存和恢复进度，
+同一用户重复登录拿到的是同一个会话。空闲超过 --idle-timeout 秒的会话
+写盘后关闭；会话数达到 --max-sessions 时拒绝新会话。
+
+用法::
+
+    python quiz_server.py --bank combined_question_bank.qbk --port 8765 --profiles ./profiles
+    python benchmarks/load_test.py --url http://127.0.0.1:8765 --sessions 2000
+"""
+
+import asyncio
+import json
+import os
+import re
+import secrets
+import sys
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+
+from question_index import QuestionIndex, SelectionCache
+from quiz_cli import CommandError, Session
+from quiz_engine import QuizEngine, load_question_bank
+from question_store import load_store
+from search_index import load_search_index
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_SESSIONS = 5000
+IDLE_TIMEOUT = 1800             # 秒
+MAINTENANCE_INTERVAL = 5        # 每隔几秒写盘、清理空闲会话
+
+MAX_BODY = 64 * 1024
+MAX_HEADERS = 64
+
+COMMANDS = frozenset(('filter', 'next', 'prev', 'random', 'goto', 'order', 'show', 'submit',
+                      'explain', 'search', 'stats', 'breakdown', 'reset', 'flush'))
+_USER_RE = re.compile(r'^[\w.-]{1,64}$')
+
+
+class HttpError(Exception):
+    """以 HTTP 错误状态返回给客户端"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SharedBank:
+    """全部会话共用的只读部分：题库、静态索引、检索索引、静态筛选结果缓存"""
+
+    def __init__(self, store, search_index=None):
+        self.store = store
+        self.index = QuestionIndex(store)
+        self.cache = SelectionCache()
+        self.search_index = search_index
+
+    def new_engine(self, seed=None):
+        engine = QuizEngine(self.store, seed, index=self.index, cache=self.cache, compact=True)
+        if self.search_index is not None:
+            engine.set_search_index(self.search_index)
+        return engine
+
+
+class UserSession:
+    """一个会话：刷题引擎 + quiz_cli 的命令分派"""
+
+    __slots__ = ('sid', 'user', 'commands', 'last_seen')
+
+    def __init__(self, sid, user, engine, now):
+        self.sid = sid
+        self.user = user
+        self.commands = Session(engine)
+        self.last_seen = now
+
+    @property
+    def engine(self):
+        return self.commands.engine
+
+
+class SessionManager:
+    """会话表：按最近使用排序，空闲会话写盘后关闭"""
+
+    def __init__(self, bank, profiles_dir=None, max_sessions=DEFAULT_MAX_SESSIONS,
+                 idle_timeout=IDLE_TIMEOUT, clock=time.monotonic):
+        self.bank = bank
+        self.profiles_dir = profiles_dir
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.sessions = OrderedDict()
+        self.by_user = {}
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def open(self, user=None):
+        """创建会话；同一用户已有会话时直接返回它"""
+        if user is not None:
+            # 用户名同时是档案目录名：只收字符串，且不能是 . 或 ..
+            if not isinstance(user, str) or not _USER_RE.fullmatch(user) or not user.strip('.'):
+                raise HttpError(HTTPStatus.BAD_REQUEST, f"用户名不合法: {user!r}")
+            sid = self.by_user.get(user)
+            if sid is not None:
+                return self.get(sid)
+        if len(self.sessions) >= self.max_sessions:
+            self.expire()
+            if len(self.sessions) >= self.max_sessions:
+                raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "会话数已达上限，请稍后再试")
+
+        engine = self.bank.new_engine()
+        if user is not None and self.profiles_dir:
+            engine.open_journal(os.path.join(self.profiles_dir, user))
+        sid = secrets.token_urlsafe(16)
+        session = UserSession(sid, user, engine, self.clock())
+        self.sessions[sid] = session
+        if user is not None:
+            self.by_user[user] = sid
+        return session
+
+    def get(self, sid):
+        """取出会话并记为最近使用，不存在时为 None"""
+        session = self.sessions.get(sid)
+        if session is not None:
+            session.last_seen = self.clock()
+            self.sessions.move_to_end(sid)
+        return session
+
+    def close(self, sid):
+        session = self.sessions.pop(sid, None)
+        if session is None:
+            return False
+        if session.user is not None:
+            self.by_user.pop(session.user, None)
+        session.engine.close_journal()
+        return True
+
+    def expire(self):
+        """关闭空闲超时的会话（会话表按最近使用排序，只需看表头），返回关闭的个数"""
+        deadline = self.clock() - self.idle_timeout
+        expired = 0
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if session.last_seen > deadline:
+                break
+            self.close(session.sid)
+            expired += 1
+        return expired
+
+    def flush(self):
+        for session in self.sessions.values():
+            session.engine.flush()
+
+    def close_all(self):
+        for sid in list(self.sessions):
+            self.close(sid)
+
+
+def command_args(command, params):
+    """JSON 请求体 -> quiz_cli 命令参数"""
+    if command == 'filter':
+        return [f"{key}={value}" for key, value in params.items()]
+    if command == 'goto':
+        return [str(params.get('index', ''))]
+    if command == 'submit':
+        return [str(params.get('answer', ''))]
+    if command == 'order':
+        return [str(params.get('order', ''))]
+    if command == 'search':
+        return str(params.get('text', '')).split()
+    return []
+
+
+def current_rss_mb():
+    """当前常驻内存（MB），读不到 /proc 时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class QuizServer:
+    """HTTP/1.1 + JSON 外壳，把请求转给会话表和各会话的命令分派"""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.started = time.time()
+        self.requests = 0
+
+    async def handle(self, reader, writer):
+        """一个连接：循环读取请求并应答，直到对方关闭或要求 Connection: close"""
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    writer.write(encode_response(e.status, {'error': str(e)}, False))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload, cookie = self.dispatch(method, path, headers, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(encode_response(status, payload, keep_alive, cookie))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def dispatch(self, method, path, headers, body):
+        """-> (状态码, JSON 对象, 要设置的会话号或 None)"""
+        self.requests += 1
+        try:
+            params = json.loads(body) if body else {}
+            if not isinstance(params, dict):
+                raise HttpError(HTTPStatus.BAD_REQUEST, "请求体应为 JSON 对象")
+            return self._route(method, path, headers, params)
+        except HttpError as e:
+            return e.status, {'error': str(e)}, None
+        except (CommandError, ValueError) as e:
+            # json.JSONDecodeError 也是 ValueError
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}, None
+        except Exception as e:
+            print(f"❌ 处理请求 {method} {path} 出错: {e!r}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "服务器内部错误"}, None
+
+    def _route(self, method, path, headers, params):
+        if not path.startswith('/api/'):
+            raise HttpError(HTTPStatus.NOT_FOUND, f"没有这个接口: {path}")
+        name = path[len('/api/'):]
+        if name == 'status':
+            return HTTPStatus.OK, self.status(), None
+        if name == 'session':
+            if method == 'POST':
+                session = self.manager.open(params.get('user'))
+                return HTTPStatus.OK, {'session': session.sid, 'user': session.user}, session.sid
+            if method == 'DELETE':
+                return HTTPStatus.OK, {'closed': self.manager.close(session_id(headers))}, None
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "会话接口只支持 POST / DELETE")
+        if name not in COMMANDS:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"未知命令: {name}")
+        if method not in ('GET', 'POST'):
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "命令只支持 GET / POST")
+
+        session = self.manager.get(session_id(headers))
+        if session is None:
+            raise HttpError(HTTPStatus.UNAUTHORIZED, "会话不存在或已过期，请重新创建")
+        handler = getattr(session.commands, 'do_' + name)
+        return HTTPStatus.OK, handler(command_args(name, params)), None
+
+    def status(self):
+        bank = self.manager.bank
+        return {'questions': len(bank.store),
+                'sessions': len(self.manager),
+                'shared_selections': len(bank.cache),
+                'search': bank.search_index is not None,
+                'requests': self.requests,
+                'uptime': round(time.time() - self.started, 1),
+                'rss_mb': current_rss_mb()}
+
+    async def maintain(self, interval=MAINTENANCE_INTERVAL):
+        """定时把答题日志写盘、关闭空闲会话"""
+        while True:
+            await asyncio.sleep(interval)
+            self.manager.flush()
+            expired = self.manager.expire()
+            if expired:
+                print(f"⏳ 关闭空闲会话 {expired} 个，当前 {len(self.manager)} 个")
+
+
+def session_id(headers):
+    """从 X-Session 请求头或 session Cookie 取会话号"""
+    sid = headers.get('x-session')
+    if sid:
+        return sid
+    for part in headers.get('cookie', '').split(';'):
+        key, _, value = part.strip().partition('=')
+        if key == 'session':
+            return value
+    return None
+
+
+async def read_request(reader):
+    """读一个请求 -> (方法, 路径, 小写请求头, 请求体)；连接已关闭时为 None"""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "请求行格式错误")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "请求头过多")
+        key, _, value = line.decode('latin-1').partition(':')
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length', 0))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Content-Length 格式错误")
+    if length > MAX_BODY:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "请求体过大")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target.split('?', 1)[0], headers, body
+
+
+def encode_response(status, payload, keep_alive=True, cookie=None):
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    status = HTTPStatus(status)
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+             "Content-Type: application/json; charset=utf-8",
+             f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if cookie is not None:
+        lines.append(f"Set-Cookie: session={cookie}; Path=/; HttpOnly")
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def serve(manager, host=DEFAULT_HOST, port=DEFAULT_PORT, ready=None):
+    """运行服务器直到被取消；ready 为回调，监听开始后以实际端口调用"""
+    server = QuizServer(manager)
+    listener = await asyncio.start_server(server.handle, host, port)
+    port = listener.sockets[0].getsockname()[1]
+    print(f"✅ 刷题服务器已启动: http://{host}:{port}/api/  题库共{len(manager.bank.store)}题")
+    if ready is not None:
+        ready(port)
+    maintenance = asyncio.create_task(server.maintain())
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        maintenance.cancel()
+        manager.close_all()
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="多用户刷题服务器（HTTP/JSON）")
+    parser.add_argument('--bank', help="题库文件（.qbk 或 .json），默认与图形界面相同的查找顺序")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--profiles', help="保存各用户进度的目录（不给时不保存）")
+    parser.add_argument('--max-sessions', type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT, help="空闲多少秒后关闭会话")
+    parser.add_argument('--no-search', action='store_true', help="不打开检索索引")
+    args = parser.parse_args(argv)
+
+    try:
+        store = load_store(args.bank) if args.bank else load_question_bank()
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"❌ 读取题库失败: {e}")
+    search_index = None
+    if not args.no_search:
+        try:
+            search_index = load_search_index(store, args.bank)
+        except (OSError, ValueError) as e:
+            print(f"❌ 建立检索索引失败: {e}")
+
+    manager = SessionManager(SharedBank(store, search_index), args.profiles,
+                             args.max_sessions, args.idle_timeout)
+    try:
+        asyncio.run(serve(manager, args.host, args.port))
+    except KeyboardInterrupt:
+        print("✅ 服务器已停止，进度已保存")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""增量统计
+
+StatsAggregator 随每次提交、改答和重置在 O(1) 内更新计数器，统计栏和
+统计详情面板直接读取，不再每次遍历全部答题记录：
+
+    总体        已答题数、当前答对的题数
+    分维度      题型、章节、标签、难度下各自的已答 / 答对 / 题目总数
+    分模式      本次运行中各练习模式下的提交次数和答对次数
+    最近窗口    最近 20 / 100 次提交的正确率（环形队列 + 滑动和）
+
+“已答 / 答对”以每道题最近一次作答为准，与原来遍历 user_answers 的
+结果一致；分模式和最近窗口按提交次数计，只统计本次运行。
+"""
+
+from collections import deque
+
+from question_index import question_tags
+
+DEFAULT_WINDOWS = (20, 100)
+BREAKDOWN_DIMENSIONS = ('type', 'chapter', 'tag', 'difficulty')
+
+
+class RollingWindow:
+    """最近 size 次提交的答对次数"""
+
+    def __init__(self, size):
+        self.size = size
+        self.results = deque(maxlen=size)
+        self.correct = 0
+
+    def push(self, is_correct):
+        if len(self.results) == self.size:
+            self.correct -= self.results[0]
+        self.results.append(int(is_correct))
+        self.correct += int(is_correct)
+
+    def clear(self):
+        self.results.clear()
+        self.correct = 0
+
+    def __len__(self):
+        return len(self.results)
+
+    def accuracy(self):
+        return self.correct / len(self.results) * 100 if self.results else 0
+
+
+class StatsAggregator:
+    """按题目维度和练习模式增量累计答题情况"""
+
+    def __init__(self, store, index, windows=DEFAULT_WINDOWS):
+        self.store = store
+        self.index = index
+        self.windows = {size: RollingWindow(size) for size in windows}
+        self._totals = {}
+        self.reset()
+
+    def reset(self):
+        """清空全部计数（重置进度）"""
+        self.answered = 0
+        self.correct = 0
+        self.by_dim = {dim: {} for dim in BREAKDOWN_DIMENSIONS}
+        self.by_mode = {}
+        for window in self.windows.values():
+            window.clear()
+
+    def rebuild(self, answers):
+        """从已有的答题记录（行号 -> AnswerRecord）重新累计，用于恢复进度后"""
+        self.reset()
+        for row, record in answers.items():
+            self._add(row, 1, int(record.is_correct))
+
+    def _keys(self, row):
+        """某题所属的各维度取值"""
+        yield 'type', self.store.type_name(row)
+        meta = self.store.meta(row)
+        if meta:
+            chapter = meta.get('chapter')
+            if chapter is not None:
+                yield 'chapter', chapter
+            difficulty = meta.get('difficulty')
+            if difficulty is not None:
+                yield 'difficulty', difficulty
+            for tag in question_tags(meta):
+                yield 'tag', tag
+
+    def _add(self, row, answered, correct):
+        self.answered += answered
+        self.correct += correct
+        by_dim = self.by_dim
+        for dim, value in self._keys(row):
+            counts = by_dim[dim].get(value)
+            if counts is None:
+                counts = by_dim[dim][value] = [0, 0]
+            counts[0] += answered
+            counts[1] += correct
+
+    def record(self, row, old, new, mode):
+        """记录一次提交：old 为此前的答题记录（没有时为 None），new 为本次"""
+        if old is None:
+            self._add(row, 1, int(new.is_correct))
+        else:
+            delta = int(new.is_correct) - int(old.is_correct)
+            if delta:
+                self._add(row, 0, delta)
+
+        counts = self.by_mode.get(mode)
+        if counts is None:
+            counts = self.by_mode[mode] = [0, 0]
+        counts[0] += 1
+        counts[1] += int(new.is_correct)
+        for window in self.windows.values():
+            window.push(new.is_correct)
+
+    # ---- 读取 ----
+
+    def accuracy(self):
+        return self.correct / self.answered * 100 if self.answered else 0
+
+    def recent(self):
+        """{窗口大小: (已统计次数, 正确率)}"""
+        return {size: (len(window), window.accuracy()) for size, window in self.windows.items()}
+
+    def total(self, dim, value):
+        """某维度取值下的题目总数（来自位图索引，首次读取时计算）"""
+        key = (dim, value)
+        count = self._totals.get(key)
+        if count is None:
+            count = self._totals[key] = self.index.count(dim, value)
+        return count
+
+    def breakdown(self, dim):
+        """某维度各取值的 (取值, 已答, 答对, 题目总数)，按题库中的取值顺序"""
+        counts = self.by_dim[dim]
+        rows = []
+        for value in self.index.values(dim):
+            answered, correct = counts.get(value, (0, 0))
+            rows.append((value, answered, correct, self.total(dim, value)))
+        return rows
@@ -0,0 +1,231 @@
+"""间隔重复复习计划（SM-2）
+
+每道答过的题都有复习间隔、难度系数（ease）、连续答对次数和到期时间，
+每次提交后按 SM-2 更新：答对时间隔依次为 1 天、6 天、上次间隔 x ease，
+答错时清零重学，10 分钟后再次到期。
+
+状态按题库行号存放在定长 array 列里，到期队列是一个堆，堆元素把到期
+时间和行号打包成一个整数（due << 32 | row），取“下一道到期题”只需
+O(log n)。题目重新排期时不从堆中删除旧元素，弹出时与 due 列比对即可
+识别过期元素（惰性删除），过期元素太多时整体重建。
+
+服务器上的会话改用 SparseReviewScheduler：只为答过的题保存打包后的
+状态，接口相同。
+
+复习计划与答题进度放在同一个档案目录里，同样用追加日志 + 快照保存，
+每题的状态打包成一个 uint64（见 pack_state）。
+"""
+
+import heapq
+from array import array
+
+from progress_journal import ProgressJournal
+
+DAY = 86400
+RELEARN_SECONDS = 600           # 答错后多久再次到期
+
+DEFAULT_EASE = 250              # 难度系数，以 1/100 为单位
+MIN_EASE = 130
+
+# 提交结果对应的 SM-2 评分（0–5）
+GRADE_CORRECT = 4
+GRADE_WRONG = 1
+
+_ROW_BITS = 32
+_ROW_MASK = (1 << _ROW_BITS) - 1
+
+# pack_state 各字段的位宽：到期时间 32、间隔天数 14、ease-130 9、连对次数 5、遗忘次数 4
+_INTERVAL_MAX = (1 << 14) - 1
+_EASE_MAX = MIN_EASE + (1 << 9) - 1
+_REPS_MAX = (1 << 5) - 1
+_LAPSES_MAX = (1 << 4) - 1
+
+
+def pack_state(due, interval, ease, reps, lapses):
+    """复习状态 -> uint64"""
+    return (due
+            | min(interval, _INTERVAL_MAX) << 32
+            | (min(ease, _EASE_MAX) - MIN_EASE) << 46
+            | min(reps, _REPS_MAX) << 55
+            | min(lapses, _LAPSES_MAX) << 60)
+
+
+def unpack_state(value):
+    """uint64 -> (到期时间, 间隔天数, ease, 连对次数, 遗忘次数)"""
+    return (value & 0xFFFFFFFF, value >> 32 & _INTERVAL_MAX,
+            (value >> 46 & 0x1FF) + MIN_EASE, value >> 55 & _REPS_MAX, value >> 60)
+
+
+class ReviewJournal(ProgressJournal):
+    """复习计划的追加日志：qid -> pack_state() 的 uint64"""
+
+    journal_name = 'review_journal.bin'
+    snapshot_name = 'review_snapshot.bin'
+    value_code = 'Q'
+
+
+class ReviewScheduler:
+    """按行号保存复习状态，到期队列为惰性删除的最小堆"""
+
+    def __init__(self, size):
+        self.size = size
+        self.due = array('q', bytes(8 * size))          # 0 表示从未排期
+        self.interval = array('H', bytes(2 * size))
+        self.ease = array('H', [DEFAULT_EASE]) * size
+        self.reps = array('B', bytes(size))
+        self.lapses = array('B', bytes(size))
+        self.scheduled = 0
+        self.version = 0
+        self._heap = []
+
+    # ---- 状态 ----
+
+    def state(self, row):
+        """(到期时间, 间隔天数, ease, 连对次数, 遗忘次数)；未排期时为 None"""
+        if not self.due[row]:
+            return None
+        return (self.due[row], self.interval[row], self.ease[row],
+                self.reps[row], self.lapses[row])
+
+    def packed(self, row):
+        return pack_state(*self.state(row))
+
+    def _due(self, row):
+        """某行的到期时间，未排期时为 0"""
+        return self.due[row]
+
+    def _store(self, row, due, interval, ease, reps, lapses):
+        self.due[row] = due
+        self.interval[row] = interval
+        self.ease[row] = ease
+        self.reps[row] = reps
+        self.lapses[row] = lapses
+
+    def scheduled_items(self):
+        """已排期的 (行号, 到期时间)，按行号递增"""
+        return ((row, due) for row, due in enumerate(self.due) if due)
+
+    def restore(self, items):
+        """批量恢复 (行号, pack_state 值)，最后一次性建堆"""
+        for row, value in items:
+            if not self._due(row):
+                self.scheduled += 1
+            self._store(row, *unpack_state(value))
+        self._rebuild_heap()
+        self.version += 1
+
+    def reset(self):
+        """清空全部复习计划"""
+        self.__init__(self.size)
+
+    # ---- 排期 ----
+
+    def review(self, row, grade, now):
+        """按 SM-2 记录一次复习（grade 为 0–5），返回新的到期时间"""
+        now = int(now)
+        state = self.state(row)
+        if state is None:
+            self.scheduled += 1
+            interval, ease, reps, lapses = 0, DEFAULT_EASE, 0, 0
+        else:
+            _, interval, ease, reps, lapses = state
+        penalty = 5 - grade
+        ease = max(MIN_EASE, ease + 10 - penalty * (8 + penalty * 2))
+        if grade >= 3:
+            if reps == 0:
+                interval = 1
+            elif reps == 1:
+                interval = 6
+            else:
+                interval = max(interval + 1, round(interval * ease / 100))
+            interval = min(interval, _INTERVAL_MAX)
+            reps = min(reps + 1, _REPS_MAX)
+            due = now + interval * DAY
+        else:
+            interval = 0
+            reps = 0
+            lapses = min(lapses + 1, _LAPSES_MAX)
+            due = now + RELEARN_SECONDS
+
+        self._store(row, due, interval, min(ease, _EASE_MAX), reps, lapses)
+        heapq.heappush(self._heap, due << _ROW_BITS | row)
+        if len(self._heap) > 2 * self.scheduled + 1024:
+            self._rebuild_heap()
+        self.version += 1
+        return due
+
+    def record_result(self, row, is_correct, now):
+        """把一次提交的对错换算成评分后排期"""
+        return self.review(row, GRADE_CORRECT if is_correct else GRADE_WRONG, now)
+
+    def _rebuild_heap(self):
+        self._heap = [due << _ROW_BITS | row for row, due in self.scheduled_items()]
+        heapq.heapify(self._heap)
+
+    def _valid(self, key):
+        return self._due(key & _ROW_MASK) == key >> _ROW_BITS
+
+    # ---- 到期查询 ----
+
+    def next_due(self):
+        """最早到期的 (到期时间, 行号)，没有排期时为 None；顺带丢弃堆顶的过期元素"""
+        heap = self._heap
+        while heap and not self._valid(heap[0]):
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        return heap[0] >> _ROW_BITS, heap[0] & _ROW_MASK
+
+    def due_rows(self, now, limit=None, accept=None):
+        """到期的行号，按到期时间先后；accept 为行号过滤函数
+
+        只弹出到期部分的堆元素，检查完再放回去，代价与扫描到的元素数成正比。
+        """
+        heap = self._heap
+        bound = (int(now) + 1) << _ROW_BITS
+        rows = []
+        kept = []
+        seen = set()
+        while heap and heap[0] < bound and (limit is None or len(rows) < limit):
+            key = heapq.heappop(heap)
+            row = key & _ROW_MASK
+            if not self._valid(key) or row in seen:
+                continue
+            seen.add(row)
+            kept.append(key)
+            if accept is None or accept(row):
+                rows.append(row)
+        for key in kept:
+            heapq.heappush(heap, key)
+        return rows
+
+
+class SparseReviewScheduler(ReviewScheduler):
+    """只为排过期的题保存状态（行号 -> pack_state 值），内存与答过的题数成正比
+
+    服务器上每个会话一份复习计划，定长列会让每个用户都占用与题库等长的
+    内存；接口与 ReviewScheduler 相同。
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._states = {}
+        self.scheduled = 0
+        self.version = 0
+        self._heap = []
+
+    def state(self, row):
+        value = self._states.get(row)
+        return None if value is None else unpack_state(value)
+
+    def packed(self, row):
+        return self._states[row]
+
+    def _due(self, row):
+        return self._states.get(row, 0) & 0xFFFFFFFF
+
+    def _store(self, row, due, interval, ease, reps, lapses):
+        self._states[row] = pack_state(due, interval, ease, reps, lapses)
+
+    def scheduled_items(self):
+        return ((row, self._states[row] & 0xFFFFFFFF) for row in sorted(self._states))
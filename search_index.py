@@ -0,0 +1,504 @@
+"""全文检索索引
+
+对题干、选项、解析建立倒排索引。中文不做分词，连续的汉字按字二元组
+（bigram）切分，每个单字另记一项，因此任意一个汉字、任意长度的词都能
+检索；英文和数字按整词索引，最后一个词支持前缀匹配（边输入边搜）。
+
+每个词项保存两份倒排表：出现在任一字段中的行，以及出现在题干中的行
+（用于排序时给题干命中加权）。倒排表较稀疏时存为 uint32 行号数组，较
+稠密时直接存为位图，查询时都转成 Python 整数位图与 question_index 的
+筛选条件组合。
+
+索引保存在题库旁边（同名 .qsx 文件），记录题库文件的大小和修改时间，
+题库变化后自动重建。打开索引只 mmap 文件并读入词表，倒排表在查询时
+按需读取，最近用过的词项位图放在一个小的 LRU 缓存里。
+
+文件布局（小端序）::
+
+    文件头      72 字节，见 HEADER
+    题干长度    每题一个 uint16，用于长度归一化
+    倒排表      各词项的“全部字段”和“题干”倒排表
+    词表        按码点排序、以换行分隔的 UTF-8 词项
+    词项目录    每个词项 24 字节：(全部字段偏移, 文档数, 题干偏移, 文档数)
+
+用法::
+
+    python search_index.py combined_question_bank.qbk            # 预先建立索引
+    python search_index.py combined_question_bank.qbk -q 多重继承
+"""
+
+import heapq
+import io
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict, namedtuple
+
+from question_index import bits_to_positions, popcount, positions_to_bits
+
+MAGIC = b'QSEARCH\x01'
+VERSION = 1
+
+HEADER = struct.Struct('<8sHHIIQqQQQQ4x')
+TERM_ENTRY = struct.Struct('<QIQI')
+
+INDEX_SUFFIX = '.qsx'
+
+# 汉字（含扩展 A、兼容汉字）、假名、谚文按二元组切分，其余按单词切分
+_TOKEN_RE = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+)'
+                       r'|([0-9a-z_]+)')
+
+# 前缀匹配最多展开的词项数
+MAX_PREFIX_TERMS = 64
+# 参与逐题打分的最多命中数，超过时只对题干全部命中的题目（或前若干题）打分
+RANK_LIMIT = 1000
+# 题干命中的额外权重
+STEM_BOOST = 1.0
+
+# 一次搜索的结果：total 为命中总数，hits 为按得分降序的 (行号, 得分)
+SearchResult = namedtuple('SearchResult', 'total hits')
+
+
+def normalize(text):
+    """全角转半角、大写转小写"""
+    return unicodedata.normalize('NFKC', text).lower()
+
+
+def tokenize(text):
+    """文本 -> 词项集合：汉字二元组和单字，英文数字整词"""
+    terms = set()
+    for cjk, word in _TOKEN_RE.findall(normalize(text)):
+        if cjk:
+            terms.update(map(str.__add__, cjk, cjk[1:]))
+            terms.update(cjk)
+        else:
+            terms.add(word)
+    return terms
+
+
+def question_terms(store, row):
+    """一道题的 (全部字段词项, 题干词项)"""
+    stem_terms = tokenize(store.text(row, 'stem'))
+    terms = set(stem_terms)
+    for option in store.text(row, 'options'):
+        terms |= tokenize(option)
+    explanation = store.text(row, 'explanation')
+    if explanation:
+        terms |= tokenize(explanation)
+    return terms, stem_terms
+
+
+def index_path_for(bank_path):
+    """题库文件旁边的索引文件路径"""
+    return os.path.splitext(bank_path)[0] + INDEX_SUFFIX
+
+
+def source_signature(path):
+    """题库文件的 (大小, 修改时间)，用于判断索引是否过期"""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def _dense(df, count):
+    """倒排表是否存为位图：位图比行号数组更小时"""
+    return df * 32 >= count
+
+
+def _posting_bytes(rows, count):
+    if _dense(len(rows), count):
+        return positions_to_bits(rows, count).to_bytes((count + 7) >> 3, 'little')
+    if sys.byteorder != 'little':
+        rows = array('I', rows)
+        rows.byteswap()
+    return rows.tobytes()
+
+
+def write_index(f, store, signature=(0, 0)):
+    """为题库建立索引并写入已打开的二进制文件对象"""
+    count = len(store)
+    postings = {}
+    stem_postings = {}
+    stem_lengths = array('H')
+    for row in range(count):
+        terms, stem_terms = question_terms(store, row)
+        for term in terms:
+            rows = postings.get(term)
+            if rows is None:
+                rows = postings[term] = array('I')
+            rows.append(row)
+        for term in stem_terms:
+            rows = stem_postings.get(term)
+            if rows is None:
+                rows = stem_postings[term] = array('I')
+            rows.append(row)
+        stem_lengths.append(min(len(store.text(row, 'stem')), 0xFFFF))
+
+    terms = sorted(postings)
+    f.write(b'\0' * HEADER.size)
+    if sys.byteorder != 'little':
+        stem_lengths.byteswap()
+    f.write(stem_lengths.tobytes())
+
+    offset = HEADER.size + len(stem_lengths) * 2
+    directory = bytearray(TERM_ENTRY.size * len(terms))
+    empty = array('I')
+    for i, term in enumerate(terms):
+        rows = postings.pop(term)
+        stem_rows = stem_postings.pop(term, empty)
+        data = _posting_bytes(rows, count)
+        stem_data = _posting_bytes(stem_rows, count)
+        TERM_ENTRY.pack_into(directory, i * TERM_ENTRY.size,
+                             offset, len(rows), offset + len(data), len(stem_rows))
+        f.write(data)
+        f.write(stem_data)
+        offset += len(data) + len(stem_data)
+
+    terms_blob = '\n'.join(terms).encode('utf-8')
+    terms_offset = offset
+    f.write(terms_blob)
+    directory_offset = terms_offset + len(terms_blob)
+    f.write(directory)
+
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, VERSION, 0, count, len(terms), signature[0], signature[1],
+                        HEADER.size, terms_offset, len(terms_blob), directory_offset))
+    return len(terms)
+
+
+def build_index(store, path=None, signature=(0, 0)):
+    """建立索引；给出 path 时原子写入文件并打开，否则留在内存中"""
+    if path is None:
+        buffer = io.BytesIO()
+        write_index(buffer, store, signature)
+        return SearchIndex(buffer.getvalue())
+
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(tmp_path, 'wb') as f:
+            write_index(f, store, signature)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return SearchIndex.open(path)
+
+
+def load_search_index(store, bank_path=None):
+    """打开题库旁边的索引，不存在或已过期时重建
+
+    没有题库文件（示例题库）时在内存中建立；索引文件无法写入时同样
+    退回到内存索引。
+    """
+    bank_path = bank_path or getattr(store, 'source', None)
+    if not bank_path or not os.path.exists(bank_path):
+        return build_index(store)
+
+    signature = source_signature(bank_path)
+    path = index_path_for(bank_path)
+    if os.path.exists(path):
+        try:
+            index = SearchIndex.open(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 检索索引损坏，重新建立: {e}")
+        else:
+            if index.signature == signature and index.count == len(store):
+                return index
+            index.close()
+
+    print(f"🔍 正在为{len(store)}题建立检索索引...")
+    try:
+        return build_index(store, path, signature)
+    except OSError as e:
+        print(f"⚠️ 无法保存检索索引，仅在内存中使用: {e}")
+        return build_index(store, signature=signature)
+
+
+class SearchIndex:
+    """只读的倒排索引（mmap 文件或内存中的 bytes）"""
+
+    def __init__(self, buffer, cache_terms=256):
+        self._buf = buffer
+        self._file = None
+        if len(buffer) < HEADER.size:
+            raise ValueError("不是有效的检索索引")
+        (magic, version, _, self.count, term_count, size, mtime_ns, lengths_offset,
+         terms_offset, terms_length, self._directory_offset) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("不是有效的检索索引")
+        self.signature = (size, mtime_ns)
+        self.all_bits = (1 << self.count) - 1
+        self._nbytes = (self.count + 7) >> 3
+
+        terms_blob = bytes(buffer[terms_offset:terms_offset + terms_length]).decode('utf-8')
+        self.terms = terms_blob.split('\n') if term_count else []
+
+        self.stem_lengths = array('H')
+        self.stem_lengths.frombytes(buffer[lengths_offset:lengths_offset + self.count * 2])
+        if sys.byteorder != 'little':
+            self.stem_lengths.byteswap()
+        self.average_stem_length = (sum(self.stem_lengths) / self.count if self.count else 0) or 1.0
+
+        self._cache = OrderedDict()
+        self._cache_terms = cache_terms
+        self._match_cache = OrderedDict()
+
+    @classmethod
+    def open(cls, path):
+        f = open(path, 'rb')
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            f.close()
+            raise ValueError(f"检索索引为空: {path}")
+        try:
+            index = cls(mm)
+        except ValueError:
+            mm.close()
+            f.close()
+            raise
+        index._file = f
+        return index
+
+    def close(self):
+        self._cache.clear()
+        self._match_cache.clear()
+        if self._file is not None:
+            self._buf.close()
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return len(self.terms)
+
+    # ---- 词项 ----
+
+    def term_id(self, term):
+        """词项编号，不存在时为 None"""
+        i = bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            return i
+        return None
+
+    def prefix_ids(self, prefix, limit=MAX_PREFIX_TERMS):
+        """以 prefix 开头的词项编号（按码点顺序，最多 limit 个）"""
+        start = bisect_left(self.terms, prefix)
+        end = bisect_left(self.terms, prefix + '\U0010ffff', start)
+        return range(start, min(end, start + limit))
+
+    def document_frequency(self, term_id):
+        return TERM_ENTRY.unpack_from(self._buf, self._directory_offset + term_id * TERM_ENTRY.size)[1]
+
+    def _posting(self, term_id, stem):
+        """(偏移, 文档数)"""
+        offset, df, stem_offset, stem_df = TERM_ENTRY.unpack_from(
+            self._buf, self._directory_offset + term_id * TERM_ENTRY.size)
+        return (stem_offset, stem_df) if stem else (offset, df)
+
+    def _rows(self, offset, df):
+        rows = array('I')
+        rows.frombytes(self._buf[offset:offset + df * 4])
+        if sys.byteorder != 'little':
+            rows.byteswap()
+        return rows
+
+    def term_bits(self, term_id, stem=False):
+        """词项的倒排位图；stem=True 时只含题干命中"""
+        return self.group_bits((term_id,), stem)
+
+    def group_bits(self, group, stem=False):
+        """一组词项倒排位图的并集（前缀展开），结果进 LRU 缓存"""
+        key = (group, stem)
+        bits = self._cache.get(key)
+        if bits is not None:
+            self._cache.move_to_end(key)
+            return bits
+        bits = 0
+        buf = None
+        for term_id in group:
+            offset, df = self._posting(term_id, stem)
+            if _dense(df, self.count):
+                bits |= int.from_bytes(self._buf[offset:offset + self._nbytes], 'little')
+                continue
+            # 稀疏的倒排表先全部写进同一个缓冲区，最后只转换一次
+            if buf is None:
+                buf = bytearray(self._nbytes)
+            for p in self._rows(offset, df):
+                buf[p >> 3] |= 1 << (p & 7)
+        if buf is not None:
+            bits |= int.from_bytes(buf, 'little')
+        self._cache[key] = bits
+        if len(self._cache) > self._cache_terms:
+            self._cache.popitem(last=False)
+        return bits
+
+    # ---- 查询 ----
+
+    def parse(self, query, prefix=True):
+        """查询 -> 词项组列表；组内任一词项命中即可，各组之间取交集
+
+        汉字段拆成二元组（单字直接查单字词项）；prefix=True 时查询中最后
+        一个英文词按前缀展开。返回 None 表示有查询词在索引中不存在。
+        """
+        tokens = _TOKEN_RE.findall(normalize(query))
+        groups = []
+        for n, (cjk, word) in enumerate(tokens):
+            if cjk and len(cjk) == 1:
+                groups.append((self.term_id(cjk),))
+            elif cjk:
+                groups.extend((self.term_id(a + b),) for a, b in zip(cjk, cjk[1:]))
+            elif prefix and n == len(tokens) - 1:
+                groups.append(tuple(self.prefix_ids(word)))
+            else:
+                groups.append((self.term_id(word),))
+
+        parsed = []
+        for group in groups:
+            group = tuple(i for i in group if i is not None)
+            if not group:
+                return None
+            if group not in parsed:
+                parsed.append(group)
+        return parsed
+
+    def match_bits(self, query, prefix=True):
+        """命中全部查询词的行位图，可直接作为筛选条件"""
+        key = (query, prefix)
+        bits = self._match_cache.get(key)
+        if bits is not None:
+            self._match_cache.move_to_end(key)
+            return bits
+
+        groups = self.parse(query, prefix)
+        if not groups:
+            # 有词不在索引中，或查询里只有标点、空白（没有任何词项）：什么也不命中
+            bits = 0
+        else:
+            # 从最稀有的词项组开始求交，尽早得到小位图
+            groups.sort(key=lambda g: max(self.document_frequency(i) for i in g))
+            bits = self.all_bits
+            for group in groups:
+                bits &= self.group_bits(group)
+                if not bits:
+                    break
+        self._match_cache[key] = bits
+        if len(self._match_cache) > 32:
+            self._match_cache.popitem(last=False)
+        return bits
+
+    def search(self, query, limit=20, prefix=True):
+        """排序检索：按 BM25 式的 idf 加权，题干命中（且题干越短）得分越高"""
+        bits = self.match_bits(query, prefix)
+        if not bits:
+            return SearchResult(0, [])
+        total = popcount(bits)
+        groups = self.parse(query, prefix) or []
+
+        n = self.count
+        weights = []
+        stem_bits = []
+        for group in groups:
+            df = max(self.document_frequency(i) for i in group)
+            weights.append(math.log((n - df + 0.5) / (df + 0.5) + 1))
+            stem_bits.append(self.group_bits(group, stem=True) & bits)
+
+        if total > RANK_LIMIT:
+            # 命中太多时先缩小到题干全部命中的题目，再不行就取前 RANK_LIMIT 题
+            best = bits
+            for sb in stem_bits:
+                best &= sb
+            if best and popcount(best) <= RANK_LIMIT:
+                bits = best
+            else:
+                bits = _first_bits(best or bits, RANK_LIMIT)
+            stem_bits = [sb & bits for sb in stem_bits]
+
+        # 只有题干命中的行需要逐行加权，其余行得分都是 base
+        base = sum(weights)
+        any_stem = 0
+        for sb in stem_bits:
+            any_stem |= sb
+        stem_rows = bits_to_positions(any_stem)
+        stem_bytes = [sb.to_bytes(self._nbytes, 'little') for sb in stem_bits]
+        lengths = self.stem_lengths
+        inv_average = 0.75 / self.average_stem_length
+        hits = []
+        for row in stem_rows:
+            byte, bit = row >> 3, 1 << (row & 7)
+            boost = 0.0
+            for weight, data in zip(weights, stem_bytes):
+                if data[byte] & bit:
+                    boost += weight
+            hits.append((base + boost * STEM_BOOST / (0.25 + lengths[row] * inv_average), row))
+        top = heapq.nlargest(limit, hits, key=lambda hit: (hit[0], -hit[1]))
+        if len(top) < limit:
+            # 题干未命中的行得分相同，按题库顺序补足
+            rest = bits & ~any_stem
+            top += [(base, row) for row in _first_positions(rest, limit - len(top))]
+        return SearchResult(total, [(row, score) for score, row in top])
+
+
+def _first_bits(bits, k):
+    """位图中最低的 k 个置位（按 64 位一段向上取整）"""
+    data = bits.to_bytes(((bits.bit_length() + 63) >> 6) << 3, 'little')
+    words = array('Q')
+    words.frombytes(data)
+    if sys.byteorder != 'little':
+        words.byteswap()
+    seen = 0
+    for i, word in enumerate(words):
+        if word:
+            seen += popcount(word)
+            if seen >= k:
+                return bits & ((1 << ((i + 1) << 6)) - 1)
+    return bits
+
+
+def _first_positions(bits, k):
+    """位图中最低的 k 个置位的下标"""
+    if not bits or k <= 0:
+        return []
+    return bits_to_positions(_first_bits(bits, k))[:k]
+
+
+def main():
+    import argparse
+    import time
+
+    from question_store import load_store
+
+    parser = argparse.ArgumentParser(description="建立/查询题库全文检索索引")
+    parser.add_argument('bank', help="题库文件（.qbk 或 .json）")
+    parser.add_argument('-q', '--query', help="检索词")
+    parser.add_argument('-n', '--limit', type=int, default=10)
+    parser.add_argument('--rebuild', action='store_true', help="强制重建索引")
+    args = parser.parse_args()
+
+    store = load_store(args.bank)
+    if args.rebuild:
+        path = index_path_for(args.bank)
+        if os.path.exists(path):
+            os.remove(path)
+    start = time.perf_counter()
+    index = load_search_index(store, args.bank)
+    print(f"✅ 索引就绪：{len(index)}个词项，耗时{time.perf_counter() - start:.2f}秒")
+
+    if args.query:
+        start = time.perf_counter()
+        result = index.search(args.query, args.limit)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"🔍 “{args.query}” 共命中{result.total}题（{elapsed:.1f} ms）")
+        for row, score in result.hits:
+            print(f"  [{store.ids[row]}] {score:.2f}  {store.text(row, 'stem')}")
+
+
+if __name__ == "__main__":
+    main()
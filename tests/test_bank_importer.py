@@ -0,0 +1,58 @@
+"""题库导入：单条记录校验，以及导入结果能被题库和刷题引擎直接使用"""
+
+import json
+
+import pytest
+
+from bank_importer import RecordError, import_bank, normalize_question
+from question_store import load_store
+from quiz_engine import QuizEngine
+
+BASE = {'type': 'single', 'stem': '题干', 'options': ['甲', '乙'], 'answer': 'A'}
+
+
+def test_normalize_metadata():
+    question = normalize_question(dict(BASE, tags='继承，多态', difficulty='3'))
+    assert question['tags'] == ['继承', '多态']
+    assert question['difficulty'] == 3
+    question = normalize_question(dict(BASE, tags=['a', None, 7], difficulty=2.0))
+    assert question['tags'] == ['a', '7']
+    assert question['difficulty'] == 2
+
+
+@pytest.mark.parametrize('fields', [
+    {'tags': 5},
+    {'tags': {'a': 1}},
+    {'tags': ['a', ['b']]},
+    {'difficulty': {'level': 3}},
+    {'difficulty': [1, 2]},
+    {'difficulty': True},
+])
+def test_normalize_rejects_non_scalar_metadata(fields):
+    with pytest.raises(RecordError):
+        normalize_question(dict(BASE, **fields))
+
+
+@pytest.mark.parametrize('qtype', ['single', 'multiple', 'judge'])
+@pytest.mark.parametrize('answer', [',', '、', ' ， ', '|;'])
+def test_normalize_rejects_separator_only_answer(qtype, answer):
+    with pytest.raises(RecordError, match="缺少答案"):
+        normalize_question(dict(BASE, type=qtype, answer=answer))
+
+
+def test_import_skips_bad_metadata(tmp_path):
+    source = tmp_path / 'bank.jsonl'
+    records = [
+        dict(BASE, id=1, tags=['继承'], difficulty=1),
+        dict(BASE, id=2, tags=5),
+        dict(BASE, id=3, difficulty={'level': 3}),
+        dict(BASE, id=4, chapter='第一章', difficulty='难'),
+    ]
+    source.write_text('\n'.join(json.dumps(r, ensure_ascii=False) for r in records), encoding='utf-8')
+    output = str(tmp_path / 'bank.qbk')
+    result = import_bank(str(source), output, workers=1)
+    assert [line for line, _ in result.errors] == [2, 3]
+
+    engine = QuizEngine(load_store(output))
+    assert [q['id'] for q in engine.questions] == [1, 4]
+    assert engine.question_index.values('difficulty') == [1, '难']
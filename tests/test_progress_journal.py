@@ -0,0 +1,137 @@
+"""答题进度日志：往返、重置、快照压缩、残缺尾部和损坏文件的恢复"""
+
+import os
+
+from progress_journal import FILE_HEADER, ProgressJournal, pack_entry, unpack_entry
+from review_scheduler import ReviewJournal, pack_state
+
+
+def write(directory, batches, **kwargs):
+    """每批记录 flush 一次（即一帧），返回期望的最终状态"""
+    journal = ProgressJournal(str(directory), **kwargs)
+    journal.load()
+    for batch in batches:
+        if batch == 'reset':
+            journal.record_reset()
+        else:
+            for qid, value in batch:
+                journal.record(qid, value)
+        journal.flush()
+    state = dict(journal.state)
+    journal.close()
+    return state
+
+
+def reload(directory):
+    journal = ProgressJournal(str(directory))
+    state = journal.load()
+    journal.close()
+    return state
+
+
+def test_pack_entry():
+    value = pack_entry(0b1101, True, False)
+    assert unpack_entry(value) == (0b1101, 1)
+
+
+def test_round_trip(tmp_path):
+    expected = write(tmp_path, [[(1, 3), (2, 5)], [(1, 7), (10 ** 12, 0x201)]])
+    assert expected == {1: 7, 2: 5, 10 ** 12: 0x201}
+    assert reload(tmp_path) == expected
+
+
+def test_reset(tmp_path):
+    expected = write(tmp_path, [[(1, 3), (2, 5)], 'reset', [(3, 1)]])
+    assert expected == {3: 1}
+    assert reload(tmp_path) == expected
+
+
+def test_compaction(tmp_path):
+    batches = [[(qid % 7, qid)] for qid in range(25)]
+    expected = write(tmp_path, batches, compact_every=10)
+    journal = ProgressJournal(str(tmp_path))
+    assert journal.load() == expected
+    assert journal.generation == 2
+    assert journal.records_since_snapshot == 5
+    journal.close()
+
+
+def test_read_only(tmp_path):
+    write(tmp_path, [[(1, 3)], [(2, 4)]])
+    journal_path = tmp_path / 'journal.bin'
+    data = journal_path.read_bytes()
+    journal_path.write_bytes(data + b'\x01\x02')
+    assert ProgressJournal(str(tmp_path)).read() == {1: 3, 2: 4}
+    assert journal_path.read_bytes() == data + b'\x01\x02'
+
+
+def test_truncated_tail(tmp_path):
+    write(tmp_path, [[(1, 3)], [(2, 4), (3, 5)]])
+    journal_path = tmp_path / 'journal.bin'
+    data = journal_path.read_bytes()
+    for cut in range(1, 25):
+        journal_path.write_bytes(data[:-cut])
+        assert reload(tmp_path) == {1: 3}
+    # 截断残缺帧后继续追加，再次读取时新记录完整可见
+    journal_path.write_bytes(data[:-3])
+    assert write(tmp_path, [[(9, 9)]]) == {1: 3, 9: 9}
+    assert reload(tmp_path) == {1: 3, 9: 9}
+
+
+def test_corrupt_frame(tmp_path):
+    write(tmp_path, [[(1, 3)], [(2, 4)], [(5, 6)]])
+    journal_path = tmp_path / 'journal.bin'
+    data = bytearray(journal_path.read_bytes())
+    data[-1] ^= 0xFF           # 最后一帧的帧体
+    journal_path.write_bytes(bytes(data))
+    # 校验失败的帧及其之后的帧全部丢弃
+    assert reload(tmp_path) == {1: 3, 2: 4}
+
+
+def test_corrupt_journal_header(tmp_path):
+    write(tmp_path, [[(1, 3)]])
+    (tmp_path / 'journal.bin').write_bytes(b'garbage')
+    assert reload(tmp_path) == {}
+    assert write(tmp_path, [[(2, 4)]]) == {2: 4}
+    assert reload(tmp_path) == {2: 4}
+
+
+def test_corrupt_snapshot(tmp_path, capsys):
+    write(tmp_path, [[(qid, qid)] for qid in range(1, 6)], compact_every=3)
+    snapshot_path = tmp_path / 'snapshot.bin'
+    data = bytearray(snapshot_path.read_bytes())
+    data[-1] ^= 0xFF
+    snapshot_path.write_bytes(bytes(data))
+    # 快照作废后，代号更大的 journal 不能单独重放
+    assert reload(tmp_path) == {}
+    assert '进度快照已损坏' in capsys.readouterr().out
+
+
+def test_stale_journal_after_crash(tmp_path):
+    """快照已写好、新 journal 还没换上时崩溃：旧 journal 代号更小，不再重放"""
+    write(tmp_path, [[(1, 3)], [(2, 4)]])
+    journal_path = tmp_path / 'journal.bin'
+    old_journal = journal_path.read_bytes()
+    journal = ProgressJournal(str(tmp_path))
+    journal.load()
+    journal.record(1, 8)
+    journal.flush()
+    journal.compact()
+    journal.close()
+    journal_path.write_bytes(old_journal)
+    assert FILE_HEADER.unpack_from(old_journal)[2] == 0
+    assert reload(tmp_path) == {1: 8, 2: 4}
+
+
+def test_review_journal_wide_values(tmp_path):
+    value = pack_state(1_700_000_000, 12, 250, 4, 1)
+    journal = ReviewJournal(str(tmp_path))
+    journal.load()
+    journal.record(42, value)
+    journal.close()
+    reopened = ReviewJournal(str(tmp_path))
+    assert reopened.load() == {42: value}
+    reopened.close()
+    assert value > 0xFFFF
+    # 与答题日志分开存放，互不干扰
+    assert not os.path.exists(tmp_path / 'journal.bin')
@@ -0,0 +1,333 @@
+"""多设备同步：合并结果与同步顺序无关、增量合并、重置传播、服务器往返、记录文件恢复"""
+
+import itertools
+import os
+import random
+import subprocess
+import sys
+import threading
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+import progress_sync
+from progress_journal import SYNC_DIR_NAME, ProgressJournal, pack_entry
+from progress_sync import (MERGED_FIELDS, MERGED_FILE, OP, OP_ANSWER, OP_BASE, OP_RESET, DeviceLog,
+                           HttpRemote, LogFolder, SyncError, _load_merged, _load_ops, _save_merged,
+                           merge_delta, merge_state, sync)
+from question_store import QuestionStore
+from quiz_engine import QuizEngine
+from review_scheduler import ReviewJournal
+
+DEVICES = ('0123456789abcdef', 'fedcba9876543210', 'aaaaaaaaaaaaaaaa')
+QUESTIONS = [
+    {'id': 100 + i, 'type': 'single', 'stem': f'题{i}', 'options': ['甲', '乙', '丙'], 'answer': 'B'}
+    for i in range(40)
+]
+
+
+def random_ops(rng, count, with_reset=False):
+    ops = []
+    for seq in range(1, count + 1):
+        when = 1_700_000_000 + rng.randrange(0, 10_000) * 60
+        if with_reset and seq == count // 2:
+            ops.append(OP.pack(seq, when, 0, 0, OP_RESET, 0))
+            continue
+        mask = 1 << rng.randrange(3)
+        value = pack_entry(mask, mask == 2, mask != 2)
+        # 少量完全同时的记录，检验 (时间, 设备号, 序号) 的决胜规则
+        if seq % 10 == 0:
+            when = 1_700_000_000
+        ops.append(OP.pack(seq, when, 100 + rng.randrange(40), value, OP_ANSWER, 0))
+    return ops
+
+
+@pytest.mark.parametrize('with_reset', [False, True])
+def test_merge_is_order_independent(tmp_path, with_reset):
+    rng = random.Random(7)
+    logs = {device: random_ops(rng, 60, with_reset and i == 1)
+            for i, device in enumerate(DEVICES)}
+
+    results = []
+    for n, order in enumerate(itertools.permutations(DEVICES)):
+        folder = LogFolder(str(tmp_path / f'replica{n}'))
+        # 每台设备的记录分几批、按不同的设备顺序到达
+        pending = {device: 0 for device in DEVICES}
+        while any(pending[d] < len(logs[d]) for d in DEVICES):
+            for device in order:
+                start = pending[device]
+                stop = min(len(logs[device]), start + rng.randrange(1, 25))
+                folder.push(device, start, b''.join(logs[device][start:stop]))
+                pending[device] = stop
+        results.append(merge_state(folder))
+
+    assert all(result == results[0] for result in results)
+    answers, reviews = results[0]
+    assert answers and reviews
+
+
+@pytest.mark.parametrize('with_reset', [False, True])
+def test_incremental_merge_matches_full_merge(tmp_path, with_reset):
+    """分批增量合并（中途存盘再读回）与从头合并全部记录结果相同"""
+    rng = random.Random(11)
+    logs = {device: random_ops(rng, 80, with_reset and i == 2) for i, device in enumerate(DEVICES)}
+    profile = str(tmp_path / 'profile')
+    folder = LogFolder(os.path.join(profile, SYNC_DIR_NAME))
+    retained = np.zeros(0, dtype=MERGED_FIELDS)
+    answers, reviews = {}, {}
+    applied = {device: 0 for device in DEVICES}
+    while any(applied[d] < len(logs[d]) for d in DEVICES):
+        device = rng.choice(DEVICES)
+        start = applied[device]
+        stop = min(len(logs[device]), start + rng.randrange(1, 15))
+        folder.push(device, start, b''.join(logs[device][start:stop]))
+        delta = _load_ops(device, folder.fetch(device, start))
+        changed, changed_reviews, retained, full = merge_delta(retained, delta)
+        if full:
+            answers, reviews = changed, changed_reviews
+        else:
+            answers.update(changed)
+            reviews.update(changed_reviews)
+        applied[device] = stop
+        if rng.random() < 0.3:
+            _save_merged(profile, retained)
+            retained = _load_merged(profile)
+        assert (answers, reviews) == merge_state(folder)
+    # 同一批记录再合并一次，结果不变
+    changed, changed_reviews, _, _ = merge_delta(retained, _load_ops(DEVICES[0], folder.fetch(DEVICES[0], 0)))
+    assert changed == {qid: answers[qid] for qid in changed}
+    assert changed_reviews == {qid: reviews[qid] for qid in changed_reviews}
+
+
+def test_empty_baseline_does_not_hide_answer(tmp_path):
+    """只有复习状态的基线（答题状态值为 0）排在后面时，不挡住更早的真实作答"""
+    folder = LogFolder(str(tmp_path / 'replica'))
+    value = pack_entry(2, True, False)
+    folder.push(DEVICES[0], 0, OP.pack(1, 1_700_000_000.0, 100, value, OP_ANSWER, 0))
+    folder.push(DEVICES[1], 0, OP.pack(1, 1_800_000_000.0, 100, 0, OP_BASE, 0)
+                + OP.pack(2, 1_800_000_000.0, 101, 0, OP_BASE, 0))
+    answers, _ = merge_state(folder)
+    assert answers == {100: value}
+
+
+def make_profile(directory, device):
+    """预先写好设备号，测试时两台设备的设备号固定"""
+    os.makedirs(os.path.join(directory, SYNC_DIR_NAME))
+    with open(os.path.join(directory, SYNC_DIR_NAME, 'device'), 'w', encoding='ascii') as f:
+        f.write(device)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        self.now += 7.0
+        return self.now
+
+
+def practise(store, directory, clock, seed, count, reset_after=None):
+    engine = QuizEngine(store, seed=seed, clock=clock)
+    engine.open_journal(directory)
+    rng = random.Random(seed)
+    for i in range(count):
+        engine.goto(rng.randrange(len(store)))
+        engine.submit(rng.choice('ABC'))
+        if i == reset_after:
+            engine.reset()
+    engine.close()
+
+
+def profile_state(directory):
+    return ProgressJournal(directory).read(), ReviewJournal(directory).read()
+
+
+def run_two_devices(base, order):
+    store = QuestionStore.from_questions(QUESTIONS)
+    clock = Clock()
+    profiles = {'a': str(base / 'a'), 'b': str(base / 'b')}
+    make_profile(profiles['a'], DEVICES[0])
+    make_profile(profiles['b'], DEVICES[1])
+    shared = LogFolder(str(base / 'shared'))
+    practise(store, profiles['a'], clock, 1, 150)
+    practise(store, profiles['b'], clock, 2, 150)
+    for name in order + order:
+        sync(profiles[name], shared)
+    return profile_state(profiles['a']), profile_state(profiles['b'])
+
+
+def test_sync_order_independent(tmp_path):
+    a1, b1 = run_two_devices(tmp_path / 'ab', ['a', 'b'])
+    a2, b2 = run_two_devices(tmp_path / 'ba', ['b', 'a'])
+    assert a1 == b1 == a2 == b2
+    assert a1[0] and a1[1]
+
+
+def test_reset_propagates(tmp_path):
+    store = QuestionStore.from_questions(QUESTIONS)
+    clock = Clock()
+    a, b = str(tmp_path / 'a'), str(tmp_path / 'b')
+    make_profile(a, DEVICES[0])
+    make_profile(b, DEVICES[1])
+    shared = LogFolder(str(tmp_path / 'shared'))
+    practise(store, a, clock, 1, 50)
+    practise(store, b, clock, 2, 50)
+    sync(a, shared), sync(b, shared), sync(a, shared)
+    practise(store, a, clock, 3, 10, reset_after=4)
+    sync(a, shared)
+    report = sync(b, shared)
+    state = profile_state(b)
+    assert state == profile_state(a)
+    assert len(state[0]) <= 5
+    assert report['changed_questions'] > 0
+    # 没有新记录时什么也不变
+    assert sync(b, shared)['changed_questions'] == 0
+
+
+def test_own_answers_do_not_count_as_changes(tmp_path):
+    store = QuestionStore.from_questions(QUESTIONS)
+    a = str(tmp_path / 'a')
+    make_profile(a, DEVICES[0])
+    shared = LogFolder(str(tmp_path / 'shared'))
+    practise(store, a, Clock(), 1, 30)
+    report = sync(a, shared)
+    assert report['uploaded'] == 30
+    assert report['changed_questions'] == 0
+
+
+def test_http_server_round_trip(tmp_path):
+    progress_sync._SyncHandler.folder = LogFolder(str(tmp_path / 'server'))
+    server = progress_sync.ThreadingHTTPServer(('127.0.0.1', 0), progress_sync._SyncHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        remote = HttpRemote(f'http://127.0.0.1:{server.server_address[1]}')
+        store = QuestionStore.from_questions(QUESTIONS)
+        clock = Clock()
+        a, b = str(tmp_path / 'a'), str(tmp_path / 'b')
+        make_profile(a, DEVICES[0])
+        make_profile(b, DEVICES[1])
+        practise(store, a, clock, 1, 40)
+        practise(store, b, clock, 2, 40)
+        sync(a, remote), sync(b, remote), sync(a, remote)
+        assert profile_state(a) == profile_state(b)
+        assert remote.clock() == {DEVICES[0]: 40, DEVICES[1]: 40}
+        with pytest.raises(SyncError):
+            remote.push(DEVICES[0], 50, b'')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_device_log_append_and_torn_tail(tmp_path):
+    log = DeviceLog(str(tmp_path / (DEVICES[0] + '.qsync')), DEVICES[0])
+    ops = random_ops(random.Random(1), 10)
+    assert log.append(0, b''.join(ops[:6])) == 6
+    # 重复推送是幂等的，缺口报错
+    assert log.append(2, b''.join(ops[2:6])) == 0
+    with pytest.raises(SyncError):
+        log.append(8, b''.join(ops[8:]))
+    # 写到一半的尾部不计数，下次追加时截掉
+    with open(log.path, 'ab') as f:
+        f.write(ops[6][:17])
+    assert log.count() == 6
+    assert log.append(6, b''.join(ops[6:])) == 4
+    assert log.read() == b''.join(ops)
+    with pytest.raises(SyncError):
+        log.append(0, b'short')
+
+
+def test_device_log_rejects_foreign_file(tmp_path):
+    path = tmp_path / (DEVICES[0] + '.qsync')
+    DeviceLog(str(path), DEVICES[0]).append(0, b''.join(random_ops(random.Random(1), 2)))
+    with pytest.raises(SyncError):
+        DeviceLog(str(path), DEVICES[1]).read()
+    path.write_bytes(b'garbage' * 10)
+    with pytest.raises(SyncError):
+        DeviceLog(str(path), DEVICES[0]).read()
+
+
+def test_stale_baseline_loses_to_newer_answers(tmp_path):
+    """第一次同步的旧进度排在其他设备的作答之前，不管它什么时候才同步"""
+    store = QuestionStore.from_questions(QUESTIONS)
+    a, b = str(tmp_path / 'a'), str(tmp_path / 'b')
+    make_profile(a, DEVICES[0])
+    shared = LogFolder(str(tmp_path / 'shared'))
+    practise(store, a, Clock(), 1, 30)
+    sync(a, shared)
+    answered = ProgressJournal(a).read()
+
+    # b 上有同一批题的旧答案，之后才第一次同步（由 enable_sync 写基线）
+    stale = pack_entry(4, False, True)
+    journal = ProgressJournal(b)
+    journal.load()
+    for qid in answered:
+        journal.record(qid, stale)
+    journal.record(139, stale)
+    journal.close()
+    sync(b, shared)
+    sync(a, shared)
+
+    expected = dict(answered)
+    expected.setdefault(139, stale)
+    assert ProgressJournal(b).read() == expected
+    assert ProgressJournal(a).read() == expected
+
+
+def test_sync_fetches_only_new_records(tmp_path, monkeypatch):
+    store = QuestionStore.from_questions(QUESTIONS)
+    clock = Clock()
+    a, b = str(tmp_path / 'a'), str(tmp_path / 'b')
+    make_profile(a, DEVICES[0])
+    make_profile(b, DEVICES[1])
+    shared = LogFolder(str(tmp_path / 'shared'))
+    practise(store, a, clock, 1, 40)
+    practise(store, b, clock, 2, 40)
+    sync(a, shared), sync(b, shared), sync(a, shared)
+
+    fetched = []
+    fetch = LogFolder.fetch
+    monkeypatch.setattr(LogFolder, 'fetch',
+                        lambda self, device, start: fetched.append(start) or fetch(self, device, start))
+    practise(store, a, clock, 3, 5)
+    report = sync(a, shared)
+    assert report['uploaded'] == 5
+    assert 0 not in fetched
+    sync(b, shared)
+    assert 0 not in fetched
+    assert profile_state(a) == profile_state(b)
+
+
+def test_corrupt_merge_state_is_rebuilt(tmp_path):
+    store = QuestionStore.from_questions(QUESTIONS)
+    clock = Clock()
+    a, b = str(tmp_path / 'a'), str(tmp_path / 'b')
+    make_profile(a, DEVICES[0])
+    make_profile(b, DEVICES[1])
+    shared = LogFolder(str(tmp_path / 'shared'))
+    practise(store, a, clock, 1, 30)
+    practise(store, b, clock, 2, 30)
+    sync(a, shared), sync(b, shared)
+    with open(os.path.join(a, SYNC_DIR_NAME, MERGED_FILE), 'wb') as f:
+        f.write(b'garbage')
+    sync(a, shared)
+    assert profile_state(a) == profile_state(b)
+
+
+def test_sync_log_does_not_import_numpy(tmp_path):
+    """启用了同步的档案打开答题日志时不加载 numpy"""
+    directory = str(tmp_path / 'a')
+    make_profile(directory, DEVICES[0])
+    script = ("import sys\n"
+              "from question_store import QuestionStore\n"
+              "from quiz_engine import QuizEngine\n"
+              f"questions = {QUESTIONS[:3]!r}\n"
+              "engine = QuizEngine(QuestionStore.from_questions(questions))\n"
+              f"engine.open_journal({directory!r})\n"
+              "engine.submit('B')\n"
+              "assert engine.sync_log is not None\n"
+              "engine.close()\n"
+              "assert 'numpy' not in sys.modules\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-c', script], cwd=root, check=True)
@@ -0,0 +1,139 @@
+"""二进制题库 .qbk：读写往返、损坏文件、截断文件"""
+
+import pytest
+
+from question_bank_file import BLOCK_ENTRY, HEADER, BankFormatError, BinaryQuestionBank, write_bank
+
+QUESTIONS = [
+    {'id': 1, 'type': 'single', 'stem': '第一题', 'options': ['甲', '乙', '丙'],
+     'answer': 'B', 'explanation': '因为乙'},
+    {'id': 2, 'type': 'multiple', 'stem': 'Second', 'options': ['a', 'b', 'c', 'd'],
+     'answer': 'ACD', 'chapter': '第二章', 'tags': ['继承', '多态'], 'difficulty': 3},
+    {'id': 30, 'type': 'judge', 'stem': '对吗？', 'options': ['对', '错'], 'answer': 'A'},
+] + [{'id': 100 + i, 'type': 'single', 'stem': f'题干{i}', 'options': ['x', 'y'], 'answer': 'A'}
+     for i in range(200)]
+
+
+@pytest.fixture(params=[True, False], ids=['compressed', 'plain'])
+def bank_path(tmp_path, request):
+    path = str(tmp_path / 'bank.qbk')
+    write_bank(path, QUESTIONS, compress=request.param, block_size=16)
+    return path
+
+
+def test_round_trip(bank_path):
+    bank = BinaryQuestionBank(bank_path)
+    try:
+        assert len(bank) == len(QUESTIONS)
+        for row, question in enumerate(QUESTIONS):
+            for key, value in question.items():
+                assert bank.field(row, key) == value
+        assert bank.meta(0) == {}
+        assert bank.meta(1) == {'chapter': '第二章', 'tags': ['继承', '多态'], 'difficulty': 3}
+        assert list(bank.iter_meta(0, 3)) == [{}, bank.meta(1), {}]
+    finally:
+        bank.close()
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / 'empty.qbk'
+    path.write_bytes(b'')
+    with pytest.raises(BankFormatError):
+        BinaryQuestionBank(str(path))
+
+
+def test_bad_magic(tmp_path, bank_path):
+    with open(bank_path, 'rb') as f:
+        data = bytearray(f.read())
+    data[0:5] = b'XXXXX'
+    path = tmp_path / 'bad.qbk'
+    path.write_bytes(bytes(data))
+    with pytest.raises(BankFormatError):
+        BinaryQuestionBank(str(path))
+
+
+@pytest.mark.parametrize('keep', [1, HEADER.size - 1, HEADER.size, HEADER.size + 25])
+def test_truncated_index(tmp_path, bank_path, keep):
+    with open(bank_path, 'rb') as f:
+        data = f.read()
+    path = tmp_path / 'short.qbk'
+    path.write_bytes(data[:keep])
+    with pytest.raises(BankFormatError):
+        BinaryQuestionBank(str(path))
+
+
+def test_truncated_heap(tmp_path, bank_path):
+    """索引完整但字符串堆被截断：打开成功，读到缺失的块时报 BankFormatError"""
+    with open(bank_path, 'rb') as f:
+        data = f.read()
+    path = tmp_path / 'short.qbk'
+    path.write_bytes(data[:-40])
+    bank = BinaryQuestionBank(str(path))
+    try:
+        with pytest.raises(BankFormatError):
+            for row in range(len(bank)):
+                bank.field(row, 'stem')
+                bank.field(row, 'explanation')
+                bank.meta(row)
+    finally:
+        bank.close()
+
+
+def test_corrupt_compressed_block(tmp_path):
+    path = tmp_path / 'bank.qbk'
+    write_bank(str(path), QUESTIONS, compress=True, block_size=16)
+    data = bytearray(path.read_bytes())
+    stem_directory = HEADER.unpack_from(data, 0)[6]
+    offset, length = BLOCK_ENTRY.unpack_from(data, stem_directory)
+    data[offset:offset + length] = bytes(length)
+    path.write_bytes(bytes(data))
+    bank = BinaryQuestionBank(str(path))
+    try:
+        with pytest.raises(BankFormatError):
+            bank.field(0, 'stem')
+        # 其他块不受影响
+        assert bank.field(20, 'stem') == QUESTIONS[20]['stem']
+    finally:
+        bank.close()
+
+
+def test_lazy_question_is_mapping(bank_path):
+    bank = BinaryQuestionBank(bank_path)
+    try:
+        for row in range(3):
+            assert dict(bank[row]) == QUESTIONS[row]
+            assert bank[row] == QUESTIONS[row]
+        assert 'explanation' not in bank[1]
+        assert bank[1].get('explanation') is None
+    finally:
+        bank.close()
+
+
+def test_corrupt_string_offsets(tmp_path):
+    """未压缩的块里偏移量指到块外：报 BankFormatError 而不是 struct.error / 乱码"""
+    path = tmp_path / 'bank.qbk'
+    write_bank(str(path), QUESTIONS, compress=False, block_size=16)
+    data = bytearray(path.read_bytes())
+    stem_directory = HEADER.unpack_from(data, 0)[6]
+    offset, _ = BLOCK_ENTRY.unpack_from(data, stem_directory)
+    data[offset + 4:offset + 8] = (1 << 30).to_bytes(4, 'little')
+    path.write_bytes(bytes(data))
+    bank = BinaryQuestionBank(str(path))
+    try:
+        with pytest.raises(BankFormatError):
+            bank.field(0, 'stem')
+    finally:
+        bank.close()
+
+
+def test_failed_finish_leaves_no_temp_file(tmp_path, monkeypatch):
+    import question_bank_file
+
+    def fail(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(question_bank_file.os, 'fsync', fail)
+    path = tmp_path / 'bank.qbk'
+    with pytest.raises(OSError):
+        write_bank(str(path), QUESTIONS)
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,67 @@
+"""查询引擎：错题/已答动态集合的增量维护与筛选"""
+
+import random
+
+import pytest
+
+from adaptive_sampler import index_of
+from question_index import (CHUNK_SHIFT, BitPositions, QueryEngine, QuestionIndex, bits_to_positions,
+                            positions_to_bits)
+from question_store import QuestionStore
+
+SIZE = 3 << CHUNK_SHIFT
+
+
+def make_engine():
+    questions = [{'id': i, 'type': 'single', 'stem': str(i), 'options': ['a', 'b'], 'answer': 'A'}
+                 for i in range(SIZE)]
+    return QueryEngine(QuestionIndex(QuestionStore.from_questions(questions)))
+
+
+def test_dynamic_sets_match_reference():
+    query = make_engine()
+    rng = random.Random(3)
+    wrong, answered = set(), set()
+    for _ in range(3000):
+        # 集中在块边界附近，覆盖整块清空后删除块的情况
+        pos = rng.choice([0, 1, (1 << CHUNK_SHIFT) - 1, 1 << CHUNK_SHIFT, SIZE - 1, rng.randrange(SIZE)])
+        flag = rng.random() < 0.5
+        query.set_wrong(pos, flag)
+        (wrong.add if flag else wrong.discard)(pos)
+        query.set_answered(pos, not flag)
+        (answered.discard if flag else answered.add)(pos)
+    assert bits_to_positions(query.wrong_bits) == sorted(wrong)
+    assert list(query.select(('wrong',))) == sorted(wrong)
+    assert list(query.select(('unanswered',))) == sorted(set(range(SIZE)) - answered)
+    assert all(query._chunks['wrong'].values())
+
+
+def test_unchanged_state_keeps_cache():
+    query = make_engine()
+    query.set_wrong(5, True)
+    first = query.select(('wrong',))
+    query.set_wrong(5, True)
+    query.set_answered(7, False)
+    assert query.select(('wrong',)) is first
+    query.clear()
+    assert list(query.select(('wrong',))) == []
+    assert query._chunks == {'wrong': {}, 'answered': {}}
+
+
+def test_bit_positions_match_list():
+    rng = random.Random(5)
+    rows = sorted(rng.sample(range(SIZE), 5000) + [0, (1 << CHUNK_SHIFT) - 1, SIZE - 1])
+    rows = sorted(set(rows))
+    positions = BitPositions(positions_to_bits(rows, SIZE))
+    assert len(positions) == len(rows)
+    assert list(positions) == rows
+    assert positions[10:30] == rows[10:30]
+    for i in [0, 1, len(rows) - 1, -1] + rng.sample(range(len(rows)), 200):
+        assert positions[i] == rows[i]
+    for row in rng.sample(range(SIZE), 500) + rows[:50]:
+        expected = rows.index(row) if row in rows else None
+        assert positions.index_of(row) == expected
+        assert index_of(positions, row) == expected
+    with pytest.raises(IndexError):
+        positions[len(rows)]
+    assert len(BitPositions(0)) == 0 and list(BitPositions(0)) == []
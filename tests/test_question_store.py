@@ -0,0 +1,38 @@
+"""列式题库：Question 作为只读映射的行为"""
+
+import pytest
+
+from question_bank_file import write_bank
+from question_store import QuestionStore, load_store
+
+QUESTIONS = [
+    {'id': 1, 'type': 'single', 'stem': '没有解析', 'options': ['甲', '乙'], 'answer': 'A'},
+    {'id': 2, 'type': 'multiple', 'stem': '有解析', 'options': ['a', 'b', 'c'],
+     'answer': 'AC', 'explanation': '略', 'chapter': '第一章', 'tags': ['继承']},
+    {'id': 3, 'type': 'judge', 'stem': '不规范答案', 'options': ['对', '错'], 'answer': 'BA'},
+]
+
+
+@pytest.fixture(params=['memory', 'binary'])
+def store(tmp_path, request):
+    if request.param == 'memory':
+        return QuestionStore.from_questions(QUESTIONS)
+    path = str(tmp_path / 'bank.qbk')
+    write_bank(path, QUESTIONS)
+    return load_store(path)
+
+
+def test_question_is_mapping(store):
+    for question, expected in zip(store, QUESTIONS):
+        assert dict(question) == expected
+        assert question == expected
+        assert len(question) == len(expected)
+        assert sorted(question.keys()) == sorted(expected)
+
+
+def test_missing_fields(store):
+    question = store[0]
+    assert 'explanation' not in question
+    assert question.get('explanation') is None
+    with pytest.raises(KeyError):
+        question['chapter']
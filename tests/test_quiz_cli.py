@@ -0,0 +1,57 @@
+"""命令行会话：答案校验与题号编号"""
+
+import pytest
+
+from progress_journal import ProgressJournal
+from question_store import QuestionStore
+from quiz_cli import Session
+from quiz_engine import QuizEngine
+
+QUESTIONS = [
+    {'id': 1, 'type': 'single', 'stem': '两个选项', 'options': ['甲', '乙'], 'answer': 'B'},
+    {'id': 2, 'type': 'multiple', 'stem': '四个选项', 'options': ['a', 'b', 'c', 'd'], 'answer': 'AD'},
+] + [{'id': 10 + i, 'type': 'judge', 'stem': f'判断{i}', 'options': ['对', '错'], 'answer': 'A'}
+     for i in range(20)]
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = QuizEngine(QuestionStore.from_questions(QUESTIONS), seed=1)
+    engine.open_journal(str(tmp_path))
+    yield Session(engine)
+    engine.close()
+
+
+@pytest.mark.parametrize('answer', ['Z', 'C', 'AZ', '1', 'ab!'])
+def test_submit_rejects_answers_outside_options(session, tmp_path, answer):
+    with pytest.raises(ValueError):
+        session.execute(f'submit {answer}')
+    engine = session.engine
+    assert not engine.user_answers and not engine.wrong_questions
+    engine.flush()
+    assert ProgressJournal(str(tmp_path)).read() == {}
+
+
+def test_submit_normalizes_letters(session):
+    session.execute('goto 2')
+    result = session.execute('submit d a a')
+    assert result['selected'] == 'AD' and result['correct']
+    with pytest.raises(ValueError):
+        session.execute('submit E')
+
+
+def test_one_numbering_for_every_move(session):
+    session.execute('order shuffle')
+    for command in ['next', 'next', 'random', 'prev', 'goto 5', 'random', 'next']:
+        moved = session.execute(command)
+        assert moved['index'] == session.execute('show')['index']
+
+
+def test_jump_to_current_deck_slot_uses_deck_numbering(session):
+    """跳到洗牌顺序里当前那一张时，题号与 show / next 一致（按牌序）"""
+    session.execute('order shuffle')
+    session.execute('next')
+    engine = session.engine
+    target = engine._deck[engine._deck_pos]
+    result = session.execute(f'goto {target + 1}')
+    assert result['index'] == session.execute('show')['index'] == engine._deck_pos + 1
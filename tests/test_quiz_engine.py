@@ -0,0 +1,34 @@
+"""刷题引擎：重置进度后不残留本次会话的复习状态"""
+
+from question_store import QuestionStore
+from quiz_engine import QuizEngine
+
+QUESTIONS = [{'id': i, 'type': 'judge', 'stem': f'判断{i}', 'options': ['对', '错'], 'answer': 'A'}
+             for i in range(1, 11)]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_reset_forgets_reviewed_rows():
+    clock = Clock()
+    engine = QuizEngine(QuestionStore.from_questions(QUESTIONS), seed=1, clock=clock)
+    for index in range(3):
+        engine.goto(index)
+        engine.submit('B')
+    clock.now += 2 * 86400
+    engine.set_filter(mode='review')
+    assert len(engine.filtered()) == 3
+    row = engine.filtered().position(0)
+    engine.submit('A')
+    assert engine.has_result(row)
+
+    engine.reset()
+    assert not engine.has_result(row)
+    assert not engine._reviewed
+    assert len(engine.filtered()) == 0
@@ -0,0 +1,47 @@
+"""多用户服务器：会话表的输入校验，以及长时间运行时查询缓存有界"""
+
+from http import HTTPStatus
+
+import pytest
+
+from question_index import DEPS_CACHE_LIMIT
+from question_store import QuestionStore
+from quiz_server import HttpError, SessionManager, SharedBank
+
+QUESTIONS = [
+    {'id': i, 'type': 'single', 'stem': f'题{i}', 'options': ['甲', '乙'], 'answer': 'A',
+     'chapter': f'第{i % 3}章'}
+    for i in range(1, 31)
+]
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return SessionManager(SharedBank(QuestionStore.from_questions(QUESTIONS)), str(tmp_path))
+
+
+@pytest.mark.parametrize('user', [5, ['a'], {'name': 'a'}, '', '..', '.', 'a/b', 'a\n', 'x' * 65])
+def test_open_rejects_bad_user(manager, user):
+    with pytest.raises(HttpError) as info:
+        manager.open(user)
+    assert info.value.status == HTTPStatus.BAD_REQUEST
+    assert len(manager) == 0
+
+
+def test_open_reuses_user_session(manager):
+    session = manager.open('alice.b-1')
+    assert manager.open('alice.b-1') is session
+    assert manager.open() is not session
+
+
+def test_query_caches_bounded(manager):
+    engine = manager.open().engine
+    query = engine.query
+    for i in range(DEPS_CACHE_LIMIT * 3):
+        query.select(('or', ('chapter', f'第{i}章'), ('wrong',)))
+        query.select(('and', ('chapter', f'第{i % 3}章'), ('tag', str(i))))
+    assert len(query._deps) == DEPS_CACHE_LIMIT
+    assert len(manager.bank.cache) <= manager.bank.cache.limit
+    # 淘汰之后结果照旧正确
+    query.set_wrong(4, True)
+    assert list(query.select(('or', ('chapter', '第0章'), ('wrong',)))) == [2, 4, 5, 8, 11, 14, 17, 20, 23, 26, 29]
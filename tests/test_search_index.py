@@ -0,0 +1,34 @@
+"""全文检索：没有任何词项的查询什么也不命中"""
+
+import pytest
+
+from question_store import QuestionStore
+from quiz_engine import QuizEngine
+from search_index import build_index
+
+QUESTIONS = [{'id': i, 'type': 'single', 'stem': f'多重继承 第{i}题', 'options': ['对', '错'], 'answer': 'A'}
+             for i in range(1, 21)]
+
+
+@pytest.fixture
+def engine():
+    store = QuestionStore.from_questions(QUESTIONS)
+    engine = QuizEngine(store, seed=1)
+    engine.set_search_index(build_index(store))
+    return engine
+
+
+@pytest.mark.parametrize('query', ['，。！', '?!', '—— …', '()'])
+def test_punctuation_only_query_matches_nothing(engine, query):
+    index = engine.search_index
+    assert index.match_bits(query) == 0
+    assert index.search(query).total == 0
+    engine.set_filter(search=query)
+    assert len(engine.filtered()) == 0
+
+
+def test_search_filter_matches_terms(engine):
+    engine.set_filter(search='多重继承')
+    assert len(engine.filtered()) == len(QUESTIONS)
+    engine.set_filter(search='不存在的词')
+    assert len(engine.filtered()) == 0
@@ -1,100 +1,799 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import random
+from tkinter import font as tkfont
 import json
 import os
-import sys
+from collections import OrderedDict, deque, namedtuple
+
+from bank_loader import BankLoader
+from perf_monitor import monitor, traced
+from progress_journal import default_profile_dir
+from quiz_engine import MODE_NAMES
+
+# 答题日志定时刷盘的间隔（毫秒）
+JOURNAL_FLUSH_MS = 2000
+
+# 后台加载题库时检查消息队列的间隔（毫秒）
+LOAD_POLL_MS = 50
+
+# 普通模式下显示答题结果后自动下一题的延迟（毫秒）
+AUTO_NEXT_MS = 3000
+
+# 空闲时预取：上一题/下一题方向各几道，每个空闲回调处理几道，布局缓存上限
+PREFETCH_AHEAD = 3
+PREFETCH_BATCH = 2
+LAYOUT_CACHE_LIMIT = 256
+
+STEM_FONT = ("Microsoft YaHei", 12)
+STEM_WRAP_WIDTH = 660           # 题干框还没显示出来时按这个宽度（像素）折行
+
+# 显示一道题所需的全部数据：文字已解码，选项标签已拼好，题干行数按字体实测
+QuestionLayout = namedtuple('QuestionLayout', 'qtype stem options labels stem_height')
+
+
+class LayoutCache:
+    """题目的渲染数据，按题库行号缓存（有界 LRU）
+
+    题干行数用题干字体逐字实测的宽度按题干框的实际宽度折行（西文按单词、
+    中文按字），各字符宽度只向 Tk 量一次。题干框宽度变化时整体作废。
+    """
+
+    def __init__(self, stem_widget, limit=LAYOUT_CACHE_LIMIT):
+        self.stem_widget = stem_widget
+        self.limit = limit
+        self.entries = OrderedDict()
+        self.width = None
+        self.font = None
+        self.char_widths = {}
+
+    def clear(self):
+        self.entries.clear()
+
+    def __contains__(self, row):
+        return row in self.entries
+
+    def get(self, question):
+        """取一道题的布局，没有缓存时当场计算；不是题库中的题（没有行号）时不缓存"""
+        width = self._stem_width()
+        if width != self.width:
+            self.entries.clear()
+            self.width = width
+        row = getattr(question, 'row', None)
+        if row is None:
+            return self._build(question)
+        layout = self.entries.get(row)
+        if layout is None:
+            layout = self.entries[row] = self._build(question)
+            if len(self.entries) > self.limit:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(row)
+        return layout
+
+    def _stem_width(self):
+        widget = self.stem_widget
+        width = widget.winfo_width()
+        if width <= 1:
+            return STEM_WRAP_WIDTH
+        # 去掉左右内边距和边框
+        inset = sum(widget.winfo_pixels(widget.cget(option))
+                    for option in ('padx', 'borderwidth', 'highlightthickness'))
+        return max(1, width - 2 * inset)
+
+    def _build(self, question):
+        stem = question['stem']
+        options = tuple(question['options'])
+        labels = tuple(f"{chr(65 + i)}. {option}" for i, option in enumerate(options))
+        lines = self.line_count(stem, self.width)
+        return QuestionLayout(question['type'], stem, options, labels, max(3, min(6, lines + 1)))
+
+    def line_count(self, text, width):
+        """text 在 width 像素宽、按单词折行时占几行"""
+        if self.font is None:
+            self.font = tkfont.Font(font=STEM_FONT)
+        measure = self.font.measure
+        widths = self.char_widths
+        lines = 0
+        for paragraph in text.split('\n'):
+            lines += 1
+            x = word = 0            # 当前行宽，行尾还没断开的西文单词宽度
+            for ch in paragraph:
+                w = widths.get(ch)
+                if w is None:
+                    w = widths[ch] = measure(ch)
+                if ch == ' ':
+                    x += w          # 行尾空格可以超出，之后可断行
+                    word = 0
+                    continue
+                cjk = ch > '\u2e7f'
+                if cjk:
+                    word = 0
+                if x + w > width and x:
+                    lines += 1
+                    # 写到一半的西文单词整个挪到下一行，单词比一行还长时从中间断开
+                    x = word if word < x else 0
+                    if not x:
+                        word = 0
+                x += w
+                word = 0 if cjk else word + w
+        return lines
+
+
+class QuestionView:
+    """可复用的题目视图
+
+    每种题型（单选、多选、判断）各有一套预先建好的布局，切换题目时只
+    重新配置文字、选项数量和变量绑定，多余的选项行隐藏而不销毁。选项行
+    按需增长，见过最多选项的题目之后不再创建新控件。
+    """
+
+    type_colors = {"single": "#3498db", "multiple": "#e74c3c", "judge": "#27ae60"}
+    type_names = {"single": "单选题", "multiple": "多选题", "judge": "判断题"}
+
+    def __init__(self, container, on_submit, on_explain):
+        self.container = container
+        self.on_explain = on_explain
+        self.current_layout = None
+        self.result_question = None
+
+        # 共享的答案变量：单选/判断共用一个 StringVar，多选使用 BooleanVar 池
+        self.option_var = tk.StringVar()
+        self.option_vars = []
+
+        # 空结果提示
+        self.empty_frame = tk.Frame(container, bg='white')
+        self.empty_label = tk.Label(self.empty_frame, text="该筛选条件下暂无题目",
+                                    font=("Microsoft YaHei", 14), bg='white', fg='#7f8c8d')
+        self.empty_label.pack(expand=True)
+        self.hint_label = tk.Label(self.empty_frame, text="",
+                                   font=("Microsoft YaHei", 11), bg='white', fg='#e67e22')
+
+        # 题目主体
+        self.main_frame = tk.Frame(container, bg='white')
+
+        header_frame = tk.Frame(self.main_frame, bg='white')
+        header_frame.pack(fill='x', pady=(0, 10))
+        self.progress_label = tk.Label(header_frame, text="", font=("Microsoft YaHei", 11, "bold"),
+                                       bg='white', fg='#34495e')
+        self.progress_label.pack(side='left')
+        self.type_label = tk.Label(header_frame, text="", font=("Microsoft YaHei", 10, "bold"),
+                                   fg='white', padx=8, pady=2)
+        self.type_label.pack(side='right')
+        self.wrong_label = tk.Label(header_frame, text="🔁 错题重练中",
+                                    font=("Microsoft YaHei", 9, "bold"),
+                                    bg='#fff3cd', fg='#856404', padx=5, pady=2)
+
+        stem_frame = tk.Frame(self.main_frame, bg='white')
+        stem_frame.pack(fill='x', pady=5)
+        self.stem_text = tk.Text(stem_frame, height=3, font=STEM_FONT,
+                                 wrap='word', bg='#f8f9fa', relief='flat', padx=10, pady=10)
+        self.stem_text.config(state='disabled')
+        self.stem_text.pack(fill='x', padx=5, pady=5)
+        self.layouts = LayoutCache(self.stem_text)
+
+        options_frame = tk.Frame(self.main_frame, bg='white')
+        options_frame.pack(fill='both', expand=True, pady=10)
+
+        # 判断题布局：固定两个选项
+        self.judge_frame = tk.Frame(options_frame, bg='white')
+        self.judge_buttons = []
+        for value in ('A', 'B'):
+            rb = tk.Radiobutton(self.judge_frame, text="", variable=self.option_var, value=value,
+                                font=("Microsoft YaHei", 12), bg='white', width=8, height=2)
+            rb.pack(side='left', padx=30)
+            self.judge_buttons.append(rb)
+
+        # 单选题、多选题布局：选项行按需增长
+        self.single_frame = tk.Frame(options_frame, bg='white')
+        self.single_rows = []
+        self.multiple_frame = tk.Frame(options_frame, bg='white')
+        self.multiple_rows = []
+        self.visible_rows = {'single': 0, 'multiple': 0}
+
+        self.button_frame = tk.Frame(self.main_frame, bg='white')
+        self.submit_button = tk.Button(self.button_frame, text="提交答案", command=on_submit,
+                                       font=("Microsoft YaHei", 11), bg='#27ae60', fg='white',
+                                       padx=25, pady=8)
+        self.submit_button.pack()
+
+        # 答题结果
+        self.result_frame = tk.Frame(container, bg='#f8f9fa')
+        self.result_label = tk.Label(self.result_frame, text="", font=("Microsoft YaHei", 12, "bold"),
+                                     bg='#f8f9fa')
+        self.result_label.pack(pady=5)
+        answer_frame = tk.Frame(self.result_frame, bg='#f8f9fa')
+        answer_frame.pack(pady=5)
+        self.correct_answer_label = tk.Label(answer_frame, text="", font=("Microsoft YaHei", 10),
+                                             bg='#f8f9fa')
+        self.correct_answer_label.pack(side='left', padx=10)
+        self.user_answer_label = tk.Label(answer_frame, text="", font=("Microsoft YaHei", 10),
+                                          bg='#f8f9fa')
+        self.user_answer_label.pack(side='left', padx=10)
+        tk.Button(self.result_frame, text="查看解析", command=self._explain_result,
+                  font=("Microsoft YaHei", 10), bg='#f39c12', fg='white').pack(pady=5)
+        self.result_hint_label = tk.Label(self.result_frame, text="请手动点击下一题继续练习",
+                                          font=("Microsoft YaHei", 9), bg='#f8f9fa', fg='#666')
+
+    def _ensure_rows(self, layout, count):
+        """保证某种布局至少有 count 个选项行（只在首次遇到更多选项时创建）"""
+        rows = self.single_rows if layout == 'single' else self.multiple_rows
+        parent = self.single_frame if layout == 'single' else self.multiple_frame
+        while len(rows) < count:
+            i = len(rows)
+            option_frame = tk.Frame(parent, bg='white')
+            if layout == 'single':
+                button = tk.Radiobutton(option_frame, text="", variable=self.option_var,
+                                        value=chr(65 + i), font=("Microsoft YaHei", 11), bg='white',
+                                        justify='left', wraplength=600)
+            else:
+                var = tk.BooleanVar()
+                button = tk.Checkbutton(option_frame, text="", variable=var,
+                                        font=("Microsoft YaHei", 11), bg='white',
+                                        justify='left', wraplength=600)
+                self.option_vars.append(var)
+            button.pack(anchor='w', padx=15)
+            rows.append((option_frame, button))
+        return rows
+
+    def _show_rows(self, layout, count):
+        """显示前 count 个选项行，隐藏多余的行"""
+        rows = self._ensure_rows(layout, count)
+        visible = self.visible_rows[layout]
+        for i in range(visible, count):
+            rows[i][0].pack(fill='x', pady=4)
+        for i in range(count, visible):
+            rows[i][0].pack_forget()
+        self.visible_rows[layout] = count
+        return rows
+
+    def _switch_layout(self, layout):
+        if layout == self.current_layout:
+            return
+        frames = {'judge': self.judge_frame, 'single': self.single_frame,
+                  'multiple': self.multiple_frame}
+        if self.current_layout is not None:
+            frames[self.current_layout].pack_forget()
+        if layout == 'judge':
+            self.judge_frame.pack(anchor='center', pady=15)
+        else:
+            frames[layout].pack(fill='both', expand=True)
+        self.current_layout = layout
+
+    def show_empty(self, hint_text=""):
+        """显示“暂无题目”提示"""
+        self.main_frame.pack_forget()
+        self.result_frame.pack_forget()
+        self.hint_label.config(text=hint_text)
+        if hint_text:
+            self.hint_label.pack(pady=10)
+        else:
+            self.hint_label.pack_forget()
+        self.empty_frame.pack(expand=True, fill='both')
+
+    def show(self, question, progress_text, is_wrong_mode=False, previous_answer=None):
+        """显示题目；previous_answer 为需要恢复的已选答案"""
+        self.empty_frame.pack_forget()
+        self.result_frame.pack_forget()
+        if not self.main_frame.winfo_manager():
+            self.main_frame.pack(fill='both', expand=True, padx=15, pady=10)
+
+        layout = self.layouts.get(question)
+        qtype = layout.qtype
+        self.progress_label.config(text=progress_text)
+        self.type_label.config(text=self.type_names[qtype], bg=self.type_colors[qtype])
+        if is_wrong_mode:
+            self.wrong_label.pack(side='right', padx=(0, 10))
+        else:
+            self.wrong_label.pack_forget()
+
+        # 题目内容，高度按实测行数调整
+        self.stem_text.config(state='normal', height=layout.stem_height)
+        self.stem_text.delete('1.0', 'end')
+        self.stem_text.insert('1.0', layout.stem)
+        self.stem_text.config(state='disabled')
+
+        # 选项：只重新配置文字和数量
+        options = layout.options
+        self._switch_layout(qtype)
+        self.option_var.set('')
+        if qtype == 'judge':
+            for button, option in zip(self.judge_buttons, options):
+                button.config(text=option)
+        else:
+            rows = self._show_rows(qtype, len(options))
+            for i, label in enumerate(layout.labels):
+                rows[i][1].config(text=label)
+            if qtype == 'multiple':
+                for i, var in enumerate(self.option_vars):
+                    var.set(previous_answer is not None and i < len(options)
+                            and chr(65 + i) in previous_answer)
+
+        if previous_answer is not None and qtype != 'multiple':
+            self.option_var.set(previous_answer)
+
+        self.submit_button.config(text="提交答案" if not is_wrong_mode else "重新提交")
+        self.button_frame.pack(pady=15)
+
+    def show_result(self, question, user_answer, is_wrong_mode=False):
+        """显示答题结果（隐藏提交按钮）"""
+        self.button_frame.pack_forget()
+        self.result_question = question
+
+        is_correct = user_answer.is_correct
+        result_color = '#27ae60' if is_correct else '#e74c3c'
+        result_text = "✅ 回答正确！" if is_correct else "❌ 回答错误！"
+
+        # 错题重练模式下显示不同的提示
+        if is_wrong_mode:
+            result_text = "🔁 错题重练中" + (" - 本次回答正确！" if is_correct else " - 本次仍回答错误")
+
+        self.result_label.config(text=result_text, fg=result_color)
+        self.correct_answer_label.config(text=f"正确答案: {question['answer']}")
+        self.user_answer_label.config(text=f"您的答案: {user_answer.selected}")
+        if is_wrong_mode:
+            self.result_hint_label.pack(pady=5)
+        else:
+            self.result_hint_label.pack_forget()
+        self.result_frame.pack(fill='x', padx=15, pady=10)
+
+    def get_answer(self, qtype):
+        """读取当前选择的答案"""
+        if qtype == 'multiple':
+            count = self.visible_rows['multiple']
+            selected = [chr(65 + i) for i, var in enumerate(self.option_vars[:count]) if var.get()]
+            return ''.join(sorted(selected))
+        return self.option_var.get()
+
+    def _explain_result(self):
+        if self.result_question is not None:
+            self.on_explain(self.result_question)
+
+
+class StatsPanel:
+    """统计详情窗口：按题型、章节、标签、难度和练习模式分组的正确率
+
+    数据全部来自引擎的增量计数器；窗口打开期间每次提交后刷新，表格行按
+    (维度, 取值) 复用，只更新数字。
+    """
+
+    dim_names = {"type": "题型", "chapter": "章节", "tag": "标签", "difficulty": "难度", "mode": "模式"}
+
+    def __init__(self, root, engine, on_close):
+        self.engine = engine
+        self.window = tk.Toplevel(root)
+        self.window.title("统计详情")
+        self.window.geometry("520x420")
+        self.window.configure(bg='white')
+        self.window.protocol("WM_DELETE_WINDOW", on_close)
+
+        self.recent_label = tk.Label(self.window, text="", font=("Microsoft YaHei", 10),
+                                     bg='white', fg='#2c3e50', anchor='w')
+        self.recent_label.pack(fill='x', padx=10, pady=(10, 5))
+
+        columns = ("name", "answered", "correct", "accuracy")
+        self.tree = ttk.Treeview(self.window, columns=columns, show='tree headings')
+        self.tree.heading("#0", text="分组")
+        for column, text in zip(columns, ("名称", "已答/总数", "答对", "正确率")):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=90, anchor='center')
+        self.tree.column("#0", width=70)
+        self.tree.pack(fill='both', expand=True, padx=10, pady=(0, 10))
+        self.items = {}
+        self.groups = {}
+
+    def _item(self, dim, value):
+        key = (dim, value)
+        item = self.items.get(key)
+        if item is None:
+            group = self.groups.get(dim)
+            if group is None:
+                group = self.groups[dim] = self.tree.insert('', 'end', text=self.dim_names[dim], open=True)
+            item = self.items[key] = self.tree.insert(group, 'end')
+        return item
+
+    def refresh(self):
+        engine = self.engine
+        recent = engine.stats()['recent']
+        self.recent_label.config(text="  ".join(
+            f"最近{size}题: {accuracy:.1f}% ({count}次)" for size, (count, accuracy) in recent.items()))
+
+        breakdown = engine.breakdown()
+        for dim, rows in breakdown.items():
+            if dim == "mode":
+                for mode, (attempts, correct) in rows.items():
+                    accuracy = correct / attempts * 100 if attempts else 0
+                    self.tree.item(self._item(dim, mode), values=(
+                        MODE_NAMES.get(mode, mode), attempts, correct, f"{accuracy:.1f}%"))
+                continue
+            for value, answered, correct, total in rows:
+                name = QuestionView.type_names.get(value, value) if dim == "type" else value
+                accuracy = f"{correct / answered * 100:.1f}%" if answered else "-"
+                self.tree.item(self._item(dim, value), values=(name, f"{answered}/{total}", correct, accuracy))
+
+
+class QuestionNavigator:
+    """题目导航格：筛选结果中每道题一个方格，颜色表示答题状态，点击跳转
+
+    只画看得见的几行：方格对象按画布宽度建一池反复使用，滚动时只改颜色，
+    提交答案后只重画那一格，筛选结果再大也不会建出成千上万个画布对象。
+    滚动条按“行”自己换算，不依赖画布的 scrollregion。
+    """
+
+    CELL = 14               # 方格边长（像素）
+    GAP = 3
+    LINES = 5               # 可见行数
+
+    status_colors = {"unanswered": "#dfe6e9", "correct": "#27ae60", "wrong": "#e74c3c"}
+    status_names = {"unanswered": "未答", "correct": "答对", "wrong": "错题"}
+
+    def __init__(self, container, on_jump):
+        self.on_jump = on_jump
+        self.engine = None
+        self.selection = None
+        self.columns = 0
+        self.top_line = 0
+        self.cells = []         # 方格对象池，按屏幕位置排列
+        self.current = None     # 当前题在筛选结果中的下标
+        self.hovered = None
+
+        self.frame = tk.Frame(container, bg='#f5f7fa')
+        header = tk.Frame(self.frame, bg='#f5f7fa')
+        header.pack(fill='x')
+        tk.Label(header, text="题目导航", font=("Microsoft YaHei", 9, "bold"),
+                 bg='#f5f7fa', fg='#34495e').pack(side='left')
+        for status, color in self.status_colors.items():
+            tk.Label(header, text="■", font=("Microsoft YaHei", 9), bg='#f5f7fa',
+                     fg=color).pack(side='left', padx=(8, 0))
+            tk.Label(header, text=self.status_names[status], font=("Microsoft YaHei", 9),
+                     bg='#f5f7fa', fg='#7f8c8d').pack(side='left')
+        self.hover_label = tk.Label(header, text="", font=("Microsoft YaHei", 9),
+                                    bg='#f5f7fa', fg='#7f8c8d')
+        self.hover_label.pack(side='right')
+
+        body = tk.Frame(self.frame, bg='#f5f7fa')
+        body.pack(fill='x')
+        pitch = self.CELL + self.GAP
+        self.canvas = tk.Canvas(body, height=self.LINES * pitch + self.GAP, bg='white',
+                                highlightthickness=0)
+        self.scrollbar = tk.Scrollbar(body, orient='vertical', command=self.on_scroll)
+        self.scrollbar.pack(side='right', fill='y')
+        self.canvas.pack(side='left', fill='x', expand=True)
+        self.marker = self.canvas.create_rectangle(0, 0, 0, 0, outline='#2c3e50', width=2,
+                                                   state='hidden')
+
+        self.canvas.bind('<Configure>', self.on_resize)
+        self.canvas.bind('<Button-1>', self.on_click)
+        self.canvas.bind('<Motion>', self.on_motion)
+        self.canvas.bind('<Leave>', self.on_leave)
+        self.canvas.bind('<MouseWheel>', lambda event: self.scroll_lines(-1 if event.delta > 0 else 1))
+        self.canvas.bind('<Button-4>', lambda event: self.scroll_lines(-1))
+        self.canvas.bind('<Button-5>', lambda event: self.scroll_lines(1))
+
+    # ---- 布局 ----
+
+    def _line_count(self):
+        count = len(self.selection) if self.selection is not None else 0
+        return -(-count // self.columns) if self.columns else 0
+
+    def _box(self, slot):
+        """方格池中第 slot 个方格的画布坐标"""
+        line, column = divmod(slot, self.columns)
+        pitch = self.CELL + self.GAP
+        x, y = self.GAP + column * pitch, self.GAP + line * pitch
+        return x, y, x + self.CELL, y + self.CELL
+
+    def _index_at(self, x, y):
+        """画布坐标处方格对应的筛选结果下标，落在空白处时返回 None"""
+        pitch = self.CELL + self.GAP
+        column, line = int(x - self.GAP) // pitch, int(y - self.GAP) // pitch
+        if not (0 <= column < self.columns and 0 <= line < self.LINES):
+            return None
+        index = (self.top_line + line) * self.columns + column
+        return index if self.selection is not None and index < len(self.selection) else None
+
+    def on_resize(self, event):
+        columns = max(1, (event.width - self.GAP) // (self.CELL + self.GAP))
+        if columns == self.columns:
+            return
+        # 宽度变化时重建方格池，尽量让当前题留在可见区域
+        self.canvas.delete(*self.cells)
+        self.columns = columns
+        self.cells = [self.canvas.create_rectangle(*self._box(slot), width=0)
+                      for slot in range(columns * self.LINES)]
+        self.canvas.tag_raise(self.marker)
+        if self.current is not None:
+            self._scroll_to(self.current)
+        self.redraw()
+
+    # ---- 与引擎同步 ----
+
+    def sync(self, engine):
+        """切题后调用：筛选结果变了就整体重画，否则只移动当前题的框"""
+        self.engine = engine
+        selection = engine.filtered()
+        self.current = engine.current_question_index if selection else None
+        if selection is not self.selection:
+            self.selection = selection
+            self.top_line = 0
+            if self.current is not None:
+                self._scroll_to(self.current)
+            self.redraw()
+        elif self.current is not None and self._scroll_to(self.current):
+            self.redraw()
+        else:
+            self._place_marker()
+
+    def update_cell(self, index):
+        """提交答案后只重画这一格（筛选结果已变化时留给 sync 整体重画）"""
+        if self.engine is None or self.engine.filtered() is not self.selection:
+            return
+        slot = index - self.top_line * self.columns
+        if 0 <= slot < len(self.cells):
+            status = self.engine.row_status(self.selection.position(index))
+            self.canvas.itemconfig(self.cells[slot], fill=self.status_colors[status])
+
+    def _scroll_to(self, index):
+        """让第 index 题可见，滚动了返回 True"""
+        if not self.columns:
+            return False
+        line = index // self.columns
+        top = self.top_line
+        if line < top:
+            top = line
+        elif line >= top + self.LINES:
+            top = line - self.LINES + 1
+        changed = top != self.top_line
+        self.top_line = top
+        return changed
+
+    # ---- 绘制 ----
+
+    def redraw(self):
+        """按当前滚动位置重设方格池的颜色"""
+        count = len(self.selection) if self.selection is not None else 0
+        start = self.top_line * self.columns
+        rows = self.selection.positions[start:start + len(self.cells)] if count else ()
+        colors = self.status_colors
+        row_status = self.engine.row_status if self.engine is not None else None
+        for slot, cell in enumerate(self.cells):
+            if slot < len(rows):
+                self.canvas.itemconfig(cell, fill=colors[row_status(rows[slot])], state='normal')
+            else:
+                self.canvas.itemconfig(cell, state='hidden')
+        self._place_marker()
+        lines = self._line_count()
+        if lines > self.LINES:
+            self.scrollbar.set(self.top_line / lines, (self.top_line + self.LINES) / lines)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _place_marker(self):
+        slot = None
+        if self.current is not None and self.columns:
+            slot = self.current - self.top_line * self.columns
+        if slot is None or not 0 <= slot < len(self.cells):
+            self.canvas.itemconfig(self.marker, state='hidden')
+            return
+        x0, y0, x1, y1 = self._box(slot)
+        self.canvas.coords(self.marker, x0 - 1, y0 - 1, x1 + 1, y1 + 1)
+        self.canvas.itemconfig(self.marker, state='normal')
+
+    # ---- 交互 ----
+
+    def scroll_lines(self, lines):
+        top = max(0, min(self.top_line + lines, self._line_count() - self.LINES))
+        if top != self.top_line:
+            self.top_line = top
+            self.redraw()
+
+    def on_leave(self, event):
+        self.hovered = None
+        self.hover_label.config(text="")
+
+    def on_scroll(self, action, amount, unit=None):
+        """滚动条回调：moveto 比例，或按行 / 按页滚动"""
+        if action == 'moveto':
+            self.scroll_lines(int(float(amount) * self._line_count()) - self.top_line)
+        else:
+            self.scroll_lines(int(amount) * (self.LINES if unit == 'pages' else 1))
+
+    def on_click(self, event):
+        index = self._index_at(event.x, event.y)
+        if index is not None:
+            self.on_jump(index)
+
+    def on_motion(self, event):
+        index = self._index_at(event.x, event.y)
+        if index == self.hovered:
+            return
+        self.hovered = index
+        if index is None:
+            self.hover_label.config(text="")
+            return
+        question = self.selection[index]
+        status = self.engine.row_status(self.selection.position(index))
+        self.hover_label.config(text=f"第{index + 1}题 (ID: {question['id']}) {self.status_names[status]}")
 
 
 class QuizApp:
-    def __init__(self, root):
+    def __init__(self, root, profile="default", engine=None):
         self.root = root
         self.root.title("智能刷题系统")
-        self.root.geometry("750x600")  # 稍微增加高度以适应新控件
+        self.root.geometry("750x780")  # 底部留出题目导航格
         self.root.configure(bg='#f5f7fa')
 
-        # 加载题库数据
-        self.questions = self.load_question_bank()
+        # 刷题引擎：题库、筛选、答题记录都在引擎里，界面只负责显示
+        self.engine = None
+        self.loader = None
+        self.stats_panel = None
 
-        # 用户数据
-        self.user_answers = {}
-        self.wrong_questions = set()
-        self.current_question_index = 0
-        self.current_mode = "all"
-        self.current_type_filter = "all"  # 新增：题型筛选
+        # 待重画的区域：同一轮事件里的多次 invalidate 合并成一次 after_idle 重画
+        self.dirty = set()
+        self.redraw_id = None
+        # 自动下一题只保留一个定时器，绑定到显示结果的那道题
+        self.auto_next_id = None
+        self.auto_next_row = None
+        # 空闲时为相邻的题和下一次随机选题预先准备布局
+        self.prefetch_rows = deque()
+        self.prefetch_id = None
 
-        self.setup_ui()
-        self.show_question()
+        # 设置了 QUIZ_TRACE 时统计控件增减、测量事件循环延迟
+        monitor.attach(self.root)
 
-    def load_question_bank(self):
-        """加载题库数据 - 简化版本"""
-        try:
-            # 添加桌面路径到系统路径
-            desktop = os.path.join(os.path.expanduser("~"), "Desktop")
-            if desktop not in sys.path:
-                sys.path.append(desktop)
-
-            # 直接导入合并后的题库
-            from combined_question_bank import question_bank
-            print(f"✅ 成功加载题库，共{len(question_bank)}题")
-
-            # 统计各题型数量
-            type_count = {"single": 0, "multiple": 0, "judge": 0}
-            for q in question_bank:
-                if q['type'] in type_count:
-                    type_count[q['type']] += 1
-            print(
-                f"📊 题型统计 - 单选: {type_count['single']}题, 多选: {type_count['multiple']}题, 判断: {type_count['judge']}题")
-
-            return question_bank
-
-        except ImportError as e:
-            print(f"❌ 导入题库失败: {e}")
-            print("⚠️ 使用示例题库")
-
-            # 使用示例题库
-            return [
-                {
-                    "id": 1,
-                    "stem": "Python中哪个关键字用于定义函数？",
-                    "type": "single",
-                    "answer": "A",
-                    "options": ["def", "function", "define", "func"],
-                    "explanation": "在Python中，使用def关键字来定义函数。"
-                },
-                {
-                    "id": 2,
-                    "stem": "以下哪些是Python的基本数据类型？",
-                    "type": "multiple",
-                    "answer": "ABC",
-                    "options": ["int", "str", "list", "class"],
-                    "explanation": "int、str、list都是Python的基本数据类型，class是关键字。"
-                },
-                {
-                    "id": 3,
-                    "stem": "Python是一种编译型语言。",
-                    "type": "judge",
-                    "answer": "B",
-                    "options": ["正确", "错误"],
-                    "explanation": "Python是一种解释型语言，不是编译型语言。"
-                },
-                {
-                    "id": 4,
-                    "stem": "下列哪个不是Python的数据类型？",
-                    "type": "single",
-                    "answer": "D",
-                    "options": ["list", "tuple", "dict", "array"],
-                    "explanation": "array不是Python的基本数据类型，需要从array模块导入。"
-                },
-                {
-                    "id": 5,
-                    "stem": "Python支持多重继承。",
-                    "type": "judge",
-                    "answer": "A",
-                    "options": ["正确", "错误"],
-                    "explanation": "Python确实支持多重继承，一个类可以继承多个父类。"
-                }
-            ]
+        self.setup_ui()
+        if engine is not None:
+            self.on_bank_ready(engine)
+        else:
+            # 后台线程分块加载题库、恢复答题进度（快照 + 日志尾部）、打开检索索引；
+            # 窗口先画出来，第一块读完就显示第一题，筛选等索引就绪后再启用
+            self.set_controls_state('disabled')
+            self.loader = BankLoader(default_profile_dir(profile))
+            self.loader.start()
+            self.root.after(LOAD_POLL_MS, self.poll_loader)
+
+        self.root.after(JOURNAL_FLUSH_MS, self.flush_progress)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
+    def flush_progress(self):
+        """定时把答题日志写盘"""
+        if self.engine is not None:
+            self.engine.flush()
+        self.root.after(JOURNAL_FLUSH_MS, self.flush_progress)
+
+    def on_close(self):
+        """关闭窗口前保存进度"""
+        self.cancel_auto_next()
+        for after_id in (self.redraw_id, self.prefetch_id):
+            if after_id is not None:
+                self.root.after_cancel(after_id)
+        self.redraw_id = self.prefetch_id = None
+        if self.engine is not None:
+            self.engine.close()
+        self.root.destroy()
+
+    # ---- 重画调度 ----
+
+    def invalidate(self, *regions):
+        """标记需要重画的区域：'filter' 筛选信息、'stats' 统计栏、'question' 题目
+        （含导航格的当前位置）、'navigator' 导航格全部方格。本轮事件处理完后
+        在 after_idle 里按这个顺序统一重画一次"""
+        self.dirty.update(regions)
+        if self.redraw_id is None:
+            self.redraw_id = self.root.after_idle(self.redraw)
+
+    def redraw(self):
+        self.redraw_id = None
+        dirty, self.dirty = self.dirty, set()
+        if self.engine is None:
+            return
+        if 'filter' in dirty:
+            self.update_filter_info()
+        if 'stats' in dirty:
+            self.update_stats()
+        if 'question' in dirty:
+            self.show_question()
+        if 'navigator' in dirty:
+            self.navigator.redraw()
+
+    def schedule_auto_next(self, row):
+        """AUTO_NEXT_MS 毫秒后自动下一题；这道题已有定时器时不重复安排"""
+        if self.auto_next_id is not None:
+            if self.auto_next_row == row:
+                return
+            self.cancel_auto_next()
+        self.auto_next_row = row
+        self.auto_next_id = self.root.after(AUTO_NEXT_MS, self.auto_next_question)
+
+    def cancel_auto_next(self):
+        if self.auto_next_id is not None:
+            self.root.after_cancel(self.auto_next_id)
+            self.auto_next_id = None
+            self.auto_next_row = None
+
+    def schedule_prefetch(self):
+        """显示一道题后排好预取队列：近的相邻题在前，最后是下一次随机选题"""
+        engine = self.engine
+        questions = engine.filtered()
+        indices = engine.upcoming(PREFETCH_AHEAD)
+        random_index = engine.peek_random()
+        if random_index is not None:
+            indices.append(random_index)
+        layouts = self.question_view.layouts
+        self.prefetch_rows = deque(row for row in map(questions.position, indices)
+                                   if row not in layouts)
+        if self.prefetch_rows and self.prefetch_id is None:
+            self.prefetch_id = self.root.after_idle(self.prefetch_step)
+
+    def prefetch_step(self):
+        """每个空闲回调只准备几道题，其余留到下一次空闲，不挡住用户操作"""
+        self.prefetch_id = None
+        questions = self.engine.questions
+        for _ in range(PREFETCH_BATCH):
+            if not self.prefetch_rows:
+                return
+            self.question_view.layouts.get(questions[self.prefetch_rows.popleft()])
+        if self.prefetch_rows:
+            self.prefetch_id = self.root.after_idle(self.prefetch_step)
+
+    # ---- 后台加载 ----
+
+    def poll_loader(self):
+        """处理后台加载线程发来的消息（只在界面线程里操作控件）"""
+        for message in self.loader.poll():
+            kind = message[0]
+            if kind == 'progress':
+                self.on_load_progress(*message[1:])
+            elif kind == 'first':
+                self.question_view.show(message[1], "题库加载中…")
+                self.question_view.submit_button.config(state='disabled')
+            elif kind == 'ready':
+                self.on_bank_ready(message[1])
+            elif kind == 'search':
+                self.on_search_ready(message[1])
+                self.loader = None
+                return
+            elif kind == 'error':
+                self.load_label.config(text=f"❌ 加载题库失败: {message[1]}")
+                messagebox.showerror("错误", f"加载题库失败：{message[1]}")
+                self.loader = None
+                return
+        self.root.after(LOAD_POLL_MS, self.poll_loader)
+
+    def on_load_progress(self, loaded, total, type_counts):
+        """加载进度：更新进度条、标题和题数"""
+        self.title_label.config(text=f"智能刷题系统 (已加载{loaded}/{total}题)")
+        self.total_label.config(text=str(loaded))
+        self.load_bar.config(value=loaded * 100 / total if total else 100)
+        counts = "  ".join(f"{QuestionView.type_names[name]} {count}"
+                           for name, count in type_counts.items())
+        stage = "正在建立筛选索引、恢复答题进度" if loaded >= total else "正在加载题库"
+        self.load_label.config(text=f"⏳ {stage}…  {counts}")
+
+    def on_bank_ready(self, engine):
+        """题库和筛选索引就绪：建立附加筛选、启用控件、显示当前题"""
+        self.engine = engine
+        # 加载途中显示的第一题可能来自出错后被替换掉的题库，行号不再可靠
+        self.question_view.layouts.clear()
+        self.load_frame.pack_forget()
+        self.title_label.config(text=f"智能刷题系统 (共{len(engine.questions)}题)")
+        self.build_extra_filters()
+        self.set_controls_state('normal')
+        self.question_view.submit_button.config(state='normal')
+        self.on_search_ready(engine.search_index)
+        self.invalidate('filter', 'stats', 'question')
+
+    def on_search_ready(self, index):
+        """检索索引就绪后才启用检索框"""
+        if index is not None and self.engine.search_index is not index:
+            self.engine.set_search_index(index)
+        state = 'normal' if self.engine.search_index is not None else 'disabled'
+        for widget in self.search_controls:
+            widget.config(state=state)
+
+    def set_controls_state(self, state):
+        """启用/禁用筛选、导航等依赖题库的控件"""
+        for widget in self.controls + self.search_controls:
+            widget.config(state=state)
 
     def setup_ui(self):
         """设置用户界面 - 增加题型筛选功能"""
@@ -103,10 +802,14 @@ class QuizApp:
         title_frame.pack(fill='x', padx=10, pady=5)
         title_frame.pack_propagate(False)
 
-        title_label = tk.Label(title_frame, text=f"智能刷题系统 (共{len(self.questions)}题)",
-                               font=("Microsoft YaHei", 16, "bold"),
-                               fg='white', bg='#2c3e50')
-        title_label.pack(expand=True)
+        self.title_label = tk.Label(title_frame, text="智能刷题系统 (题库加载中…)",
+                                    font=("Microsoft YaHei", 16, "bold"),
+                                    fg='white', bg='#2c3e50')
+        self.title_label.pack(expand=True)
+
+        # 依赖题库的控件，加载完成前禁用
+        self.controls = []
+        self.search_controls = []
 
         # 统计信息栏
         stats_frame = tk.Frame(self.root, bg='#ecf0f1')
@@ -116,6 +819,7 @@ class QuizApp:
             ("总题数", "total_label", "#3498db"),
             ("已答", "answered_label", "#27ae60"),
             ("正确率", "accuracy_label", "#e74c3c"),
+            ("近20题", "recent_label", "#e67e22"),
             ("当前模式", "mode_label", "#9b59b6")
         ]
 
@@ -130,6 +834,15 @@ class QuizApp:
                      bg='#ecf0f1', fg='#7f8c8d').pack(side='left', padx=(2, 0))
             setattr(self, var_name, label)
 
+        # 加载进度（题库就绪后隐藏）
+        self.load_frame = tk.Frame(self.root, bg='#f5f7fa')
+        self.load_frame.pack(fill='x', padx=15, pady=3)
+        self.load_label = tk.Label(self.load_frame, text="⏳ 正在加载题库…", font=("Microsoft YaHei", 9),
+                                   bg='#f5f7fa', fg='#7f8c8d')
+        self.load_label.pack(side='left')
+        self.load_bar = ttk.Progressbar(self.load_frame, mode='determinate', maximum=100)
+        self.load_bar.pack(side='left', fill='x', expand=True, padx=(10, 0))
+
         # 控制面板 - 分为上下两行
         control_frame = tk.Frame(self.root, bg='#f5f7fa')
         control_frame.pack(fill='x', padx=15, pady=5)
@@ -146,11 +859,13 @@ class QuizApp:
                  bg='#f5f7fa').pack(side='left', padx=(0, 10))
 
         self.mode_var = tk.StringVar(value="all")
-        modes = [("全部题目", "all"), ("错题重练", "wrong")]
+        modes = [("全部题目", "all"), ("错题重练", "wrong"), ("到期复习", "review")]
         for text, value in modes:
-            tk.Radiobutton(mode_left_frame, text=text, variable=self.mode_var,
-                           value=value, command=self.on_filter_change,
-                           font=("Microsoft YaHei", 9), bg='#f5f7fa').pack(side='left', padx=5)
+            button = tk.Radiobutton(mode_left_frame, text=text, variable=self.mode_var,
+                                    value=value, command=self.on_filter_change,
+                                    font=("Microsoft YaHei", 9), bg='#f5f7fa')
+            button.pack(side='left', padx=5)
+            self.controls.append(button)
 
         # 题型筛选
         type_right_frame = tk.Frame(mode_frame, bg='#f5f7fa')
@@ -162,11 +877,52 @@ class QuizApp:
         self.type_var = tk.StringVar(value="all")
         question_types = [("全部", "all"), ("单选题", "single"), ("多选题", "multiple"), ("判断题", "judge")]
         for text, value in question_types:
-            tk.Radiobutton(type_right_frame, text=text, variable=self.type_var,
-                           value=value, command=self.on_filter_change,
-                           font=("Microsoft YaHei", 9), bg='#f5f7fa').pack(side='left', padx=3)
-
-        # 第二行：导航按钮
+            button = tk.Radiobutton(type_right_frame, text=text, variable=self.type_var,
+                                    value=value, command=self.on_filter_change,
+                                    font=("Microsoft YaHei", 9), bg='#f5f7fa')
+            button.pack(side='left', padx=3)
+            self.controls.append(button)
+
+        # 第二行：附加筛选（章节、标签、难度、答题状态），可按“且/或”组合；
+        # 下拉框的取值来自题库索引，题库就绪后由 build_extra_filters 建立
+        self.extra_frame = tk.Frame(control_frame, bg='#f5f7fa')
+        self.extra_frame.pack(fill='x', pady=3)
+
+        self.extra_filter_vars = {}
+        self.extra_filter_choices = {}
+
+        self.combine_var = tk.StringVar(value="and")
+        combine_frame = tk.Frame(self.extra_frame, bg='#f5f7fa')
+        combine_frame.pack(side='right')
+        tk.Label(combine_frame, text="组合:", font=("Microsoft YaHei", 10),
+                 bg='#f5f7fa').pack(side='left', padx=(0, 5))
+        for text, value in [("且", "and"), ("或", "or")]:
+            button = tk.Radiobutton(combine_frame, text=text, variable=self.combine_var,
+                                    value=value, command=self.on_filter_change,
+                                    font=("Microsoft YaHei", 9), bg='#f5f7fa')
+            button.pack(side='left', padx=3)
+            self.controls.append(button)
+
+        # 第三行：全文检索（题干、选项、解析），结果与上面的条件取交集
+        search_frame = tk.Frame(control_frame, bg='#f5f7fa')
+        search_frame.pack(fill='x', pady=3)
+        tk.Label(search_frame, text="检索:", font=("Microsoft YaHei", 10),
+                 bg='#f5f7fa').pack(side='left', padx=(0, 5))
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var,
+                                font=("Microsoft YaHei", 10), width=30)
+        search_entry.pack(side='left', padx=(0, 5))
+        search_entry.bind('<Return>', lambda event: self.on_filter_change())
+        search_button = tk.Button(search_frame, text="🔍 搜索", command=self.on_filter_change,
+                                  font=("Microsoft YaHei", 9), bg='#16a085', fg='white',
+                                  relief='flat', padx=8)
+        search_button.pack(side='left', padx=3)
+        clear_button = tk.Button(search_frame, text="清除", command=self.clear_search,
+                                 font=("Microsoft YaHei", 9), relief='flat', padx=8)
+        clear_button.pack(side='left', padx=3)
+        self.search_controls = [search_entry, search_button, clear_button]
+
+        # 第四行：导航按钮
         nav_frame = tk.Frame(control_frame, bg='#f5f7fa')
         nav_frame.pack(fill='x', pady=3)
 
@@ -183,326 +939,190 @@ class QuizApp:
             ("⬅️ 上一题", self.previous_question, "#3498db"),
             ("➡️ 下一题", self.next_question, "#2ecc71"),
             ("🎲 随机选题", self.random_question, "#9b59b6"),
+            ("📊 统计", self.show_stats_panel, "#34495e"),
             ("🔄 重置进度", self.reset_progress, "#e74c3c")
         ]
 
+        self.shuffle_var = tk.BooleanVar(value=False)
+        shuffle_button = tk.Checkbutton(button_frame, text="🔀 洗牌", variable=self.shuffle_var,
+                                        command=self.on_shuffle_change, font=("Microsoft YaHei", 9),
+                                        bg='#f5f7fa')
+        shuffle_button.pack(side='left', padx=3)
+        self.controls.append(shuffle_button)
+
         for text, command, color in buttons:
-            tk.Button(button_frame, text=text, command=command,
-                      font=("Microsoft YaHei", 9), bg=color, fg='white',
-                      relief='flat', padx=8).pack(side='left', padx=3)
+            button = tk.Button(button_frame, text=text, command=command,
+                               font=("Microsoft YaHei", 9), bg=color, fg='white',
+                               relief='flat', padx=8)
+            button.pack(side='left', padx=3)
+            self.controls.append(button)
+
+        # 题目导航格：放在底部，先于题目区域 pack，窗口变矮时不被挤掉
+        self.navigator = QuestionNavigator(self.root, self.jump_to_question)
+        self.navigator.frame.pack(side='bottom', fill='x', padx=15, pady=(0, 5))
 
         # 题目显示区域
         self.question_container = tk.Frame(self.root, bg='white', relief='solid', bd=1, height=400)
         self.question_container.pack(fill='both', expand=True, padx=15, pady=5)
         self.question_container.pack_propagate(False)
 
-        self.update_stats()
-        self.update_filter_info()
-
+        # 可复用的题目视图：控件只创建一次，切题时仅更新内容
+        self.question_view = QuestionView(self.question_container, self.submit_answer,
+                                          self.show_explanation)
+
+    def build_extra_filters(self):
+        """按题库索引中出现过的取值建立附加筛选下拉框"""
+        extra_dims = [("章节", "chapter"), ("标签", "tag"), ("难度", "difficulty"), ("状态", "status")]
+        for text, dim in extra_dims:
+            choices = self.engine.extra_choices(dim)
+            if not choices:
+                continue
+            self.extra_filter_choices[dim] = choices
+            self._add_filter_combobox(self.extra_frame, text, dim, ["全部"] + list(choices))
+
+    def _add_filter_combobox(self, parent, text, dim, values):
+        """创建一个附加筛选下拉框"""
+        tk.Label(parent, text=f"{text}:", font=("Microsoft YaHei", 10),
+                 bg='#f5f7fa').pack(side='left', padx=(0, 5))
+        var = tk.StringVar(value="全部")
+        combo = ttk.Combobox(parent, textvariable=var, values=values,
+                             state='readonly', width=8, font=("Microsoft YaHei", 9))
+        combo.pack(side='left', padx=(0, 10))
+        combo.bind('<<ComboboxSelected>>', lambda event: self.on_filter_change())
+        self.extra_filter_vars[dim] = var
+
+    def get_extra_filters(self):
+        """当前生效的附加筛选条件"""
+        clauses = []
+        for dim, var in self.extra_filter_vars.items():
+            clause = self.extra_filter_choices[dim].get(var.get())
+            if clause is not None:
+                clauses.append(clause)
+        return clauses
+
+    @traced()
     def get_filtered_questions(self):
         """获取筛选后的题目列表"""
-        questions = self.questions.copy()
-
-        # 首先按题型筛选
-        if self.type_var.get() != "all":
-            questions = [q for q in questions if q['type'] == self.type_var.get()]
-
-        # 然后按模式筛选（错题重练）
-        if self.mode_var.get() == "wrong":
-            questions = [q for q in questions if str(q['id']) in self.wrong_questions]
-
-        return questions
+        return self.engine.filtered()
 
     def on_filter_change(self):
         """筛选条件改变回调"""
-        self.current_question_index = 0
-        filtered_questions = self.get_filtered_questions()
+        if self.engine is None:
+            return
+        try:
+            self.engine.set_filter(self.type_var.get(), self.mode_var.get(),
+                                   self.get_extra_filters(), self.combine_var.get(),
+                                   self.search_var.get())
+        except ValueError as e:
+            messagebox.showwarning("提示", str(e))
+            return
+        self.question_view.layouts.clear()
+        self.invalidate('filter', 'question')
 
-        # 如果当前索引超出范围，调整到有效范围
-        if self.current_question_index >= len(filtered_questions) and len(filtered_questions) > 0:
-            self.current_question_index = len(filtered_questions) - 1
-        elif len(filtered_questions) == 0:
-            self.current_question_index = 0
+    def on_shuffle_change(self):
+        """切换洗牌顺序"""
+        self.engine.set_shuffle(self.shuffle_var.get())
+        self.invalidate('question')
 
-        self.update_filter_info()
-        self.show_question()
+    def clear_search(self):
+        """清除检索词"""
+        if self.search_var.get():
+            self.search_var.set("")
+            self.on_filter_change()
 
     def update_filter_info(self):
         """更新筛选信息显示"""
         filtered_questions = self.get_filtered_questions()
 
-        mode_text = "全部题目" if self.mode_var.get() == "all" else "错题重练"
-        type_text = {
-            "all": "全部题型",
-            "single": "单选题",
-            "multiple": "多选题",
-            "judge": "判断题"
-        }[self.type_var.get()]
+        mode_text, type_text = self.engine.filter_description()
+
+        extra_text = ""
+        extra_texts = [var.get() for var in self.extra_filter_vars.values() if var.get() != "全部"]
+        if extra_texts:
+            joiner = " 且 " if self.combine_var.get() == "and" else " 或 "
+            extra_text = f" + ({joiner.join(extra_texts)})"
+
+        search_text = f" + 检索“{self.engine.search_text}”" if self.engine.search_text else ""
 
-        info_text = f"当前: {mode_text} + {type_text} (共{len(filtered_questions)}题)"
+        info_text = f"当前: {mode_text} + {type_text}{extra_text}{search_text} (共{len(filtered_questions)}题)"
         self.filter_info_label.config(text=info_text)
 
         # 更新模式标签
         self.mode_label.config(text=f"{mode_text}+{type_text}")
 
+    @traced()
     def show_question(self):
-        """显示当前题目"""
-        # 清空当前题目区域
-        for widget in self.question_container.winfo_children():
-            widget.destroy()
-
-        questions = self.get_filtered_questions()
-
-        if not questions:
-            no_question_frame = tk.Frame(self.question_container, bg='white')
-            no_question_frame.pack(expand=True, fill='both')
-
-            no_question_label = tk.Label(no_question_frame, text="该筛选条件下暂无题目",
-                                         font=("Microsoft YaHei", 14), bg='white', fg='#7f8c8d')
-            no_question_label.pack(expand=True)
-
-            # 显示提示信息
-            hint_text = ""
-            if self.mode_var.get() == "wrong" and len(self.wrong_questions) == 0:
-                hint_text = "您还没有错题，继续努力！"
-            elif self.mode_var.get() == "wrong" and self.type_var.get() != "all":
-                hint_text = f"该题型下暂无错题，试试其他题型或全部题型"
-            elif self.type_var.get() != "all":
-                hint_text = f"该题型下暂无题目，请检查题库"
-
-            if hint_text:
-                hint_label = tk.Label(no_question_frame, text=hint_text,
-                                      font=("Microsoft YaHei", 11), bg='white', fg='#e67e22')
-                hint_label.pack(pady=10)
+        """显示当前题目（复用已有控件，只更新内容）"""
+        engine = self.engine
+        question = engine.current()
+        # 换了题（或没有题）就取消上一道题的自动下一题
+        if question is None or question.row != self.auto_next_row:
+            self.cancel_auto_next()
+        if question is None:
+            self.question_view.show_empty(engine.empty_hint())
+            self.navigator.sync(engine)
             return
 
-        question = questions[self.current_question_index]
-        question_id = str(question['id'])
-
-        # 错题重练模式下，题目总是未答状态，可以重新作答
-        is_wrong_mode = self.mode_var.get() == "wrong"
-        has_answered_in_normal_mode = question_id in self.user_answers and not is_wrong_mode
-
-        # 使用网格布局
-        main_frame = tk.Frame(self.question_container, bg='white')
-        main_frame.pack(fill='both', expand=True, padx=15, pady=10)
-
-        # 题目头部信息
-        header_frame = tk.Frame(main_frame, bg='white')
-        header_frame.pack(fill='x', pady=(0, 10))
-
-        # 进度信息
-        progress_text = f"第{self.current_question_index + 1}/{len(questions)}题 (ID: {question['id']})"
-        tk.Label(header_frame, text=progress_text, font=("Microsoft YaHei", 11, "bold"),
-                 bg='white', fg='#34495e').pack(side='left')
-
-        # 题型标签
-        type_colors = {"single": "#3498db", "multiple": "#e74c3c", "judge": "#27ae60"}
-        type_names = {"single": "单选题", "multiple": "多选题", "judge": "判断题"}
-
-        type_label = tk.Label(header_frame, text=type_names[question['type']],
-                              font=("Microsoft YaHei", 10, "bold"),
-                              bg=type_colors[question['type']], fg='white',
-                              padx=8, pady=2)
-        type_label.pack(side='right')
-
-        # 错题重练模式提示
-        if is_wrong_mode:
-            wrong_label = tk.Label(header_frame, text="🔁 错题重练中",
-                                   font=("Microsoft YaHei", 9, "bold"),
-                                   bg='#fff3cd', fg='#856404', padx=5, pady=2)
-            wrong_label.pack(side='right', padx=(0, 10))
-
-        # 题目内容
-        stem_frame = tk.Frame(main_frame, bg='white')
-        stem_frame.pack(fill='x', pady=5)
-
-        # 计算题目文本所需的高度
-        stem_text = question['stem']
-        text_height = max(3, min(6, len(stem_text) // 40 + 2))  # 动态调整高度
+        row = question.row
+        is_wrong_mode = engine.is_wrong_mode
+        user_answer = engine.answer_for(row)
 
-        stem_text_widget = tk.Text(stem_frame, height=text_height, font=("Microsoft YaHei", 12),
-                                   wrap='word', bg='#f8f9fa', relief='flat', padx=10, pady=10)
-        stem_text_widget.insert('1.0', stem_text)
-        stem_text_widget.config(state='disabled')
-        stem_text_widget.pack(fill='x', padx=5, pady=5)
-
-        # 选项区域
-        options_frame = tk.Frame(main_frame, bg='white')
-        options_frame.pack(fill='both', expand=True, pady=10)
-
-        # 根据题型创建选项
-        if question['type'] == 'judge':
-            self.option_var = tk.StringVar()
-            judge_frame = tk.Frame(options_frame, bg='white')
-            judge_frame.pack(anchor='center', pady=15)
-
-            for i, option in enumerate(question['options']):
-                rb = tk.Radiobutton(judge_frame, text=option, variable=self.option_var,
-                                    value='A' if i == 0 else 'B',
-                                    font=("Microsoft YaHei", 12), bg='white',
-                                    width=8, height=2)
-                rb.pack(side='left', padx=30)
-
-                # 错题重练模式下，恢复之前的答案
-                if is_wrong_mode and question_id in self.user_answers:
-                    user_answer = self.user_answers[question_id]['selected']
-                    if user_answer == ('A' if i == 0 else 'B'):
-                        self.option_var.set(user_answer)
-        else:
-            if question['type'] == 'single':
-                self.option_var = tk.StringVar()
-                for i, option in enumerate(question['options']):
-                    option_frame = tk.Frame(options_frame, bg='white')
-                    option_frame.pack(fill='x', pady=4)
-
-                    rb = tk.Radiobutton(option_frame, text=f"{chr(65 + i)}. {option}",
-                                        variable=self.option_var, value=chr(65 + i),
-                                        font=("Microsoft YaHei", 11), bg='white',
-                                        justify='left', wraplength=600)
-                    rb.pack(anchor='w', padx=15)
-
-                    # 错题重练模式下，恢复之前的答案
-                    if is_wrong_mode and question_id in self.user_answers:
-                        user_answer = self.user_answers[question_id]['selected']
-                        if user_answer == chr(65 + i):
-                            self.option_var.set(user_answer)
-            else:  # multiple
-                self.option_vars = []
-                for i, option in enumerate(question['options']):
-                    option_frame = tk.Frame(options_frame, bg='white')
-                    option_frame.pack(fill='x', pady=4)
-
-                    var = tk.BooleanVar()
-                    cb = tk.Checkbutton(option_frame, text=f"{chr(65 + i)}. {option}",
-                                        variable=var, font=("Microsoft YaHei", 11), bg='white',
-                                        justify='left', wraplength=600)
-                    cb.pack(anchor='w', padx=15)
-                    self.option_vars.append(var)
+        # 错题重练模式下，恢复之前的答案
+        previous_answer = None
+        if is_wrong_mode and user_answer is not None:
+            previous_answer = user_answer.selected
 
-                    # 错题重练模式下，恢复之前的答案
-                    if is_wrong_mode and question_id in self.user_answers:
-                        user_answer = self.user_answers[question_id]['selected']
-                        if chr(65 + i) in user_answer:
-                            var.set(True)
+        index, count = engine.progress()
+        progress_text = (f"第{index}/{count}题 "
+                         f"(ID: {question['id']})")
+        self.question_view.show(question, progress_text, is_wrong_mode, previous_answer)
+        self.navigator.sync(engine)
+        self.schedule_prefetch()
 
         # 显示答题结果（仅在普通模式下且已答题时显示）
-        if has_answered_in_normal_mode:
-            user_answer = self.user_answers[question_id]
+        if engine.has_result(row):
             self.show_answer_result(question, user_answer, is_wrong_mode)
-        else:
-            # 提交按钮区域
-            button_frame = tk.Frame(main_frame, bg='white')
-            button_frame.pack(pady=15)
-
-            submit_text = "提交答案" if not is_wrong_mode else "重新提交"
-            submit_btn = tk.Button(button_frame, text=submit_text, command=self.submit_answer,
-                                   font=("Microsoft YaHei", 11), bg='#27ae60', fg='white',
-                                   padx=25, pady=8)
-            submit_btn.pack()
 
     def show_answer_result(self, question, user_answer, is_wrong_mode=False):
         """显示答题结果"""
-        result_frame = tk.Frame(self.question_container, bg='#f8f9fa')
-        result_frame.pack(fill='x', padx=15, pady=10)
-
-        is_correct = user_answer['is_correct']
-        result_color = '#27ae60' if is_correct else '#e74c3c'
-        result_text = "✅ 回答正确！" if is_correct else "❌ 回答错误！"
-
-        # 错题重练模式下显示不同的提示
-        if is_wrong_mode:
-            result_text = "🔁 错题重练中" + (" - 本次回答正确！" if is_correct else " - 本次仍回答错误")
-
-        tk.Label(result_frame, text=result_text, font=("Microsoft YaHei", 12, "bold"),
-                 fg=result_color, bg='#f8f9fa').pack(pady=5)
-
-        # 答案对比
-        answer_frame = tk.Frame(result_frame, bg='#f8f9fa')
-        answer_frame.pack(pady=5)
-
-        tk.Label(answer_frame, text=f"正确答案: {question['answer']}",
-                 font=("Microsoft YaHei", 10), bg='#f8f9fa').pack(side='left', padx=10)
-        tk.Label(answer_frame, text=f"您的答案: {user_answer['selected']}",
-                 font=("Microsoft YaHei", 10), bg='#f8f9fa').pack(side='left', padx=10)
-
-        # 解析按钮
-        tk.Button(result_frame, text="查看解析",
-                  command=lambda: self.show_explanation(question),
-                  font=("Microsoft YaHei", 10), bg='#f39c12', fg='white').pack(pady=5)
+        self.question_view.show_result(question, user_answer, is_wrong_mode)
 
         # 只在普通模式下自动下一题，错题重练模式下不自动跳转
         if not is_wrong_mode:
-            # 3秒后自动下一题（比原来多1秒）
-            self.root.after(3000, self.auto_next_question)
-        else:
-            # 错题重练模式下显示手动操作提示
-            hint_label = tk.Label(result_frame, text="请手动点击下一题继续练习",
-                                  font=("Microsoft YaHei", 9), bg='#f8f9fa', fg='#666')
-            hint_label.pack(pady=5)
+            self.schedule_auto_next(question.row)
 
     def auto_next_question(self):
-        """自动下一题（仅在普通模式下使用）"""
-        if self.mode_var.get() != "wrong":  # 只在普通模式下自动跳转
-            questions = self.get_filtered_questions()
-            if self.current_question_index < len(questions) - 1:
-                self.current_question_index += 1
-                self.show_question()
+        """自动下一题（仅在普通模式下、且仍停在安排定时器时的那道题上）"""
+        row = self.auto_next_row
+        self.auto_next_id = None
+        self.auto_next_row = None
+        question = self.engine.current()
+        if self.engine.is_wrong_mode or question is None or question.row != row:
+            return
+        if self.engine.next():
+            self.invalidate('question')
 
     def get_user_answer(self):
         """获取用户答案"""
-        questions = self.get_filtered_questions()
-        question = questions[self.current_question_index]
-
-        if question['type'] == 'multiple':
-            selected = []
-            for i, var in enumerate(self.option_vars):
-                if var.get():
-                    selected.append(chr(65 + i))
-            return ''.join(sorted(selected))
-        else:
-            return self.option_var.get()
+        question = self.engine.current()
+        return self.question_view.get_answer(question['type'])
 
+    @traced()
     def submit_answer(self):
         """提交答案"""
-        questions = self.get_filtered_questions()
-        if not questions:
+        if self.engine.current() is None:
             return
 
-        question = questions[self.current_question_index]
         user_answer = self.get_user_answer()
-
         if not user_answer:
             messagebox.showwarning("提示", "请选择答案！")
             return
 
-        is_correct = (user_answer == question['answer'])
-        question_id = str(question['id'])
-
-        # 错题重练模式下的特殊处理
-        is_wrong_mode = self.mode_var.get() == "wrong"
-
-        if is_wrong_mode:
-            # 错题重练模式下，更新答题记录但不影响错题集合
-            # 只有当用户答对时，才从错题集中移除
-            if is_correct and question_id in self.wrong_questions:
-                self.wrong_questions.remove(question_id)
-        else:
-            # 普通模式下正常记录
-            if not is_correct:
-                self.wrong_questions.add(question_id)
-            elif question_id in self.wrong_questions:
-                self.wrong_questions.remove(question_id)
-
-        # 更新答题记录
-        self.user_answers[question_id] = {
-            'selected': user_answer,
-            'is_correct': is_correct
-        }
-
-        self.update_stats()
-        self.show_question()
+        self.engine.submit(user_answer)
+        self.navigator.update_cell(self.engine.current_question_index)
+        self.invalidate('stats', 'question')
 
+    @traced()
     def show_explanation(self, question):
         """显示题目解析"""
         explanation_window = tk.Toplevel(self.root)
@@ -540,50 +1160,59 @@ class QuizApp:
 
     def previous_question(self):
         """上一题"""
-        questions = self.get_filtered_questions()
-        if self.current_question_index > 0:
-            self.current_question_index -= 1
-            self.show_question()
+        if self.engine.previous():
+            self.invalidate('question')
 
     def next_question(self):
         """下一题"""
-        questions = self.get_filtered_questions()
-        if self.current_question_index < len(questions) - 1:
-            self.current_question_index += 1
-            self.show_question()
+        if self.engine.next():
+            self.invalidate('question')
+
+    def jump_to_question(self, index):
+        """导航格点击跳转"""
+        if self.engine is not None and self.engine.goto(index):
+            self.invalidate('question')
 
     def random_question(self):
         """随机选题"""
-        questions = self.get_filtered_questions()
-        if questions:
-            self.current_question_index = random.randint(0, len(questions) - 1)
-            self.show_question()
+        if self.engine.random_pick():
+            self.invalidate('question')
 
     def reset_progress(self):
         """重置学习进度"""
         if messagebox.askyesno("确认重置", "确定要重置所有学习进度吗？\n这将清除所有答题记录和错题记录。"):
-            self.user_answers.clear()
-            self.wrong_questions.clear()
-            self.current_question_index = 0
-            self.update_stats()
-            self.show_question()
+            self.engine.reset()
+            self.invalidate('stats', 'question', 'navigator')
             messagebox.showinfo("重置成功", "学习进度已重置！")
 
+    @traced()
     def update_stats(self):
         """更新统计信息"""
-        total = len(self.questions)
-        answered = len(self.user_answers)
-        correct = sum(1 for ans in self.user_answers.values() if ans['is_correct'])
-        accuracy = (correct / answered * 100) if answered > 0 else 0
+        stats = self.engine.stats()
+        self.total_label.config(text=str(stats['total']))
+        self.answered_label.config(text=str(stats['answered']))
+        self.accuracy_label.config(text=f"{stats['accuracy']:.1f}%")
+        count, accuracy = stats['recent'][20]
+        self.recent_label.config(text=f"{accuracy:.1f}%" if count else "-")
+        if self.stats_panel is not None:
+            self.stats_panel.refresh()
+
+    def show_stats_panel(self):
+        """打开统计详情窗口（已打开时提到最前）"""
+        if self.stats_panel is None:
+            self.stats_panel = StatsPanel(self.root, self.engine, self.close_stats_panel)
+            self.stats_panel.refresh()
+        else:
+            self.stats_panel.window.lift()
 
-        self.total_label.config(text=str(total))
-        self.answered_label.config(text=str(answered))
-        self.accuracy_label.config(text=f"{accuracy:.1f}%")
+    def close_stats_panel(self):
+        self.stats_panel.window.destroy()
+        self.stats_panel = None
 
 
 def main():
     root = tk.Tk()
-    app = QuizApp(root)
+    app = QuizApp(root, os.environ.get("QUIZ_PROFILE", "default"))
     root.mainloop()
 
 